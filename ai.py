@@ -3,10 +3,19 @@
 Azure OpenAI functionality for the Office Management System
 This is the main AI integration file using Azure OpenAI
 """
+import hashlib
+import json
 import os
-from typing import Optional, Dict, Any
+import re
+import textwrap
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterator
 from dotenv import load_dotenv
 
+from services.http_client import outbound
+from services.prompt_builder import DEFAULT_TOKEN_BUDGET, build_context_prompt
+
 # Load environment variables
 load_dotenv()
 
@@ -14,6 +23,70 @@ load_dotenv()
 if not os.getenv('AZURE_OPENAI_ENDPOINT'):
     load_dotenv('.env')
 
+class ResponseCache:
+    """LRU cache of upstream answers keyed on (normalised question, context version)
+
+    The context version is a digest of the office data sent with the prompt,
+    so a cached answer is only replayed while that data is unchanged.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalise(question: str) -> str:
+        """Lower-case, drop punctuation and collapse whitespace"""
+        return ' '.join(re.sub(r"[^\w\s]", ' ', question.lower()).split())
+
+    @staticmethod
+    def context_version(context_data: Optional[Dict[Any, Any]]) -> str:
+        if not context_data:
+            return ''
+        encoded = json.dumps(context_data, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()
+
+    def key(self, question: str, context_data: Optional[Dict[Any, Any]], model: str):
+        return (self.normalise(question), self.context_version(context_data), model or '')
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key, answer: str):
+        if not answer or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 class AzureAIAssistant:
     """Azure OpenAI-powered assistant for office management questions"""
     
@@ -24,8 +97,21 @@ class AzureAIAssistant:
         self.deployment_name = os.getenv('AZURE_OPENAI_DEPLOYMENT')
         self.api_version = os.getenv('AZURE_OPENAI_API_VERSION', '2024-10-21')  # Use compatible version
         
+        # One client for the life of the process (built on first use)
+        self._client = None
+        self._client_lock = threading.Lock()
+        
+        # Repeat questions about unchanged data are answered from here
+        self.response_cache = ResponseCache(int(os.getenv('AI_RESPONSE_CACHE_SIZE', '256')))
+        self._usage = {'upstream_calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                       'estimated_stream_tokens': 0, 'context_tokens': 0, 'contexts_truncated': 0}
+        self._usage_lock = threading.Lock()
+        
+        # Estimated tokens the office data may take up in the system message
+        self.context_token_budget = int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', str(DEFAULT_TOKEN_BUDGET)))
+        
         # Office context for AI responses
-        self.office_context = """
+        self.office_context = textwrap.dedent("""
         You are an AI assistant for an Office Management System. Help users with:
         - Coffee machine status and usage
         - Temperature monitoring and control
@@ -35,7 +121,7 @@ class AzureAIAssistant:
         - General office management questions
         
         Be helpful, concise, and focus on the office management features.
-        """
+        """).strip()
     
     def is_configured(self) -> bool:
         """Check if Azure OpenAI is properly configured"""
@@ -46,6 +132,52 @@ class AzureAIAssistant:
             self.api_version
         ])
     
+    def get_client(self):
+        """The shared AzureOpenAI client (raises ImportError without the openai package)"""
+        with self._client_lock:
+            if self._client is None:
+                from openai import AzureOpenAI
+                self._client = AzureOpenAI(
+                    azure_endpoint=self.azure_endpoint,
+                    api_key=self.azure_api_key,
+                    api_version=self.api_version,
+                    http_client=outbound.client('azure-openai').httpx_client()
+                )
+            return self._client
+    
+    def build_messages(self, user_message: str, context_data: Optional[Dict[Any, Any]] = None):
+        """Chat messages for a question, with the office data in the system prompt"""
+        system_message = self.office_context
+        if context_data:
+            prompt = build_context_prompt(context_data, self.context_token_budget)
+            with self._usage_lock:
+                self._usage['context_tokens'] += prompt.tokens
+                self._usage['contexts_truncated'] += bool(prompt.omitted)
+            system_message += f"\n\nCurrent REAL office data (section, key=value, tables as header then rows):\n{prompt.text}"
+            system_message += "\n\nIMPORTANT: Use the REAL data provided above to answer questions. Give specific numbers, names, and times."
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def record_usage(self, usage=None, streamed_text: Optional[str] = None):
+        """Add one upstream call's token spend (streams only give an estimate)"""
+        with self._usage_lock:
+            self._usage['upstream_calls'] += 1
+            if usage is not None:
+                self._usage['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+                self._usage['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+            elif streamed_text:
+                # ~4 characters per token for English text
+                self._usage['estimated_stream_tokens'] += max(1, len(streamed_text) // 4)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Response cache hit rate and upstream token spend"""
+        with self._usage_lock:
+            usage = dict(self._usage)
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        return {'cache': self.response_cache.stats(), 'upstream': usage}
+    
     def get_response(self, user_message: str, context_data: Optional[Dict[Any, Any]] = None) -> str:
         """
         Get AI response from Azure OpenAI
@@ -67,16 +199,14 @@ class AzureAIAssistant:
             print("Azure OpenAI not configured - using fallback responses")
             return self._get_fallback_response(user_message)
         
+        cache_key = self.response_cache.key(user_message, context_data, self.deployment_name)
+        cached = self.response_cache.get(cache_key)
+        if cached:
+            return cached
+        
         try:
-            from openai import AzureOpenAI
-            
-            # Create Azure OpenAI client (try different approaches)
             try:
-                client = AzureOpenAI(
-                    azure_endpoint=self.azure_endpoint,
-                    api_key=self.azure_api_key,
-                    api_version=self.api_version
-                )
+                client = self.get_client()
             except TypeError as e:
                 if "proxies" in str(e):
                     # Handle the proxies parameter issue
@@ -86,27 +216,20 @@ class AzureAIAssistant:
                     return self._get_fallback_response(user_message)
                 raise e
             
-            # Build system message with REAL data
-            system_message = self.office_context
-            if context_data:
-                system_message += f"\n\nCurrent REAL office data: {context_data}"
-                system_message += "\n\nIMPORTANT: Use the REAL data provided above to answer questions. Give specific numbers, names, and times."
-            
-            # Get AI response
+            # Get AI response with the REAL data in the system message
             response = client.chat.completions.create(
                 model=self.deployment_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
+                messages=self.build_messages(user_message, context_data),
                 max_tokens=300,
                 temperature=0.3
             )
+            self.record_usage(usage=getattr(response, 'usage', None))
             
             if response.choices and response.choices[0].message:
                 ai_response = response.choices[0].message.content.strip()
                 if ai_response:
                     print("✅ Azure OpenAI response generated successfully with REAL data")
+                    self.response_cache.put(cache_key, ai_response)
                     return ai_response
             
             return self._get_fallback_response(user_message)
@@ -268,54 +391,70 @@ def get_ai_response(message: str, context: Optional[Dict] = None) -> str:
     """Main function to get AI responses"""
     return azure_ai.get_response(message, context)
 
+def _chunk_text(text: str, char_limit: int = 40) -> Iterator[str]:
+    """Split a complete answer into word-aligned chunks to simulate streaming"""
+    words = text.split(' ')
+    buffer = []
+    for w in words:
+        buffer.append(w)
+        if sum(len(x) for x in buffer) + len(buffer) - 1 >= char_limit:
+            chunk = ' '.join(buffer)
+            yield chunk + ' '
+            buffer = []
+    if buffer:
+        yield ' '.join(buffer)
+
 def stream_ai_response(message: str, context: Optional[Dict] = None):
     """Generator that yields chunks of an AI response for streaming (SSE/WebSocket).
 
     Strategy:
-    1. Attempt Azure OpenAI streaming if configured.
-    2. If not configured or error occurs, fall back to data-driven smart/fallback response
+    1. Replay a cached answer if the same question was asked about the same data.
+    2. Attempt Azure OpenAI streaming if configured, caching the completed answer.
+    3. If not configured or error occurs, fall back to data-driven smart/fallback response
        and yield it in small chunks to simulate streaming.
     """
     # Try Azure streaming first
     if azure_ai.is_configured():
+        cache_key = azure_ai.response_cache.key(message, context, azure_ai.deployment_name)
+        cached = azure_ai.response_cache.get(cache_key)
+        if cached:
+            yield from _chunk_text(cached)
+            return
         try:
-            from openai import AzureOpenAI
-            client = AzureOpenAI(
-                azure_endpoint=azure_ai.azure_endpoint,
-                api_key=azure_ai.azure_api_key,
-                api_version=azure_ai.api_version
-            )
-            system_message = azure_ai.office_context
-            if context:
-                system_message += f"\n\nCurrent REAL office data: {context}\nUse this data directly in your answer."
+            client = azure_ai.get_client()
             # Use responses API if available for streaming
             try:
                 stream = client.chat.completions.create(
                     model=azure_ai.deployment_name,
-                    messages=[
-                        {"role": "system", "content": system_message},
-                        {"role": "user", "content": message}
-                    ],
+                    messages=azure_ai.build_messages(message, context),
                     max_tokens=300,
                     temperature=0.3,
                     stream=True
                 )
                 full_text = []
-                for event in stream:
-                    delta = ''
-                    try:
-                        delta = event.choices[0].delta.content or ''  # type: ignore
-                    except Exception:
-                        # Different SDK versions may structure chunks differently
-                        delta = getattr(event, 'content', '') or ''
-                    if delta:
-                        full_text.append(delta)
-                        yield delta
+                try:
+                    for event in stream:
+                        delta = ''
+                        try:
+                            delta = event.choices[0].delta.content or ''  # type: ignore
+                        except Exception:
+                            # Different SDK versions may structure chunks differently
+                            delta = getattr(event, 'content', '') or ''
+                        if delta:
+                            full_text.append(delta)
+                            yield delta
+                finally:
+                    # Also runs when the consumer closes us early (client went away)
+                    if hasattr(stream, 'close'):
+                        stream.close()
+                azure_ai.record_usage(streamed_text=''.join(full_text))
                 # Ensure at least something returned
                 if not full_text:
                     fallback = azure_ai.get_response(message, context)
                     for ch in fallback:
                         yield ch
+                    return
+                azure_ai.response_cache.put(cache_key, ''.join(full_text).strip())
                 return
             except TypeError as te:
                 if 'stream' in str(te).lower():
@@ -328,15 +467,4 @@ def stream_ai_response(message: str, context: Optional[Dict] = None):
 
     # Fallback: get full response then yield in chunks
     full = azure_ai.get_response(message, context)
-    # Simple token/chunk splitting (by space, keeping punctuation)
-    words = full.split(' ')
-    buffer = []
-    char_limit = 40
-    for w in words:
-        buffer.append(w)
-        if sum(len(x) for x in buffer) + len(buffer) - 1 >= char_limit:
-            chunk = ' '.join(buffer)
-            yield chunk + ' '
-            buffer = []
-    if buffer:
-        yield ' '.join(buffer)
+    yield from _chunk_text(full)
@@ -1,5 +1,5 @@
 # api.py - main API blueprint
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 import os
 import json
 import urllib.request
@@ -8,8 +8,12 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from models import Office, Employee, Asset, Booking, Maintenance, User
 from schemas import OfficeSchema, EmployeeSchema, AssetSchema, BookingSchema, MaintenanceSchema, UserSchema
-from datetime import datetime
+from datetime import date, datetime
 from flask import Response
+from services.booking_engine import BookingConflict, booking_engine
+from services.pagination import ListSpec, list_response
+from services.room_finder import room_finder
+from services import search_index
 
 api_bp = Blueprint('api', __name__)
 
@@ -25,12 +29,22 @@ maintenance_schema = MaintenanceSchema()
 maintenances_schema = MaintenanceSchema(many=True)
 user_schema = UserSchema()
 
+# List endpoints: keyset pages with ?limit, ?cursor, ?fields, ?order=desc and these filters
+OFFICE_LIST = ListSpec(Office, OfficeSchema, {'name': ('name', 'eq')})
+EMPLOYEE_LIST = ListSpec(Employee, EmployeeSchema, {
+    'office_id': ('office_id', 'eq'), 'role': ('role', 'eq'), 'email': ('email', 'eq')})
+ASSET_LIST = ListSpec(Asset, AssetSchema, {'office_id': ('office_id', 'eq'), 'status': ('status', 'eq')})
+BOOKING_LIST = ListSpec(Booking, BookingSchema, {
+    'user_id': ('user_id', 'eq'), 'resource': ('resource', 'eq'),
+    'start_from': ('start_time', 'ge'), 'start_before': ('start_time', 'lt')})
+MAINTENANCE_LIST = ListSpec(Maintenance, MaintenanceSchema, {
+    'asset_id': ('asset_id', 'eq'), 'status': ('status', 'eq')})
+
 # Offices CRUD
 @api_bp.route('/offices', methods=['GET'])
 @jwt_required()
 def list_offices():
-    offices = Office.query.all()
-    return jsonify(offices_schema.dump(offices)), 200
+    return list_response(OFFICE_LIST)
 
 @api_bp.route('/offices', methods=['POST'])
 @jwt_required()
@@ -64,8 +78,7 @@ def delete_office(office_id):
 @api_bp.route('/employees', methods=['GET'])
 @jwt_required()
 def list_employees():
-    employees = Employee.query.all()
-    return jsonify(employees_schema.dump(employees)), 200
+    return list_response(EMPLOYEE_LIST)
 
 @api_bp.route('/employees', methods=['POST'])
 @jwt_required()
@@ -109,8 +122,7 @@ def delete_employee(id):
 @api_bp.route('/assets', methods=['GET'])
 @jwt_required()
 def list_assets():
-    assets = Asset.query.all()
-    return jsonify(assets_schema.dump(assets)), 200
+    return list_response(ASSET_LIST)
 
 @api_bp.route('/assets', methods=['POST'])
 @jwt_required()
@@ -145,25 +157,120 @@ def delete_asset(id):
 @api_bp.route('/bookings', methods=['GET'])
 @jwt_required()
 def list_bookings():
-    bookings = Booking.query.all()
-    return jsonify(bookings_schema.dump(bookings)), 200
+    return list_response(BOOKING_LIST)
 
 @api_bp.route('/bookings', methods=['POST'])
 @jwt_required()
 def create_booking():
     data = request.get_json() or {}
     current = get_jwt_identity()
-    b = Booking(
-        resource=data.get('resource'),
-        user_id=current['id'],
-        start_time=datetime.fromisoformat(data.get('start_time')),
-        end_time=datetime.fromisoformat(data.get('end_time')),
-        notes=data.get('notes')
-    )
-    db.session.add(b)
-    db.session.commit()
+    if not data.get('resource'):
+        return jsonify({"msg": "resource is required"}), 400
+    try:
+        start_time = datetime.fromisoformat(data.get('start_time'))
+        end_time = datetime.fromisoformat(data.get('end_time'))
+        b = booking_engine.create_booking(data.get('resource'), current['id'], start_time, end_time,
+                                          notes=data.get('notes'))
+    except BookingConflict as e:
+        return jsonify({"msg": str(e), "conflicts": e.conflicts}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"msg": str(e) or "start_time and end_time must be ISO 8601"}), 400
     return jsonify(booking_schema.dump(b)), 201
 
+@api_bp.route('/bookings/free', methods=['GET'])
+@jwt_required()
+def booking_free_slots():
+    """Free periods between ?start and ?end for ?resources=a,b (default: every booked resource)
+
+    Optional ?min_minutes drops gaps shorter than that.
+    """
+    try:
+        start = datetime.fromisoformat(request.args['start'])
+        end = datetime.fromisoformat(request.args['end'])
+        min_minutes = int(request.args.get('min_minutes', 0))
+    except (KeyError, ValueError):
+        return jsonify({"msg": "start and end (ISO 8601) are required; min_minutes must be an integer"}), 400
+    if end <= start:
+        return jsonify({"msg": "end must be after start"}), 400
+    resources = request.args.get('resources')
+    names = [r.strip() for r in resources.split(',') if r.strip()] if resources else None
+    slots = booking_engine.free_slots(names, start, end, min_minutes)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'resources': {name: [slot.to_dict() for slot in free] for name, free in slots.items()}
+    }), 200
+
+def _optional_int(name):
+    value = request.args.get(name)
+    return int(value) if value not in (None, '') else None
+
+@api_bp.route('/rooms/available', methods=['GET'])
+@jwt_required()
+def available_rooms():
+    """Meeting rooms free for the whole of ?start..?end, best match first
+
+    Optional: ?capacity (seats), ?office_id, ?floor, ?near_floor (rank by
+    distance from it), ?comfort=comfortable|moderate, ?limit (default 20, max 100).
+    """
+    try:
+        start = datetime.fromisoformat(request.args['start'])
+        end = datetime.fromisoformat(request.args['end'])
+        filters = {name: _optional_int(name) for name in ('capacity', 'office_id', 'floor', 'near_floor')}
+        limit = int(request.args.get('limit', 20))
+    except (KeyError, ValueError):
+        return jsonify({"msg": "start and end (ISO 8601) are required; capacity, office_id, floor, "
+                               "near_floor and limit must be integers"}), 400
+    if end <= start:
+        return jsonify({"msg": "end must be after start"}), 400
+    try:
+        rooms = room_finder.find(start, end, comfort=request.args.get('comfort') or None, limit=limit, **filters)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'rooms': rooms}), 200
+
+@api_bp.route('/rooms/occupancy', methods=['GET'])
+@jwt_required()
+def room_occupancy():
+    """Week view: per room and day, one character per slot ('1' = booked)
+
+    ?start_date (YYYY-MM-DD, default today), ?days (1-31, default 7) and the
+    ?office_id, ?floor, ?capacity filters of /rooms/available.
+    """
+    try:
+        start_day = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else datetime.utcnow().date()
+        days = int(request.args.get('days', 7))
+        filters = {name: _optional_int(name) for name in ('office_id', 'floor', 'capacity')}
+    except ValueError:
+        return jsonify({"msg": "start_date must be YYYY-MM-DD; days, office_id, floor and capacity must be integers"}), 400
+    if not 1 <= days <= 31:
+        return jsonify({"msg": "days must be between 1 and 31"}), 400
+    return jsonify(room_finder.week(start_day, days, **filters)), 200
+
+@api_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Search stock items, employees, users and assets by ?q
+
+    Substring matches come first, then typo-tolerant ones (``exact``
+    false). Optional: ?type (comma-separated, default all), ?limit per type
+    (default 20, max 100), ?fuzzy=0 for substring matches only.
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"msg": "q is required"}), 400
+    kinds = [k.strip() for k in request.args.get('type', '').split(',') if k.strip()] or list(search_index.SOURCES)
+    try:
+        limit = int(request.args.get('limit', search_index.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"msg": "limit must be an integer"}), 400
+    fuzzy = request.args.get('fuzzy', '1').lower() not in ('0', 'false', 'no')
+    try:
+        results = {kind: [hit.to_dict() for hit in search_index.search(kind, query, limit, fuzzy)] for kind in kinds}
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify({'q': query, 'results': results}), 200
+
 @api_bp.route('/bookings/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_booking(id):
@@ -176,8 +283,7 @@ def delete_booking(id):
 @api_bp.route('/maintenances', methods=['GET'])
 @jwt_required()
 def list_maintenances():
-    m = Maintenance.query.all()
-    return jsonify(maintenances_schema.dump(m)), 200
+    return list_response(MAINTENANCE_LIST)
 
 @api_bp.route('/maintenances', methods=['POST'])
 @jwt_required()
@@ -207,6 +313,14 @@ def me():
     return jsonify(user_schema.dump(user)), 200
 
 
+# Buffered activity log writer health (queue depth, flush latency)
+@api_bp.route('/activity/metrics', methods=['GET'])
+@jwt_required()
+def activity_metrics():
+    from services.activity_log import activity_writer
+    return jsonify({'success': True, 'metrics': activity_writer.metrics()}), 200
+
+
 # Dashboard data (demo endpoint used by the frontend). This is intentionally
 # unauthenticated so the sample dashboard can be shown quickly. You can lock
 # this down later to return real aggregated data.
@@ -331,9 +445,7 @@ def ai_reply():
     """
     try:
         from ai import get_ai_response
-        from models import Employee, User, PresenceLog, PresenceStatus, StockItem, CoffeeOrder, TemperatureReading, TemperatureSensor
-        from sqlalchemy import desc, func
-        from datetime import datetime, timedelta
+        from services.office_context import office_context
         
         # Get user message
         payload = request.get_json() or {}
@@ -344,79 +456,8 @@ def ai_reply():
                 "reply": "👋 Hello! I'm your Office Management AI Assistant! Ask me about coffee, temperature, employees, stock, or any features."
             }), 200
         
-        # Gather REAL office data from database
-        context_data = {}
-        
-        try:
-            # PRESENCE DATA - Who's in the office?
-            employees_in = db.session.query(Employee, User).join(User).filter(Employee.status == 'active').all()
-            present_employees = []
-            total_checked_in = 0
-            
-            for emp, user in employees_in:
-                latest_log = PresenceLog.query.filter_by(user_id=user.id).order_by(desc(PresenceLog.created_at)).first()
-                if latest_log and latest_log.status == PresenceStatus.IN:
-                    present_employees.append({
-                        'name': emp.full_name,
-                        'department': emp.department,
-                        'time': latest_log.created_at.strftime('%I:%M %p')
-                    })
-                    total_checked_in += 1
-            
-            context_data['presence'] = {
-                'total_in_office': total_checked_in,
-                'total_employees': len(employees_in),
-                'employees_present': present_employees[:10]  # Limit to 10 for context
-            }
-            
-            # STOCK DATA - Low stock items
-            low_stock_items = StockItem.query.filter(
-                StockItem.quantity <= StockItem.reorder_point
-            ).limit(10).all()
-            
-            context_data['stock'] = {
-                'low_stock_count': len(low_stock_items),
-                'low_stock_items': [{
-                    'name': item.name,
-                    'quantity': item.quantity,
-                    'reorder_point': item.reorder_point,
-                    'unit': item.unit
-                } for item in low_stock_items]
-            }
-            
-            # COFFEE DATA - Recent orders and usage
-            today = datetime.now().date()
-            todays_orders = CoffeeOrder.query.filter(
-                func.date(CoffeeOrder.created_at) == today
-            ).count()
-            
-            recent_orders = CoffeeOrder.query.order_by(desc(CoffeeOrder.created_at)).limit(5).all()
-            
-            context_data['coffee'] = {
-                'orders_today': todays_orders,
-                'recent_orders': [{
-                    'user': order.user.name if order.user else 'Unknown',
-                    'type': order.coffee_type,
-                    'time': order.created_at.strftime('%I:%M %p')
-                } for order in recent_orders if order.user]
-            }
-            
-            # TEMPERATURE DATA - Latest readings
-            latest_readings = TemperatureReading.query.order_by(desc(TemperatureReading.created_at)).limit(5).all()
-            
-            if latest_readings:
-                context_data['temperature'] = {
-                    'latest_readings': [{
-                        'sensor': reading.sensor.name if reading.sensor else 'Unknown',
-                        'temperature': reading.temperature,
-                        'humidity': reading.humidity,
-                        'time': reading.created_at.strftime('%I:%M %p')
-                    } for reading in latest_readings if reading.sensor]
-                }
-            
-        except Exception as data_error:
-            print(f"Error gathering context data: {data_error}")
-            # Continue with whatever data we have
+        # REAL office data, from the cached snapshot (rebuilt on TTL or after writes)
+        context_data = office_context.get()
         
         # Get AI response with REAL data
         ai_response = get_ai_response(message, context_data if context_data else None)
@@ -433,15 +474,24 @@ def ai_reply():
         }), 200
 
 
+# AI assistant cache hit rate and upstream token spend
+@api_bp.route('/ai/stats', methods=['GET'])
+def ai_stats():
+    from ai import azure_ai
+    from services.office_context import office_context
+    from services.ai_streaming import ai_stream_pool
+    return jsonify({'success': True, 'stats': azure_ai.stats(), 'context': office_context.stats(),
+                    'streams': ai_stream_pool.stats()}), 200
+
+
 # Streaming AI assistant endpoint (Server-Sent Events)
 @api_bp.route('/ai_stream', methods=['POST'])
 def ai_reply_stream():
     """Stream AI assistant response as SSE for real-time typing effect."""
     try:
-        from ai import stream_ai_response, get_ai_response
-        from models import Employee, User, PresenceLog, PresenceStatus, StockItem, CoffeeOrder, TemperatureReading, TemperatureSensor
-        from sqlalchemy import desc, func
-        from datetime import datetime
+        from ai import stream_ai_response
+        from services.ai_streaming import StreamBusyError, ai_stream_pool
+        from services.office_context import office_context
     except Exception as e:  # noqa: BLE001
         return jsonify({'error': f'Initialization failed: {e}'}), 500
 
@@ -450,64 +500,12 @@ def ai_reply_stream():
     if not message:
         return jsonify({'error': 'Empty message'}), 400
 
-    # Prepare context (reuse logic but simplified to avoid heavy duplication)
-    context_data = {}
+    # Same cached snapshot as /api/ai
     try:
-        # Presence
-        employees_in = db.session.query(Employee, User).join(User).filter(Employee.status == 'active').all()
-        from sqlalchemy import desc as _desc, func as _func  # local aliasing
-        present_employees = []
-        total_checked_in = 0
-        for emp, user in employees_in:
-            latest_log = PresenceLog.query.filter_by(user_id=user.id).order_by(_desc(PresenceLog.created_at)).first()
-            if latest_log and latest_log.status == PresenceStatus.IN:
-                present_employees.append({
-                    'name': emp.full_name,
-                    'department': emp.department,
-                    'time': latest_log.created_at.strftime('%I:%M %p')
-                })
-                total_checked_in += 1
-        context_data['presence'] = {
-            'total_in_office': total_checked_in,
-            'total_employees': len(employees_in),
-            'employees_present': present_employees[:10]
-        }
-        # Stock
-        low_stock_items = StockItem.query.filter(StockItem.quantity <= StockItem.reorder_point).limit(10).all()
-        context_data['stock'] = {
-            'low_stock_count': len(low_stock_items),
-            'low_stock_items': [{
-                'name': i.name,
-                'quantity': i.quantity,
-                'reorder_point': i.reorder_point,
-                'unit': i.unit
-            } for i in low_stock_items]
-        }
-        # Coffee
-        today = datetime.now().date()
-        todays_orders = CoffeeOrder.query.filter(func.date(CoffeeOrder.created_at) == today).count()
-        recent_orders = CoffeeOrder.query.order_by(desc(CoffeeOrder.created_at)).limit(5).all()
-        context_data['coffee'] = {
-            'orders_today': todays_orders,
-            'recent_orders': [{
-                'user': o.user.name if o.user else 'Unknown',
-                'type': o.coffee_type,
-                'time': o.created_at.strftime('%I:%M %p')
-            } for o in recent_orders if o.user]
-        }
-        # Temperature
-        latest_readings = TemperatureReading.query.order_by(desc(TemperatureReading.created_at)).limit(3).all()
-        if latest_readings:
-            context_data['temperature'] = {
-                'latest_readings': [{
-                    'sensor': r.sensor.name if r.sensor else 'Unknown',
-                    'temperature': r.temperature,
-                    'humidity': r.humidity,
-                    'time': r.created_at.strftime('%I:%M %p')
-                } for r in latest_readings if r.sensor]
-            }
+        context_data = office_context.get()
     except Exception as e:  # noqa: BLE001
         print(f"Context build error (stream): {e}")
+        context_data = {}
 
     def event_stream():  # inner generator
         try:
@@ -520,10 +518,39 @@ def ai_reply_stream():
             err_msg = f"Streaming error: {e}"
             yield f"data: {json.dumps({'error': err_msg, 'done': True})}\n\n"
 
+    def pooled_event_stream(session):
+        # Upstream is read by a stream worker; this thread waits its turn, then drains its buffer
+        try:
+            for kind, payload in session:
+                if kind == 'queued':
+                    yield f"data: {json.dumps({'queued': payload})}\n\n"
+                elif kind == 'delta':
+                    yield f"data: {json.dumps({'delta': payload})}\n\n"
+                elif kind == 'heartbeat':
+                    yield ": keepalive\n\n"
+                elif kind == 'error':
+                    yield f"data: {json.dumps({'error': payload, 'done': True})}\n\n"
+                    return
+            yield f"data: {json.dumps({'done': True})}\n\n"
+        finally:
+            # Runs on normal completion and when the client disconnects
+            session.cancel()
+
+    if current_app.config.get('AI_STREAM_MODE', 'pool') == 'inline':
+        body = event_stream()
+    else:
+        try:
+            session = ai_stream_pool.open(
+                lambda: stream_ai_response(message, context_data if context_data else None))
+        except StreamBusyError:
+            # Only when the wait queue is full as well
+            return jsonify({'error': 'Too many concurrent AI streams, try again shortly'}), 503, {'Retry-After': '5'}
+        body = pooled_event_stream(session)
+
     headers = {
         'Content-Type': 'text/event-stream',
         'Cache-Control': 'no-cache',
         'Connection': 'keep-alive',
         'X-Accel-Buffering': 'no'
     }
-    return Response(event_stream(), headers=headers)
+    return Response(body, headers=headers)
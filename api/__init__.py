@@ -36,4 +36,7 @@ init_safety_routes(api_bp)
 from .stock import stock_bp
 api_bp.register_blueprint(stock_bp, url_prefix='/stock')
 
+from .sensors import sensors_bp
+api_bp.register_blueprint(sensors_bp, url_prefix='/sensors')
+
 __all__ = ["api_bp"]
\ No newline at end of file
@@ -2,6 +2,9 @@ from flask import jsonify, request
 from datetime import datetime
 from models import db, SafetyVisitor, SafetyEvent, User, PresenceLog, Employee, PresenceStatus
 from presence_utils import get_current_presence_summary
+from services.presence_service import get_employee_presence
+from services.db_engine import run_with_retry
+from services import search_index
 from sqlalchemy import desc
 
 def init_safety_routes(bp):
@@ -41,7 +44,11 @@ def init_safety_routes(bp):
                 # Try to find host by name if hostName is provided
                 host = None
                 if data.get('hostName'):
-                    host = User.query.filter(User.name.ilike(f"%{data['hostName']}%")).first()
+                    # Substring match on name/email via the FTS index. No fuzzy
+                    # fallback, and only an unambiguous hit: a near miss would
+                    # attach the visitor to the wrong person
+                    hits = search_index.search('users', data['hostName'], limit=2, fuzzy=False)
+                    host = db.session.get(User, hits[0].id) if len(hits) == 1 else None
                     print(f"🔍 Found host: {host.name if host else 'None'}")
                 elif data.get('hostId'):
                     host = User.query.get(data['hostId'])
@@ -103,44 +110,23 @@ def init_safety_routes(bp):
         print("🔍 GET /api/safety/occupants ENDPOINT HIT!")
         print("=" * 80)
         try:
-            from models import Employee, PresenceStatus
-            
             # Get checked in visitors
             visitors = SafetyVisitor.query.filter_by(status='checked_in').all()
             print(f"📊 Found {len(visitors)} visitors")
             
-            # Get employees who are currently IN the office (latest presence status = IN)
+            # Get employees who are currently IN the office, read straight from the
+            # current presence table so only present employees are touched
             present_employees = []
-            
-            # Query all employees with their user accounts
-            employees = (db.session.query(Employee, User)
-                        .join(User, Employee.user_id == User.id)
-                        .filter(Employee.status == 'active')
-                        .all())
-            
-            print(f"📊 Found {len(employees)} total employees in database")
-            
-            for employee, user in employees:
-                # Get the latest presence log for this user
-                latest_log = (PresenceLog.query
-                            .filter_by(user_id=user.id)
-                            .order_by(PresenceLog.created_at.desc())
-                            .first())
-                
-                # Only include if their latest status is IN
-                if latest_log and latest_log.status == PresenceStatus.IN:
-                    present_employees.append({
-                        'id': f'e{employee.id}',
-                        'name': employee.full_name,
-                        'type': 'employee',
-                        'department': employee.department or 'Unknown',
-                        'time': latest_log.created_at.strftime('%I:%M %p'),
-                        'location': latest_log.location or 'Office'
-                    })
-                    print(f"✅ {employee.full_name} is IN office (checked in at {latest_log.created_at.strftime('%I:%M %p')})")
-                else:
-                    status_text = latest_log.status.value if latest_log else 'No logs'
-                    print(f"⚪ {employee.full_name} is {status_text}")
+            for person in get_employee_presence(active_only=True, present_only=True):
+                present_employees.append({
+                    'id': f'e{person.employee_id}',
+                    'name': person.full_name,
+                    'type': 'employee',
+                    'department': person.department or 'Unknown',
+                    'time': person.since.strftime('%I:%M %p'),
+                    'location': person.location or 'Office'
+                })
+                print(f"✅ {person.full_name} is IN office (checked in at {person.since.strftime('%I:%M %p')})")
             
             print(f"📊 Total present: {len(present_employees)} employees + {len(visitors)} visitors = {len(present_employees) + len(visitors)}")
                     
@@ -249,15 +235,17 @@ def init_safety_routes(bp):
             # Create presence log
             presence_status = PresenceStatus.IN if status == 'in' else PresenceStatus.OUT
             
-            presence_log = PresenceLog(
-                user_id=employee.user_id,
-                status=presence_status,
-                location='Office' if status == 'in' else None,
-                notes=f"Employee check-{status} via login portal"
-            )
+            def record_check_in():
+                presence_log = PresenceLog(
+                    user_id=employee.user_id,
+                    status=presence_status,
+                    location='Office' if status == 'in' else None,
+                    notes=f"Employee check-{status} via login portal"
+                )
+                db.session.add(presence_log)
+                db.session.commit()
             
-            db.session.add(presence_log)
-            db.session.commit()
+            run_with_retry(record_check_in)
             
             print(f"✅ {employee.full_name} checked {status} successfully")
 
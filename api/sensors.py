@@ -0,0 +1,64 @@
+# api/sensors.py - Sensor ingest API endpoints
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request
+import hmac
+import os
+
+from app import db
+from services.sensor_ingest import IngestError, ingest_readings, parse_payload
+
+sensors_bp = Blueprint('sensors', __name__)
+
+# Largest batch accepted in one request
+DEFAULT_MAX_ROWS = 50000
+
+
+@sensors_bp.route('/readings/bulk', methods=['POST'])
+def bulk_ingest_readings():
+    """Store a batch of TemperatureSensor readings in one transaction
+
+    Body formats (by Content-Type):
+        application/x-ndjson (default): one JSON reading per line
+        application/json: an array of readings, or {"readings": [...]}
+        text/csv: sensor_id,temperature,humidity,timestamp (header optional;
+                  mac_address may be used instead of sensor_id with a header)
+
+    Each reading needs ``sensor_id`` (or ``mac_address``) and ``temperature``;
+    ``humidity`` and ``timestamp`` (ISO 8601 or epoch seconds, default now)
+    are optional. Bad rows are reported individually without failing the
+    rest of the batch.
+
+    Requires the shared ``X-Sensor-Key`` (SENSOR_INGEST_KEY) or, like the
+    other write APIs, a valid access token. Without a configured key only
+    the token is accepted.
+    """
+    # Sensors can't log in, so they send the shared key; anything else needs a JWT
+    expected_key = current_app.config.get('SENSOR_INGEST_KEY') or os.getenv('SENSOR_INGEST_KEY')
+    sent_key = request.headers.get('X-Sensor-Key')
+    if sent_key is not None:
+        if not expected_key or not hmac.compare_digest(sent_key, expected_key):
+            return jsonify({'success': False, 'error': 'Invalid X-Sensor-Key'}), 401
+    elif verify_jwt_in_request(optional=True) is None:
+        return jsonify({'success': False, 'error': 'Send X-Sensor-Key or an access token'}), 401
+
+    try:
+        records = list(parse_payload(request.get_data(as_text=True), request.content_type))
+    except IngestError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    if not records:
+        return jsonify({'success': False, 'error': 'No readings in request body'}), 400
+
+    max_rows = current_app.config.get('SENSOR_INGEST_MAX_ROWS', DEFAULT_MAX_ROWS)
+    if len(records) > max_rows:
+        return jsonify({'success': False,
+                        'error': f'Batch of {len(records)} readings exceeds the limit of {max_rows}'}), 413
+
+    try:
+        result = ingest_readings(records)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error ingesting sensor readings: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': result.accepted > 0, **result.to_dict()}), 200 if result.accepted else 422
@@ -1,217 +1,125 @@
 # api/stock.py - Stock Management API endpoints
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
 from sqlalchemy.exc import IntegrityError
 import json
 
 from app import db
 from models import (
     StockItem, StockCategory, StockLocation, StockTransaction, StockOrder,
-    ActivityLog, User, Office
+    ActivityLog, User, Office, stock_status
 )
+from services.exports import EXPORT_BATCH_ROWS, FORMATS as EXPORT_FORMATS, export_response
+from services.pagination import (
+    DEFAULT_LIMIT, MAX_LIMIT, ListQueryError, add_next_link, decode_cursor, encode_cursor
+)
+from services.reorder_engine import forecast_reorders
+from services.stock_service import StockService
 
 stock_bp = Blueprint('stock', __name__)
 
 # In-memory storage for demo orders (will reset when server restarts)
 DEMO_ORDERS = []
 
-# In-memory storage for demo stock items (will reset when server restarts)
-DEMO_ITEMS = [
-    {
-        'id': 1,
-        'name': 'Coffee Beans',
-        'sku': 'CB001',
-        'quantity': 3,
-        'unit': 'kg',
-        'location': 'Kitchen',
-        'category': 'Beverages',
-        'supplier': 'Makro',
-        'reorder_point': 5,
-        'unit_cost': 150.0,
-        'description': 'Premium Arabica coffee beans',
-        'updated_at': datetime.now().isoformat()
-    },
-    {
-        'id': 2,
-        'name': 'Milk',
-        'sku': 'MK001',
-        'quantity': 10,
-        'unit': 'liters',
-        'location': 'Fridge',
-        'category': 'Beverages',
-        'supplier': 'Checkers',
-        'reorder_point': 15,
-        'unit_cost': 18.0,
-        'description': 'Fresh full cream milk',
-        'updated_at': datetime.now().isoformat()
-    },
-    {
-        'id': 3,
-        'name': 'Coffee Filters',
-        'sku': 'CF001',
-        'quantity': 25,
-        'unit': 'pieces',
-        'location': 'Store',
-        'category': 'Supplies',
-        'supplier': 'Takealot',
-        'reorder_point': 20,
-        'unit_cost': 5.0,
-        'description': 'Paper coffee filters',
-        'updated_at': datetime.now().isoformat()
-    },
-    {
-        'id': 4,
-        'name': 'Printer Paper',
-        'sku': 'PP001',
-        'quantity': 2,
-        'unit': 'packs',
-        'location': 'Storage',
-        'category': 'Office',
-        'supplier': 'Spar',
-        'reorder_point': 5,
-        'unit_cost': 85.0,
-        'description': 'A4 printer paper (500 sheets per pack)',
-        'updated_at': datetime.now().isoformat()
-    }
+# (NDJSON key, CSV header) per exported column, in row order
+ORDER_EXPORT_COLUMNS = [
+    ('order_id', 'Order ID'), ('created_at', 'Date Placed'), ('item_name', 'Item Name'), ('quantity', 'Quantity'),
+    ('unit', 'Unit'), ('total_cost', 'Price (R)'), ('supplier', 'Supplier'), ('status', 'Status'),
+    ('priority', 'Priority'), ('notes', 'Notes')
+]
+STOCK_EXPORT_COLUMNS = [
+    ('name', 'Name'), ('sku', 'SKU'), ('quantity', 'Quantity'), ('unit', 'Unit'), ('status', 'Status'),
+    ('location', 'Location'), ('category', 'Category'), ('supplier', 'Supplier'),
+    ('reorder_point', 'Reorder Point'), ('unit_cost', 'Unit Cost'), ('updated_at', 'Last Updated')
 ]
+TRANSACTION_EXPORT_COLUMNS = [
+    ('id', 'ID'), ('created_at', 'Date'), ('item_id', 'Item ID'), ('sku', 'SKU'), ('item_name', 'Item Name'),
+    ('type', 'Type'), ('quantity', 'Quantity'), ('reference', 'Reference'), ('notes', 'Notes'),
+    ('user_id', 'User ID')
+]
+
+def _stock_item_dict(row):
+    """API representation of a StockService.list_items row"""
+    last_updated = row.updated_at or row.created_at
+    return {
+        'id': row.id,
+        'name': row.name,
+        'sku': row.sku,
+        'quantity': row.quantity,
+        'unit': row.unit,
+        'status': row.status,
+        'location': row.location or 'Unknown',
+        'category': row.category or 'Uncategorized',
+        'supplier': row.supplier or '',
+        'reorder_point': row.reorder_point or 0,
+        'min_quantity': row.min_quantity or 0,
+        'unit_cost': row.unit_cost or 0,
+        'description': row.description or '',
+        'last_restock': row.last_restock.isoformat() if row.last_restock else None,
+        'last_updated': last_updated.isoformat() if last_updated else None
+    }
+
+def _get_or_create_location(name):
+    location = StockLocation.query.filter_by(name=name).first()
+    if not location:
+        location = StockLocation(name=name, area='General')
+        db.session.add(location)
+        db.session.flush()
+    return location
+
+def _get_or_create_category(name):
+    category = StockCategory.query.filter_by(name=name).first()
+    if not category:
+        category = StockCategory(name=name)
+        db.session.add(category)
+        db.session.flush()
+    return category
 
 # ============ STOCK ITEMS ============
 
 @stock_bp.route('/items', methods=['GET'])
 def get_stock_items():
-    """Get all stock items with optional filtering"""
+    """Get stock items, a page at a time, with optional filtering
+    
+    Query parameters: status (OK/Low/Critical), location and category (names),
+    search (substring of the name, SKU or description), limit (default 100, max 1000) and cursor
+    (from the previous page's next_cursor / Link header).
+    """
     try:
-        # Get query parameters
-        status_filter = request.args.get('status', '')
-        location_filter = request.args.get('location', '')
-        category_filter = request.args.get('category', '')
-        search_query = request.args.get('search', '')
-        
-        # Use demo items instead of database
-        items_data = []
-        for item in DEMO_ITEMS:
-            # Determine status based on quantity vs reorder point
-            if item['quantity'] <= 0:
-                status = 'Critical'
-            elif item.get('reorder_point') and item['quantity'] <= item['reorder_point']:
-                status = 'Low'
-            else:
-                status = 'OK'
-            
-            # Apply filters
-            if status_filter and status != status_filter:
-                continue
-            if location_filter and item.get('location') != location_filter:
-                continue
-            if category_filter and item.get('category') != category_filter:
-                continue
-            if search_query and search_query.lower() not in item['name'].lower():
-                continue
-            
-            item_data = {
-                'id': item['id'],
-                'name': item['name'],
-                'sku': item['sku'],
-                'quantity': item['quantity'],
-                'unit': item['unit'],
-                'status': status,
-                'location': item.get('location', 'Unknown'),
-                'category': item.get('category', 'Uncategorized'),
-                'supplier': item.get('supplier', ''),
-                'reorder_point': item.get('reorder_point', 0),
-                'min_quantity': item.get('min_quantity', 0),
-                'unit_cost': item.get('unit_cost', 0),
-                'description': item.get('description', ''),
-                'last_restock': None,
-                'last_updated': item.get('updated_at', datetime.now().isoformat())
-            }
-            items_data.append(item_data)
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ListQueryError(f'limit must be between 1 and {MAX_LIMIT}')
+        cursor = request.args.get('cursor')
+        after_id = decode_cursor(cursor) if cursor else None
+    except (ValueError, ListQueryError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        rows, has_more = StockService.list_items(
+            status=request.args.get('status') or None,
+            location=request.args.get('location') or None,
+            category=request.args.get('category') or None,
+            search=request.args.get('search') or None,
+            after_id=after_id,
+            limit=limit
+        )
+        items_data = [_stock_item_dict(row) for row in rows]
+        next_cursor = encode_cursor(rows[-1].id) if has_more else None
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'items': items_data,
             'count': len(items_data),
-            'mock': True
+            'next_cursor': next_cursor
         })
+        if next_cursor:
+            add_next_link(response, next_cursor)
+        return response
         
     except Exception as e:
         current_app.logger.error(f"Error fetching stock items: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
-        # Return mock data as fallback
-        mock_items = [
-            {
-                'id': 1,
-                'name': 'Coffee Beans',
-                'sku': 'CB001',
-                'quantity': 3,
-                'unit': 'kg',
-                'status': 'Critical',
-                'location': 'Kitchen',
-                'category': 'Food & Beverage',
-                'supplier': 'Bean Co.',
-                'reorder_point': 5,
-                'min_quantity': 2,
-                'unit_cost': 25.00,
-                'last_restock': None,
-                'last_updated': datetime.now().isoformat()
-            },
-            {
-                'id': 2,
-                'name': 'Milk',
-                'sku': 'MK001',
-                'quantity': 10,
-                'unit': 'liters',
-                'status': 'Low',
-                'location': 'Fridge',
-                'category': 'Food & Beverage',
-                'supplier': 'Dairy Fresh',
-                'reorder_point': 15,
-                'min_quantity': 5,
-                'unit_cost': 1.50,
-                'last_restock': None,
-                'last_updated': datetime.now().isoformat()
-            },
-            {
-                'id': 3,
-                'name': 'Coffee Filters',
-                'sku': 'CF001',
-                'quantity': 25,
-                'unit': 'pieces',
-                'status': 'OK',
-                'location': 'Store',
-                'category': 'Office Supplies',
-                'supplier': 'Office Plus',
-                'reorder_point': 20,
-                'min_quantity': 10,
-                'unit_cost': 0.15,
-                'last_restock': None,
-                'last_updated': datetime.now().isoformat()
-            },
-            {
-                'id': 4,
-                'name': 'Printer Paper',
-                'sku': 'PP001',
-                'quantity': 2,
-                'unit': 'packs',
-                'status': 'Low',
-                'location': 'Storage',
-                'category': 'Office Supplies',
-                'supplier': 'Paper World',
-                'reorder_point': 5,
-                'min_quantity': 3,
-                'unit_cost': 8.50,
-                'last_restock': None,
-                'last_updated': datetime.now().isoformat()
-            }
-        ]
-        
-        return jsonify({
-            'success': True,
-            'items': mock_items,
-            'count': len(mock_items),
-            'mock': True
-        })
 
 @stock_bp.route('/items', methods=['POST'])
 def create_stock_item():
@@ -230,48 +138,54 @@ def create_stock_item():
         if not sku:
             name_part = ''.join(c.upper() for c in data['name'] if c.isalnum())[:3]
             time_part = str(int(datetime.now().timestamp()))[-6:]
-            sku = f"{name_part}{time_part}"
-        
-        # Generate new ID
-        new_id = max([item['id'] for item in DEMO_ITEMS], default=0) + 1
-        
-        # Create new stock item
-        new_item = {
-            'id': new_id,
-            'name': data['name'],
-            'sku': sku,
-            'quantity': float(data['quantity']),
-            'unit': data['unit'],
-            'location': data.get('location', ''),
-            'category': data.get('category', ''),
-            'supplier': data.get('supplier', ''),
-            'reorder_point': float(data.get('reorder_point', 5)),
-            'min_quantity': float(data.get('min_quantity', 0)),
-            'unit_cost': float(data.get('unit_cost', 0)) if data.get('unit_cost') else 0,
-            'description': data.get('description', ''),
-            'updated_at': datetime.now().isoformat()
-        }
+            sku = base_sku = f"{name_part}{time_part}"
+            # SKUs are unique; items created in the same second get a suffix
+            suffix = 1
+            while db.session.query(StockItem.id).filter_by(sku=sku).first():
+                suffix += 1
+                sku = f"{base_sku}-{suffix}"
+        
+        item = StockItem(
+            name=data['name'],
+            sku=sku,
+            quantity=float(data['quantity']),
+            unit=data['unit'],
+            supplier=data.get('supplier', ''),
+            reorder_point=float(data.get('reorder_point', 5)),
+            min_quantity=float(data.get('min_quantity', 0)),
+            unit_cost=float(data['unit_cost']) if data.get('unit_cost') else 0,
+            description=data.get('description', '')
+        )
+        if data.get('location'):
+            item.location_id = _get_or_create_location(data['location']).id
+        if data.get('category'):
+            item.category_id = _get_or_create_category(data['category']).id
         
-        # Add to demo items list
-        DEMO_ITEMS.append(new_item)
+        db.session.add(item)
+        db.session.commit()
         
-        current_app.logger.info(f"Added demo item: {new_item['name']} (ID: {new_id})")
+        ActivityLog.create(
+            category='stock',
+            action='item_created',
+            description=f'Stock item "{item.name}" created',
+            event_data={'item_id': item.id, 'sku': item.sku}
+        )
         
         return jsonify({
             'success': True,
             'item': {
-                'id': new_item['id'],
-                'name': new_item['name'],
-                'sku': new_item['sku'],
-                'quantity': new_item['quantity'],
-                'unit': new_item['unit']
-            },
-            'demo': True
+                'id': item.id,
+                'name': item.name,
+                'sku': item.sku,
+                'quantity': item.quantity,
+                'unit': item.unit
+            }
         }), 201
         
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'SKU already exists: {sku}'}), 409
     except Exception as e:
-        current_app.logger.error(f"Error creating stock item: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
         db.session.rollback()
         current_app.logger.error(f"Error creating stock item: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -310,21 +224,11 @@ def update_stock_item(item_id):
         
         # Update location if provided
         if 'location' in data and data['location']:
-            location = StockLocation.query.filter_by(name=data['location']).first()
-            if not location:
-                location = StockLocation(name=data['location'], area='General')
-                db.session.add(location)
-                db.session.flush()
-            item.location_id = location.id
+            item.location_id = _get_or_create_location(data['location']).id
         
         # Update category if provided
         if 'category' in data and data['category']:
-            category = StockCategory.query.filter_by(name=data['category']).first()
-            if not category:
-                category = StockCategory(name=data['category'])
-                db.session.add(category)
-                db.session.flush()
-            item.category_id = category.id
+            item.category_id = _get_or_create_category(data['category']).id
         
         db.session.commit()
         
@@ -854,24 +758,8 @@ def cancel_order(order_id):
 def get_stock_summary():
     """Get stock summary statistics"""
     try:
-        # Get all items with their calculated statuses
-        items = StockItem.query.all()
-        
-        total_items = len(items)
-        low_stock_items = 0
-        critical_stock_items = 0
-        total_value = 0
-        
-        for item in items:
-            # Calculate status
-            if item.quantity <= 0:
-                critical_stock_items += 1
-            elif item.reorder_point and item.quantity <= item.reorder_point:
-                low_stock_items += 1
-            
-            # Calculate value
-            if item.unit_cost and item.quantity:
-                total_value += item.unit_cost * item.quantity
+        # Counts by status and total value, aggregated in SQL
+        totals = StockService.get_stock_totals()
         
         # Get total locations
         total_locations = StockLocation.query.count()
@@ -887,11 +775,11 @@ def get_stock_summary():
         return jsonify({
             'success': True,
             'summary': {
-                'total_items': total_items,
-                'low_stock_items': low_stock_items,
-                'critical_stock_items': critical_stock_items,
+                'total_items': totals['total_items'],
+                'low_stock_items': totals['by_status']['Low'],
+                'critical_stock_items': totals['by_status']['Critical'],
                 'total_locations': total_locations,
-                'total_value': round(total_value, 2),
+                'total_value': totals['total_value'],
                 'recent_activity': recent_activity,
                 'pending_orders': 0  # Mock for now
             }
@@ -903,33 +791,10 @@ def get_stock_summary():
 
 @stock_bp.route('/alerts', methods=['GET'])
 def get_stock_alerts():
-    """Get stock alerts (low/critical items)"""
+    """Get stock alerts (low/critical items, critical first)"""
     try:
-        items = StockItem.query.all()
-        alerts = []
-        
-        for item in items:
-            if item.quantity <= 0:
-                alerts.append({
-                    'id': item.id,
-                    'item': item.name,
-                    'type': 'critical',
-                    'message': f'Out of stock - {item.name}',
-                    'current_quantity': item.quantity,
-                    'unit': item.unit,
-                    'recommended_order': item.reorder_point * 2 if item.reorder_point else 10
-                })
-            elif item.reorder_point and item.quantity <= item.reorder_point:
-                alerts.append({
-                    'id': item.id,
-                    'item': item.name,
-                    'type': 'low',
-                    'message': f'Low stock - {item.name}',
-                    'current_quantity': item.quantity,
-                    'unit': item.unit,
-                    'reorder_point': item.reorder_point,
-                    'recommended_order': item.reorder_point * 2
-                })
+        # Only the flagged items are read, via ix_stock_items_status
+        alerts = StockService.get_stock_alerts()
         
         return jsonify({
             'success': True,
@@ -941,22 +806,62 @@ def get_stock_alerts():
         current_app.logger.error(f"Error getting stock alerts: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@stock_bp.route('/valuation', methods=['GET'])
+def get_stock_valuation():
+    """Stock value and status counts in total and per location and category"""
+    try:
+        totals = StockService.get_stock_totals()
+        return jsonify({
+            'success': True,
+            'valuation': {
+                **totals,
+                'locations': StockService.get_breakdown('location'),
+                'categories': StockService.get_breakdown('category')
+            }
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting stock valuation: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stock_bp.route('/reorder-suggestions', methods=['GET'])
+def get_reorder_suggestions():
+    """Reorder suggestions from forecast demand, soonest order date first
+    
+    Query params: lead_time_days and cover_days (override REORDER_* config),
+    all=1 to return the forecast for every item rather than only those to order.
+    """
+    try:
+        overrides = {name: int(request.args[name]) for name in ('lead_time_days', 'cover_days')
+                     if request.args.get(name)}
+    except ValueError:
+        return jsonify({'success': False, 'error': 'lead_time_days and cover_days must be integers'}), 400
+    if any(value < 0 for value in overrides.values()):
+        return jsonify({'success': False, 'error': 'lead_time_days and cover_days must not be negative'}), 400
+    
+    try:
+        include_all = request.args.get('all', '').lower() in ('1', 'true', 'yes')
+        suggestions = forecast_reorders(include_all=include_all, **overrides)
+        return jsonify({
+            'success': True,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting reorder suggestions: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ============ LOCATIONS & CATEGORIES ============
 
 @stock_bp.route('/locations', methods=['GET'])
 def get_locations():
     """Get all stock locations"""
     try:
-        locations = StockLocation.query.all()
+        # Item counts come from one GROUP BY rather than loading each location's items
         locations_data = [
-            {
-                'id': loc.id,
-                'name': loc.name,
-                'area': loc.area,
-                'description': loc.description,
-                'item_count': len(loc.items)
-            }
-            for loc in locations
+            {key: entry[key] for key in ('id', 'name', 'area', 'description', 'item_count')}
+            for entry in StockService.get_breakdown('location') if entry['id'] is not None
         ]
         
         return jsonify({
@@ -972,15 +877,9 @@ def get_locations():
 def get_categories():
     """Get all stock categories"""
     try:
-        categories = StockCategory.query.all()
         categories_data = [
-            {
-                'id': cat.id,
-                'name': cat.name,
-                'description': cat.description,
-                'item_count': len(cat.items)
-            }
-            for cat in categories
+            {key: entry[key] for key in ('id', 'name', 'description', 'item_count')}
+            for entry in StockService.get_breakdown('category') if entry['id'] is not None
         ]
         
         return jsonify({
@@ -1033,17 +932,21 @@ def get_transactions():
 
 # ============ EXPORT ============
 
+def _export_options():
+    """(format, gzip) from the export endpoints' query arguments"""
+    fmt = request.args.get('format', 'csv').lower()
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    return fmt, compress
+
 @stock_bp.route('/export', methods=['GET'])
 def export_orders_report():
-    """Export orders report with filtering by time period"""
+    """Export orders report with filtering by time period, streamed as CSV or NDJSON"""
     try:
-        import csv
-        from io import StringIO
-        from flask import Response
-        
         # Get parameters
         period = request.args.get('period', 'all')
-        format_type = request.args.get('format', 'csv')
+        format_type, compress = _export_options()
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
         
         # Calculate date cutoff based on period
         now = datetime.now()
@@ -1057,69 +960,49 @@ def export_orders_report():
             cutoff = None
             period_label = 'All Time'
         
-        # Filter orders by date
-        if cutoff:
-            filtered_orders = [
-                order for order in DEMO_ORDERS 
-                if datetime.fromisoformat(order['created_at']) >= cutoff
+        # Filter orders by date, newest first
+        filtered_orders = sorted(
+            (order for order in DEMO_ORDERS
+             if cutoff is None or datetime.fromisoformat(order['created_at']) >= cutoff),
+            key=lambda x: x['created_at'], reverse=True
+        )
+        
+        # Totals for the CSV summary, gathered as the rows are written
+        totals = {'orders': 0, 'value': 0.0}
+        as_csv = format_type == 'csv'
+        
+        def rows():
+            for order in filtered_orders:
+                totals['orders'] += 1
+                totals['value'] += order['total_cost']
+                yield (
+                    order['order_id'],
+                    datetime.fromisoformat(order['created_at']).strftime('%Y-%m-%d %H:%M') if as_csv else order['created_at'],
+                    order['item_name'],
+                    order['quantity'],
+                    order['unit'],
+                    f"{order['total_cost']:.2f}" if as_csv else order['total_cost'],
+                    order['supplier'],
+                    order['status'],
+                    order['priority'],
+                    order.get('notes', 'N/A')
+                )
+        
+        def summary():
+            return [
+                [],
+                ['SUMMARY'],
+                ['Total Orders:', totals['orders']],
+                ['Total Value:', f"R{totals['value']:.2f}"],
+                ['Period:', period_label]
             ]
-        else:
-            filtered_orders = DEMO_ORDERS
-        
-        # Sort by date (newest first)
-        filtered_orders = sorted(filtered_orders, key=lambda x: x['created_at'], reverse=True)
-        
-        # Generate CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Title and period
-        writer.writerow(['Orders Report - ' + period_label])
-        writer.writerow(['Generated:', now.strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow([])
-        
-        # Header row
-        writer.writerow([
-            'Order ID', 'Date Placed', 'Item Name', 'Quantity', 'Unit', 
-            'Price (R)', 'Supplier', 'Status', 'Priority', 'Notes'
-        ])
-        
-        # Data rows
-        total_cost = 0
-        for order in filtered_orders:
-            date_placed = datetime.fromisoformat(order['created_at']).strftime('%Y-%m-%d %H:%M')
-            writer.writerow([
-                order['order_id'],
-                date_placed,
-                order['item_name'],
-                order['quantity'],
-                order['unit'],
-                f"{order['total_cost']:.2f}",
-                order['supplier'],
-                order['status'],
-                order['priority'],
-                order.get('notes', 'N/A')
-            ])
-            total_cost += order['total_cost']
-        
-        # Summary section
-        writer.writerow([])
-        writer.writerow(['SUMMARY'])
-        writer.writerow(['Total Orders:', len(filtered_orders)])
-        writer.writerow(['Total Value:', f"R{total_cost:.2f}"])
-        writer.writerow(['Period:', period_label])
-        
-        # Prepare response
-        output.seek(0)
-        filename = f"orders_report_{period}_{now.strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename={filename}',
-                'Content-Type': 'text/csv; charset=utf-8'
-            }
+        
+        return export_response(
+            format_type, ORDER_EXPORT_COLUMNS, rows(),
+            filename=f"orders_report_{period}_{now.strftime('%Y%m%d_%H%M%S')}",
+            compress=compress,
+            preamble=[['Orders Report - ' + period_label], ['Generated:', now.strftime('%Y-%m-%d %H:%M:%S')], []],
+            trailer=summary
         )
         
     except Exception as e:
@@ -1129,59 +1012,76 @@ def export_orders_report():
 
 @stock_bp.route('/export/stock', methods=['GET'])
 def export_stock_data():
-    """Export stock data as CSV"""
+    """Export stock data, streamed as CSV or NDJSON"""
     try:
-        import csv
-        from io import StringIO
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Name', 'SKU', 'Quantity', 'Unit', 'Status', 'Location', 
-            'Category', 'Supplier', 'Reorder Point', 'Unit Cost', 'Last Updated'
-        ])
-        
-        # Get all items
-        items = StockItem.query.join(StockLocation, isouter=True).join(StockCategory, isouter=True).all()
-        
-        for item in items:
-            # Calculate status
-            if item.quantity <= 0:
-                status = 'Critical'
-            elif item.reorder_point and item.quantity <= item.reorder_point:
-                status = 'Low'
-            else:
-                status = 'OK'
-            
-            writer.writerow([
-                item.name,
-                item.sku,
-                item.quantity,
-                item.unit,
-                status,
-                item.location.name if item.location else 'Unknown',
-                item.category.name if item.category else 'Uncategorized',
-                item.supplier,
-                item.reorder_point,
-                item.unit_cost,
-                item.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        output.seek(0)
+        format_type, compress = _export_options()
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        
+        rows = db.session.execute(
+            select(StockItem.name, StockItem.sku, StockItem.quantity, StockItem.unit, stock_status,
+                   func.coalesce(StockLocation.name, 'Unknown'), func.coalesce(StockCategory.name, 'Uncategorized'),
+                   StockItem.supplier, StockItem.reorder_point, StockItem.unit_cost, StockItem.updated_at)
+            .outerjoin(StockLocation, StockItem.location_id == StockLocation.id)
+            .outerjoin(StockCategory, StockItem.category_id == StockCategory.id)
+            .order_by(StockItem.id)
+            .execution_options(yield_per=EXPORT_BATCH_ROWS)
+        )
         
-        return jsonify({
-            'success': True,
-            'data': output.getvalue(),
-            'filename': f'stock_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        })
+        return export_response(format_type, STOCK_EXPORT_COLUMNS, rows,
+                               filename=f'stock_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+                               compress=compress)
         
     except Exception as e:
         current_app.logger.error(f"Error exporting stock data: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@stock_bp.route('/export/transactions', methods=['GET'])
+def export_transactions():
+    """Export stock transactions oldest first, streamed as CSV or NDJSON
+    
+    Optional filters: item_id, type (in, out, adjustment), since and until
+    (ISO dates or datetimes, until exclusive).
+    """
+    try:
+        format_type, compress = _export_options()
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        try:
+            item_id = int(request.args['item_id']) if request.args.get('item_id') else None
+            since, until = (datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+                            for name in ('since', 'until'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'item_id must be an integer and since/until ISO dates'}), 400
+        
+        query = (
+            select(StockTransaction.id, StockTransaction.created_at, StockTransaction.item_id, StockItem.sku,
+                   StockItem.name, StockTransaction.type, StockTransaction.quantity, StockTransaction.reference,
+                   StockTransaction.notes, StockTransaction.user_id)
+            .join(StockItem, StockTransaction.item_id == StockItem.id)
+        )
+        if item_id is not None:
+            query = query.where(StockTransaction.item_id == item_id)
+        if request.args.get('type'):
+            query = query.where(StockTransaction.type == request.args['type'])
+        if since is not None:
+            query = query.where(StockTransaction.created_at >= since)
+        if until is not None:
+            query = query.where(StockTransaction.created_at < until)
+        
+        # Primary key order: no sort, so the first rows arrive straight away
+        rows = db.session.execute(query.order_by(StockTransaction.id).execution_options(yield_per=EXPORT_BATCH_ROWS))
+        
+        return export_response(format_type, TRANSACTION_EXPORT_COLUMNS, rows,
+                               filename=f'stock_transactions_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+                               compress=compress)
+        
+    except Exception as e:
+        current_app.logger.error(f"Error exporting transactions: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ============ SUPPLIERS ============
 
 
@@ -8,6 +8,7 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
+from sqlalchemy import inspect
 from sqlalchemy.exc import OperationalError
 
 from dotenv import load_dotenv
@@ -27,8 +28,19 @@ except ImportError:
     print("Warning: APScheduler not installed. Weather updates will be disabled.")
     SCHEDULER_AVAILABLE = False
 
-# Create the db instance first
-db = SQLAlchemy()
+from services.db_engine import RoutingSession
+
+# Create the db instance first (reads of GET requests may go to a replica, see services/db_engine.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def _existing_index_names(engine):
+    """Names of the indexes in the database, including expression indexes"""
+    if engine.dialect.name == 'sqlite':
+        # SQLite reflection skips expression indexes, so ask the catalogue directly
+        with engine.connect() as conn:
+            return set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+    inspector = inspect(engine)
+    return {index['name'] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
 
 def init_db(app):
     """Initialize the database and create all tables"""
@@ -39,12 +51,39 @@ def init_db(app):
                 User, Office, Asset, Booking, Maintenance, DashboardMetric, ActivityLog,
                 Employee, CoffeeMachine, CoffeeOrder, TemperatureSensor, TemperatureReading,
                 StockCategory, StockItem, StockTransaction, StockOrder, PresenceLog, SafetyVisitor,
-                SafetyEvent, MeetingRoom
+                SafetyEvent, MeetingRoom, CurrentPresence, WeatherData, ClimateRollup, StockConsumption
             )
             
             # Create database tables
             db.create_all()
             
+            # create_all() skips tables that already exist, so add any indexes
+            # declared on the models since those tables were first created
+            existing_indexes = _existing_index_names(db.engine)
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name not in existing_indexes:
+                        index.create(db.engine)
+            
+            # FTS5 search tables and their sync triggers (filled when first created)
+            from services.search_index import ensure_search_index
+            ensure_search_index(db.engine)
+            
+            # Backfill the materialized presence table the first time it appears
+            if not CurrentPresence.query.first() and PresenceLog.query.first():
+                from services.presence_service import rebuild_current_presence
+                rebuild_current_presence()
+            
+            # Same for the chart rollups
+            if not ClimateRollup.query.first() and (TemperatureReading.query.first() or WeatherData.query.first()):
+                from services.climate_rollups import rebuild_rollups
+                rebuild_rollups()
+            
+            # ...and the daily stock consumption behind the reorder forecast
+            if not StockConsumption.query.first() and StockTransaction.query.filter_by(type='out').first():
+                from services.reorder_engine import rebuild_consumption
+                rebuild_consumption()
+            
             # Check if we need to seed initial data
             if not User.query.first():
                 # Create a default admin user
@@ -69,25 +108,46 @@ def init_db(app):
 migrate = Migrate()
 jwt = JWTManager()
 
+def start_weather_poller(app):
+    """Schedule the WeatherStation poller (services.weather_poller) in the background"""
+    if not SCHEDULER_AVAILABLE or not app.config.get('WEATHER_POLLER_ENABLED', True):
+        return None
+    
+    from services.weather_poller import poll_due_stations
+    
+    # Each tick only polls the stations whose own update_interval has elapsed
+    tick = app.config.get('WEATHER_POLL_TICK', 60)
+    scheduler = BackgroundScheduler(daemon=True)
+    if IntervalTrigger is not None:
+        scheduler.add_job(poll_due_stations, IntervalTrigger(seconds=tick), args=[app],
+                          id='weather_poller', max_instances=1, coalesce=True)
+    else:
+        scheduler.add_job(poll_due_stations, 'interval', seconds=tick, args=[app],
+                          id='weather_poller', max_instances=1, coalesce=True)
+    scheduler.start()
+    atexit.register(lambda: scheduler.shutdown(wait=False))
+    print(f"🌤️ Weather poller scheduled every {tick}s")
+    return scheduler
+
 def create_app():
     # Load environment variables
     load_dotenv()
     
     app = Flask(__name__, static_folder='static', template_folder='templates')
 
-    # Use same temp directory approach as login portal for consistency
+    # DATABASE_URL wins; otherwise the SQLite file shared with the login portal in the temp dir
+    from services.db_engine import database_uri, display_url, replica_urls
     import tempfile
     temp_dir = tempfile.gettempdir()
     db_path = os.path.join(temp_dir, "office_eathon.db")
     
-    print(f"📁 Using shared database: {db_path}")
-    
     # Use forward slashes for SQLite URI on Windows (SQLAlchemy requirement)
     db_uri_path = db_path.replace('\\', '/')
     
-    # Simple database URI using temp path with proper format
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_uri_path}'
-    print(f"🔌 Using DB URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(default=f'sqlite:///{db_uri_path}')
+    print(f"🔌 Using DB URI: {display_url(app.config['SQLALCHEMY_DATABASE_URI'])}")
+    for replica in replica_urls(app):
+        print(f"📖 Read replica: {display_url(replica)}")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'devsecret')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwtsecret')
@@ -95,8 +155,9 @@ def create_app():
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
-    # Initialize extensions
-    db.init_app(app)
+    # Initialize extensions (SQLite runs in WAL mode with a busy timeout, see services/db_engine.py)
+    from services.db_engine import init_database
+    init_database(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     CORS(app, supports_credentials=True)
@@ -105,6 +166,36 @@ def create_app():
     app.app_context().push()
     init_db(app)
 
+    # Buffered ActivityLog writes (replays events spilled by a previous run)
+    from services.activity_log import activity_writer
+    activity_writer.init_app(app)
+
+    # Booking overlap checks and free-slot search (in-memory interval index)
+    from services.booking_engine import booking_engine
+    booking_engine.init_app(app)
+
+    # Meeting room finder and week-view occupancy bitmaps, built on the booking index
+    from services.room_finder import room_finder
+    room_finder.init_app(app)
+
+    # AI chat context is served from a snapshot refreshed on TTL or after writes
+    from services.office_context import office_context
+    office_context.init_app(app)
+
+    # /api/ai_stream answers are streamed from a capped worker pool with a wait queue (AI_STREAM_*);
+    # behind a fixed-thread server set AI_STREAM_SERVER_THREADS so chats can't take every thread
+    from services.ai_streaming import ai_stream_pool
+    ai_stream_pool.init_app(app)
+
+    # Pooled clients for OpenWeatherMap and Azure OpenAI (OUTBOUND_* settings)
+    from services.http_client import outbound
+    outbound.init_app(app)
+
+    # Weather lookups are served from cache; refreshes happen in the background
+    from services.weather_cache import weather_cache
+    weather_cache.init_app(app)
+    start_weather_poller(app)
+
     # Explicit test connection to surface any OperationalError early
     try:
         with app.app_context():
@@ -150,43 +241,64 @@ def create_app():
 
     @app.route('/api/temperature/comparison')
     def temperature_comparison():
-        """Get temperature comparison data for charting"""
+        """Get temperature comparison data for charting
+        
+        Query params: office_id (default 1) and hours (default 24). Series are
+        read from the climate rollups at a resolution picked from the range;
+        live/mock data is only used while no readings have been recorded.
+        """
         try:
+            from datetime import datetime
+            from models import Office
+            from services.climate_rollups import get_series
             from services.mock_data import get_mock_office_data
-            from services.openweathermap import fetch_forecast_weather, fetch_hourly_weather
-
-            # For now, use a default Cape Town Pinelands office without database
-            office_id = 1
-            office_name = 'Cape Town Pinelands Office'
-            
-            # Always generate indoor (mock) data for now
-            indoor_data, outdoor_mock = get_mock_office_data(office_id)
-
-            # Try to get real outdoor data from OpenWeatherMap
-            outdoor_data = None
-            
-            # First try to get Cape Town, Pinelands weather
-            try:
-                owm_data = fetch_forecast_weather("Cape Town", hours=24)
-                if owm_data:
-                    outdoor_data = [
-                        {
-                            'timestamp': item.get('timestamp'),
-                            'temperature': item.get('temperature'),
-                            'humidity': item.get('humidity'),
-                            'description': item.get('conditions')
-                        }
-                        for item in owm_data
-                    ]
-            except Exception as e:
-                app.logger.warning(f"OpenWeatherMap city fetch failed: {e}")
+            from services.weather_cache import station_ttl, weather_cache
+
+            office_id = request.args.get('office_id', 1, type=int)
+            hours = max(1, min(request.args.get('hours', 24, type=int), 24 * 366))
+            end = datetime.utcnow()
+            start = end - timedelta(hours=hours)
+
+            office = db.session.get(Office, office_id)
+            office_name = office.name if office else 'Cape Town Pinelands Office'
+
+            indoor = get_series('office_indoor', office_id, start, end)
+            outdoor = get_series('office_outdoor', office_id, start, end)
+            indoor_data = indoor['points']
+            outdoor_data = outdoor['points']
+
+            # Generated indoor data until the office's sensors report in
+            outdoor_mock = None
+            if not indoor_data:
+                indoor_data, outdoor_mock = get_mock_office_data(office_id)
+
+            # Stations are polled in the background (services.weather_poller), so
+            # outdoor_data normally comes from local rows. Offices without a
+            # station fall back to Cape Town, Pinelands weather; both lookups
+            # answer from cache and never wait on OpenWeatherMap
+            weather_ttl = station_ttl(office.id if office else None)
+            if not outdoor_data:
+                try:
+                    owm_data = weather_cache.forecast("Cape Town", hours=24, ttl=weather_ttl)
+                    if owm_data:
+                        outdoor_data = [
+                            {
+                                'timestamp': item.get('timestamp'),
+                                'temperature': item.get('temperature'),
+                                'humidity': item.get('humidity'),
+                                'description': item.get('conditions')
+                            }
+                            for item in owm_data
+                        ]
+                except Exception as e:
+                    app.logger.warning(f"OpenWeatherMap city fetch failed: {e}")
             
             # If city lookup fails, try using coordinates (-33.9249, 18.4241)
             if not outdoor_data:
                 try:
                     lat = -33.9249
                     lon = 18.4241
-                    owm_data = fetch_hourly_weather(lat, lon, hours=24)
+                    owm_data = weather_cache.hourly(lat, lon, hours=24, ttl=weather_ttl)
                     if owm_data:
                         outdoor_data = [
                             {
@@ -202,10 +314,13 @@ def create_app():
 
             # Fallback to mock outdoor data if OpenWeatherMap failed or not available
             if not outdoor_data:
+                if outdoor_mock is None:
+                    _, outdoor_mock = get_mock_office_data(office_id)
                 outdoor_data = outdoor_mock
 
             office_data = {
                 'office_name': office_name,
+                'resolution': indoor['resolution'],
                 'indoor_data': indoor_data,
                 'outdoor_data': outdoor_data
             }
@@ -215,6 +330,41 @@ def create_app():
             app.logger.error(f"Error in temperature comparison: {e}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/weather/cache')
+    def weather_cache_stats():
+        """Hit/miss counters for the OpenWeatherMap cache"""
+        from services.weather_cache import weather_cache
+        return jsonify({'success': True, 'stats': weather_cache.stats()})
+
+    @app.route('/api/integrations/stats')
+    def integration_stats():
+        """Latency histograms, retry counters and breaker states per outbound integration"""
+        from services.http_client import outbound
+        return jsonify({'success': True, 'stats': outbound.stats()})
+
+    @app.route('/api/temperature/history')
+    def temperature_history():
+        """Rolled-up chart series for one sensor, station or office
+        
+        Query params: scope (sensor, station, office_indoor, office_outdoor),
+        id, hours (default 24) and optional resolution (5m, 1h, 1d).
+        """
+        from datetime import datetime
+        from services.climate_rollups import RESOLUTIONS, SCOPES, get_series
+
+        scope = request.args.get('scope', 'office_indoor')
+        source_id = request.args.get('id', type=int)
+        resolution = request.args.get('resolution')
+        if scope not in SCOPES or source_id is None:
+            return jsonify({'success': False, 'error': f'scope must be one of {", ".join(SCOPES)} and id is required'}), 400
+        if resolution and resolution not in RESOLUTIONS:
+            return jsonify({'success': False, 'error': f'resolution must be one of {", ".join(RESOLUTIONS)}'}), 400
+
+        hours = max(1, min(request.args.get('hours', 24, type=int), 24 * 366))
+        end = datetime.utcnow()
+        series = get_series(scope, source_id, end - timedelta(hours=hours), end, resolution)
+        return jsonify({'success': True, 'scope': scope, 'id': source_id, **series})
+
     @app.route('/_dev/seed_stock')
     def _dev_seed_stock():
         """Dev helper: seed stock data when called with the secret query param.
@@ -339,6 +489,7 @@ def create_app():
         try:
             import random
             from datetime import datetime
+            from services.comfort import evaluate_comfort
             
             # Generate mock room data (6 rooms across 2 floors)
             rooms_data = []
@@ -351,42 +502,25 @@ def create_app():
                 {'name': 'Innovation Lab F', 'floor': 2, 'capacity': 12},
             ]
             
+            current_temps = [round(random.uniform(20.5, 24.5), 1) for _ in room_configs]
+            humidities = [round(random.uniform(40, 60), 1) for _ in room_configs]
+            target_temp = 22.0
+            
+            # HVAC and comfort status for every room in one pass
+            evaluation = evaluate_comfort(current_temps, humidities, target_temp)
+            
             for i, room_config in enumerate(room_configs, 1):
-                current_temp = round(random.uniform(20.5, 24.5), 1)
-                target_temp = 22.0
-                humidity = round(random.uniform(40, 60), 1)
-                
-                # Determine HVAC status based on temperature
-                diff = current_temp - target_temp
-                if diff > 1:
-                    hvac_status = 'cooling'
-                elif diff < -1:
-                    hvac_status = 'heating'
-                else:
-                    hvac_status = 'auto'
-        
-                # Calculate comfort status
-                temp_ok = abs(current_temp - target_temp) <= 1.5
-                humidity_ok = 30 <= humidity <= 60
-                
-                if temp_ok and humidity_ok:
-                    comfort_status = 'comfortable'
-                elif temp_ok or humidity_ok:
-                    comfort_status = 'moderate'
-                else:
-                    comfort_status = 'uncomfortable'
-                
                 rooms_data.append({
                     'id': i,
                     'name': room_config['name'],
                     'floor': room_config['floor'],
                     'capacity': room_config['capacity'],
-                    'current_temperature': current_temp,
+                    'current_temperature': current_temps[i - 1],
                     'target_temperature': target_temp,
-                    'humidity': humidity,
-                    'hvac_status': hvac_status,
+                    'humidity': humidities[i - 1],
+                    'hvac_status': evaluation.hvac_status[i - 1],
                     'hvac_mode': 'auto',
-                    'comfort_status': comfort_status,
+                    'comfort_status': evaluation.comfort_status[i - 1],
                     'last_adjusted': None
                 })
             
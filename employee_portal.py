@@ -13,18 +13,18 @@ from datetime import datetime
 
 # Import models and database from main app
 from app import db
-from models import Employee, User, PresenceLog, Office, PresenceStatus
+from models import Employee, User, PresenceLog, Office, PresenceStatus, CurrentPresence
+from services.db_engine import database_uri, display_url, init_database, run_with_retry
 
 def create_employee_portal():
     """Create the employee portal Flask application"""
     app = Flask(__name__)
     
-    # Get the database path from environment or use default temp location
+    # DATABASE_URL wins; otherwise the default temp location
     db_path = os.path.join(os.environ.get('TEMP', '/tmp'), 'office_eathon.db')
-    db_uri = f'sqlite:///{db_path}'
+    db_uri = database_uri(default=f'sqlite:///{db_path}')
     
-    print(f"📁 Employee Portal using database: {db_path}")
-    print(f"🔌 Using DB URI: {db_uri}")
+    print(f"🔌 Employee Portal using DB URI: {display_url(db_uri)}")
     
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
@@ -34,8 +34,8 @@ def create_employee_portal():
     # Enable CORS
     CORS(app)
     
-    # Initialize database with this app
-    db.init_app(app)
+    # Initialize database with this app (same WAL/busy_timeout settings as the dashboard)
+    init_database(app)
     
     # Routes
     @app.route('/')
@@ -82,15 +82,19 @@ def create_employee_portal():
             # Create presence log entry
             presence_status = PresenceStatus.IN if status == 'in' else PresenceStatus.OUT
             
-            new_log = PresenceLog(
-                user_id=user.id,
-                status=presence_status,
-                location=f"Office {employee.office_id}",
-                notes=f"Employee {status} via portal"
-            )
+            def record_check_in():
+                log = PresenceLog(
+                    user_id=user.id,
+                    status=presence_status,
+                    location=f"Office {employee.office_id}",
+                    notes=f"Employee {status} via portal"
+                )
+                db.session.add(log)
+                db.session.commit()
+                return log
             
-            db.session.add(new_log)
-            db.session.commit()
+            # The dashboard process writes to the same file; retry if it holds the lock
+            new_log = run_with_retry(record_check_in)
             
             print(f"✅ {user.name} checked {status} successfully")
             
@@ -125,12 +129,10 @@ def create_employee_portal():
             if not employee:
                 return jsonify({'error': 'Employee record not found'}), 404
             
-            # Get latest presence log
-            latest_log = PresenceLog.query.filter_by(
-                user_id=user.id
-            ).order_by(PresenceLog.created_at.desc()).first()
+            # Get current presence (maintained on every PresenceLog insert)
+            current = db.session.get(CurrentPresence, user.id)
             
-            current_status = latest_log.status.value if latest_log else 'OUT'
+            current_status = current.status.value if current else 'OUT'
             
             return jsonify({
                 'user': {
@@ -139,7 +141,7 @@ def create_employee_portal():
                     'department': employee.department
                 },
                 'status': current_status,
-                'last_update': latest_log.created_at.isoformat() if latest_log else None
+                'last_update': current.since.isoformat() if current else None
             }), 200
             
         except Exception as e:
@@ -1,7 +1,7 @@
 """Add weather and WiFi sensor support
 
 Revision ID: 2023_10_23_add_weather
-Revises: 2023_10_23_update_models
+Revises: 2023_10_23_update
 Create Date: 2023-10-23
 
 """
@@ -10,7 +10,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '2023_10_23_add_weather'
-down_revision = '2023_10_23_update_models'
+down_revision = '2023_10_23_update'
 branch_labels = None
 depends_on = None
 
@@ -57,17 +57,17 @@ def upgrade():
     )
 
     # Add weather_data_id to temperature_readings
-    op.add_column('temperature_readings', 
-        sa.Column('weather_data_id', sa.Integer(), nullable=True)
-    )
-    op.create_foreign_key(None, 'temperature_readings', 'weather_data', 
-        ['weather_data_id'], ['id']
-    )
+    # (batch mode: SQLite can't add a constraint with ALTER TABLE)
+    with op.batch_alter_table('temperature_readings') as batch_op:
+        batch_op.add_column(sa.Column('weather_data_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_temperature_readings_weather_data_id_weather_data',
+                                    'weather_data', ['weather_data_id'], ['id'])
 
 def downgrade():
     # Drop foreign key first
-    op.drop_constraint(None, 'temperature_readings', type_='foreignkey')
-    op.drop_column('temperature_readings', 'weather_data_id')
+    with op.batch_alter_table('temperature_readings') as batch_op:
+        batch_op.drop_constraint('fk_temperature_readings_weather_data_id_weather_data', type_='foreignkey')
+        batch_op.drop_column('weather_data_id')
 
     # Drop weather tables
     op.drop_table('weather_data')
@@ -1,13 +1,12 @@
 """Update models with integrated relationships
 
 Revision ID: 2023_10_23_update
-Revises: 
+Revises:
 Create Date: 2023-10-23
 
 """
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = '2023_10_23_update'
@@ -15,13 +14,19 @@ down_revision = None
 branch_labels = None
 depends_on = None
 
+# Column changes go through batch_alter_table so the same script runs on
+# SQLite (which can't ALTER constraints, so the table is copied) and on
+# PostgreSQL (plain ALTER TABLE). Foreign keys are named so downgrade can
+# drop them on every backend.
+
 def upgrade():
     # Add temperature sensor changes first
-    op.add_column('temperature_sensors', sa.Column('office_id', sa.Integer(), nullable=True))
-    op.add_column('temperature_sensors', sa.Column('location_detail', sa.String(length=100), nullable=True))
-    op.create_foreign_key(None, 'temperature_sensors', 'offices', ['office_id'], ['id'])
-    op.drop_column('temperature_sensors', 'location')
-    
+    with op.batch_alter_table('temperature_sensors') as batch_op:
+        batch_op.add_column(sa.Column('office_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_detail', sa.String(length=100), nullable=True))
+        batch_op.create_foreign_key('fk_temperature_sensors_office_id_offices', 'offices', ['office_id'], ['id'])
+        batch_op.drop_column('location')
+
     # Create stock_locations table
     op.create_table('stock_locations',
         sa.Column('id', sa.Integer(), nullable=False),
@@ -31,80 +36,93 @@ def upgrade():
         sa.Column('description', sa.Text(), nullable=True),
         sa.Column('created_at', sa.DateTime(), nullable=True),
         sa.Column('updated_at', sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(['office_id'], ['offices.id'], ),
+        sa.ForeignKeyConstraint(['office_id'], ['offices.id'], name='fk_stock_locations_office_id_offices'),
         sa.PrimaryKeyConstraint('id')
     )
 
     # Add new columns to existing tables
-    op.add_column('stock_categories', sa.Column('parent_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'stock_categories', 'stock_categories', ['parent_id'], ['id'])
-
-    op.add_column('stock_items', sa.Column('location_id', sa.Integer(), nullable=True))
-    op.add_column('stock_items', sa.Column('supplier', sa.String(length=200), nullable=True))
-    op.add_column('stock_items', sa.Column('unit_cost', sa.Float(), nullable=True))
-    op.create_foreign_key(None, 'stock_items', 'stock_locations', ['location_id'], ['id'])
-
-    op.add_column('employees', sa.Column('office_id', sa.Integer(), nullable=True))
-    op.add_column('employees', sa.Column('emergency_contact', sa.JSON(), nullable=True))
-    op.add_column('employees', sa.Column('access_level', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'employees', 'offices', ['office_id'], ['id'])
-    op.drop_column('employees', 'location')
-
-    op.add_column('coffee_machines', sa.Column('office_id', sa.Integer(), nullable=True))
-    op.add_column('coffee_machines', sa.Column('location_detail', sa.String(length=100), nullable=True))
-    op.add_column('coffee_machines', sa.Column('next_maintenance', sa.DateTime(), nullable=True))
-    op.add_column('coffee_machines', sa.Column('milk_level', sa.Float(), nullable=True))
-    op.add_column('coffee_machines', sa.Column('total_drinks', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'coffee_machines', 'offices', ['office_id'], ['id'])
-    op.drop_column('coffee_machines', 'location')
-
-    op.add_column('safety_visitors', sa.Column('office_id', sa.Integer(), nullable=True))
-    op.add_column('safety_visitors', sa.Column('purpose', sa.String(length=200), nullable=True))
-    op.add_column('safety_visitors', sa.Column('expected_duration', sa.Integer(), nullable=True))
-    op.add_column('safety_visitors', sa.Column('access_areas', sa.JSON(), nullable=True))
-    op.add_column('safety_visitors', sa.Column('vehicle_info', sa.JSON(), nullable=True))
-    op.create_foreign_key(None, 'safety_visitors', 'offices', ['office_id'], ['id'])
+    with op.batch_alter_table('stock_categories') as batch_op:
+        batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_stock_categories_parent_id_stock_categories',
+                                    'stock_categories', ['parent_id'], ['id'])
+
+    with op.batch_alter_table('stock_items') as batch_op:
+        batch_op.add_column(sa.Column('location_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('supplier', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('unit_cost', sa.Float(), nullable=True))
+        batch_op.create_foreign_key('fk_stock_items_location_id_stock_locations',
+                                    'stock_locations', ['location_id'], ['id'])
+
+    with op.batch_alter_table('employees') as batch_op:
+        batch_op.add_column(sa.Column('office_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('emergency_contact', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('access_level', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_employees_office_id_offices', 'offices', ['office_id'], ['id'])
+        batch_op.drop_column('location')
+
+    with op.batch_alter_table('coffee_machines') as batch_op:
+        batch_op.add_column(sa.Column('office_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('location_detail', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('next_maintenance', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('milk_level', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('total_drinks', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_coffee_machines_office_id_offices', 'offices', ['office_id'], ['id'])
+        batch_op.drop_column('location')
+
+    with op.batch_alter_table('safety_visitors') as batch_op:
+        batch_op.add_column(sa.Column('office_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('purpose', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('expected_duration', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('access_areas', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('vehicle_info', sa.JSON(), nullable=True))
+        batch_op.create_foreign_key('fk_safety_visitors_office_id_offices', 'offices', ['office_id'], ['id'])
 
 def downgrade():
     # Revert temperature sensor changes
-    op.drop_constraint(None, 'temperature_sensors', type_='foreignkey')
-    op.add_column('temperature_sensors', sa.Column('location', sa.String(length=100), nullable=True))
-    op.drop_column('temperature_sensors', 'location_detail')
-    op.drop_column('temperature_sensors', 'office_id')
+    with op.batch_alter_table('temperature_sensors') as batch_op:
+        batch_op.drop_constraint('fk_temperature_sensors_office_id_offices', type_='foreignkey')
+        batch_op.add_column(sa.Column('location', sa.String(length=100), nullable=True))
+        batch_op.drop_column('location_detail')
+        batch_op.drop_column('office_id')
 
     # Drop new columns from safety_visitors
-    op.drop_constraint(None, 'safety_visitors', type_='foreignkey')
-    op.drop_column('safety_visitors', 'vehicle_info')
-    op.drop_column('safety_visitors', 'access_areas')
-    op.drop_column('safety_visitors', 'expected_duration')
-    op.drop_column('safety_visitors', 'purpose')
-    op.drop_column('safety_visitors', 'office_id')
+    with op.batch_alter_table('safety_visitors') as batch_op:
+        batch_op.drop_constraint('fk_safety_visitors_office_id_offices', type_='foreignkey')
+        batch_op.drop_column('vehicle_info')
+        batch_op.drop_column('access_areas')
+        batch_op.drop_column('expected_duration')
+        batch_op.drop_column('purpose')
+        batch_op.drop_column('office_id')
 
     # Drop new columns from coffee_machines
-    op.drop_constraint(None, 'coffee_machines', type_='foreignkey')
-    op.add_column('coffee_machines', sa.Column('location', sa.String(length=100), nullable=True))
-    op.drop_column('coffee_machines', 'total_drinks')
-    op.drop_column('coffee_machines', 'milk_level')
-    op.drop_column('coffee_machines', 'next_maintenance')
-    op.drop_column('coffee_machines', 'location_detail')
-    op.drop_column('coffee_machines', 'office_id')
+    with op.batch_alter_table('coffee_machines') as batch_op:
+        batch_op.drop_constraint('fk_coffee_machines_office_id_offices', type_='foreignkey')
+        batch_op.add_column(sa.Column('location', sa.String(length=100), nullable=True))
+        batch_op.drop_column('total_drinks')
+        batch_op.drop_column('milk_level')
+        batch_op.drop_column('next_maintenance')
+        batch_op.drop_column('location_detail')
+        batch_op.drop_column('office_id')
 
     # Drop new columns from employees
-    op.drop_constraint(None, 'employees', type_='foreignkey')
-    op.add_column('employees', sa.Column('location', sa.String(length=100), nullable=True))
-    op.drop_column('employees', 'access_level')
-    op.drop_column('employees', 'emergency_contact')
-    op.drop_column('employees', 'office_id')
+    with op.batch_alter_table('employees') as batch_op:
+        batch_op.drop_constraint('fk_employees_office_id_offices', type_='foreignkey')
+        batch_op.add_column(sa.Column('location', sa.String(length=100), nullable=True))
+        batch_op.drop_column('access_level')
+        batch_op.drop_column('emergency_contact')
+        batch_op.drop_column('office_id')
 
     # Drop new columns from stock_items
-    op.drop_constraint(None, 'stock_items', type_='foreignkey')
-    op.drop_column('stock_items', 'unit_cost')
-    op.drop_column('stock_items', 'supplier')
-    op.drop_column('stock_items', 'location_id')
+    with op.batch_alter_table('stock_items') as batch_op:
+        batch_op.drop_constraint('fk_stock_items_location_id_stock_locations', type_='foreignkey')
+        batch_op.drop_column('unit_cost')
+        batch_op.drop_column('supplier')
+        batch_op.drop_column('location_id')
 
     # Drop new columns from stock_categories
-    op.drop_constraint(None, 'stock_categories', type_='foreignkey')
-    op.drop_column('stock_categories', 'parent_id')
+    with op.batch_alter_table('stock_categories') as batch_op:
+        batch_op.drop_constraint('fk_stock_categories_parent_id_stock_categories', type_='foreignkey')
+        batch_op.drop_column('parent_id')
 
     # Drop stock_locations table
-    op.drop_table('stock_locations')
\ No newline at end of file
+    op.drop_table('stock_locations')
@@ -0,0 +1,41 @@
+"""Add time-bucketed climate rollups
+
+Revision ID: 2026_10_16_add_climate_rollups
+Revises: 2026_10_16_add_lookup_indexes
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_climate_rollups'
+down_revision = '2026_10_16_add_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('climate_rollups',
+        sa.Column('scope', sa.String(length=20), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(length=4), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('temperature_min', sa.Float(), nullable=True),
+        sa.Column('temperature_max', sa.Float(), nullable=True),
+        sa.Column('temperature_sum', sa.Float(), nullable=False),
+        sa.Column('humidity_count', sa.Integer(), nullable=False),
+        sa.Column('humidity_min', sa.Float(), nullable=True),
+        sa.Column('humidity_max', sa.Float(), nullable=True),
+        sa.Column('humidity_sum', sa.Float(), nullable=False),
+        sa.Column('comfort_count', sa.Integer(), nullable=False),
+        sa.Column('comfort_min', sa.Float(), nullable=True),
+        sa.Column('comfort_max', sa.Float(), nullable=True),
+        sa.Column('comfort_sum', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'source_id', 'resolution', 'bucket_start')
+    )
+    # Bucketing is done in Python, so existing readings are backfilled with
+    # scripts/rebuild_climate_rollups.py (init_db also does it on first start)
+
+def downgrade():
+    op.drop_table('climate_rollups')
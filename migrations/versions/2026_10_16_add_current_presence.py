@@ -0,0 +1,50 @@
+"""Add materialized current presence table
+
+Revision ID: 2026_10_16_add_current_presence
+Revises: 2023_10_23_add_weather
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_current_presence'
+down_revision = '2023_10_23_add_weather'
+branch_labels = None
+depends_on = None
+
+# presence_logs already owns the PostgreSQL enum type, so reuse it there
+_statuses = ('IN', 'OUT', 'REMOTE', 'MEETING', 'BREAK')
+presence_status = sa.Enum(*_statuses, name='presencestatus').with_variant(
+    postgresql.ENUM(*_statuses, name='presencestatus', create_type=False), 'postgresql'
+)
+
+def upgrade():
+    op.create_table('current_presence',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', presence_status, nullable=False),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('since', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_current_presence_status', 'current_presence', ['status'])
+
+    # Backfill from history: newest presence log per user
+    op.execute("""
+        INSERT INTO current_presence (user_id, status, location, since)
+        SELECT user_id, status, location, created_at
+        FROM (
+            SELECT user_id, status, location, created_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) AS rn
+            FROM presence_logs
+            WHERE created_at IS NOT NULL
+        ) ranked
+        WHERE rn = 1
+    """)
+
+def downgrade():
+    op.drop_index('ix_current_presence_status', table_name='current_presence')
+    op.drop_table('current_presence')
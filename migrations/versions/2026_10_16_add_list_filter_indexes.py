@@ -0,0 +1,36 @@
+"""Index the columns the CRUD list endpoints filter on
+
+Revision ID: 2026_10_16_add_list_filter_indexes
+Revises: 2026_10_16_add_climate_rollups
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_list_filter_indexes'
+down_revision = '2026_10_16_add_climate_rollups'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns) - list pages are `WHERE <filter> AND id > :cursor
+# ORDER BY id`, which these serve as range scans (the index carries the id)
+FILTER_INDEXES = [
+    ('ix_employees_office_id', 'employees', ['office_id']),
+    ('ix_assets_office_id', 'assets', ['office_id']),
+    ('ix_assets_status', 'assets', ['status']),
+    ('ix_bookings_user_id', 'bookings', ['user_id']),
+    ('ix_bookings_resource_start_time', 'bookings', ['resource', 'start_time']),
+    ('ix_maintenances_asset_id', 'maintenances', ['asset_id']),
+    ('ix_maintenances_status', 'maintenances', ['status']),
+]
+
+def upgrade():
+    # init_db() may already have created these on databases managed by create_all()
+    for name, table, columns in FILTER_INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+def downgrade():
+    for name, table, columns in reversed(FILTER_INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,39 @@
+"""Add composite indexes for latest-row lookups
+
+Revision ID: 2026_10_16_add_lookup_indexes
+Revises: 2026_10_16_add_current_presence
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_lookup_indexes'
+down_revision = '2026_10_16_add_current_presence'
+branch_labels = None
+depends_on = None
+
+# (table, leading column) - every one is filtered on the column and ordered
+# or range-filtered on created_at
+LOOKUP_INDEXES = [
+    ('presence_logs', 'user_id'),
+    ('temperature_readings', 'sensor_id'),
+    ('weather_data', 'station_id'),
+    ('stock_transactions', 'item_id'),
+    ('activity_logs', 'category'),
+]
+
+def upgrade():
+    # init_db() may already have created these on databases managed by create_all()
+    for table, column in LOOKUP_INDEXES:
+        op.create_index(f'ix_{table}_{column}_created_at', table, [column, 'created_at'],
+                        if_not_exists=True)
+
+    # Employee <-> presence joins go through employees.user_id
+    op.create_index('ix_employees_user_id', 'employees', ['user_id'], if_not_exists=True)
+
+def downgrade():
+    op.drop_index('ix_employees_user_id', table_name='employees', if_exists=True)
+    for table, column in reversed(LOOKUP_INDEXES):
+        op.drop_index(f'ix_{table}_{column}_created_at', table_name=table, if_exists=True)
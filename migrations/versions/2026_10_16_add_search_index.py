@@ -0,0 +1,66 @@
+"""Add FTS5 trigram search tables for stock items, people and assets
+
+Revision ID: 2026_10_16_add_search_index
+Revises: 2026_10_16_add_stock_item_indexes
+Create Date: 2026-10-16
+
+"""
+import sqlite3
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_search_index'
+down_revision = '2026_10_16_add_stock_item_indexes'
+branch_labels = None
+depends_on = None
+
+# (source table, [(index column, SQL expression over {row})], columns whose
+# updates re-index the row) - must match services/search_index.SOURCES
+SEARCH_TABLES = [
+    ('stock_items', [('name', '{row}.name'), ('sku', '{row}.sku'), ('description', '{row}.description')],
+     ['name', 'sku', 'description']),
+    ('employees', [('name', "{row}.first_name || ' ' || {row}.last_name"), ('email', '{row}.email')],
+     ['first_name', 'last_name', 'email']),
+    ('users', [('name', '{row}.name'), ('email', '{row}.email')], ['name', 'email']),
+    ('assets', [('name', '{row}.name'), ('serial', '{row}.serial')], ['name', 'serial']),
+]
+
+def _sqlite():
+    return op.get_bind().dialect.name == 'sqlite'
+
+def _trigram_support():
+    # Same check as services/search_index.trigram_support()
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+def upgrade():
+    # FTS5 trigram is SQLite >= 3.34 only; other databases and older SQLite
+    # builds keep the LIKE fallback
+    if not _sqlite() or not _trigram_support():
+        return
+    for table, columns, watch in SEARCH_TABLES:
+        index = f'{table}_search'
+        names = ', '.join(name for name, _ in columns)
+        new_values = ', '.join(expression.format(row='new') for _, expression in columns)
+        old_values = ', '.join(expression.format(row='old') for _, expression in columns)
+        delete_old = f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+        insert_new = f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values});"
+        op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({names}, content='', tokenize='trigram')")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN {insert_new} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN {delete_old} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {', '.join(watch)} ON {table} "
+                   f"BEGIN {delete_old} {insert_new} END")
+
+        # Backfill (init_db() may already have created and filled the table)
+        op.execute(f"INSERT INTO {index}({index}) VALUES ('delete-all')")
+        op.execute(f"INSERT INTO {index}(rowid, {names}) "
+                   f"SELECT id, {', '.join(expression.format(row=table) for _, expression in columns)} FROM {table}")
+
+def downgrade():
+    if not _sqlite():
+        return
+    for table, _, _ in reversed(SEARCH_TABLES):
+        index = f'{table}_search'
+        for event in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {index}_{event}")
+        op.execute(f"DROP TABLE IF EXISTS {index}")
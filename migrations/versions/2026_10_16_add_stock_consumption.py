@@ -0,0 +1,38 @@
+"""Add daily stock consumption for the reorder forecast
+
+Revision ID: 2026_10_16_add_stock_consumption
+Revises: 2026_10_16_add_search_index
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_stock_consumption'
+down_revision = '2026_10_16_add_search_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('stock_consumption',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['stock_items.id'], ),
+        sa.PrimaryKeyConstraint('item_id', 'day')
+    )
+    op.create_index('ix_stock_consumption_day_item_quantity', 'stock_consumption', ['day', 'item_id', 'quantity'])
+
+    # Backfill from history: total taken out per item and day
+    op.execute("""
+        INSERT INTO stock_consumption (item_id, day, quantity)
+        SELECT item_id, date(created_at), SUM(quantity)
+        FROM stock_transactions
+        WHERE type = 'out' AND created_at IS NOT NULL
+        GROUP BY item_id, date(created_at)
+    """)
+
+def downgrade():
+    op.drop_index('ix_stock_consumption_day_item_quantity', table_name='stock_consumption')
+    op.drop_table('stock_consumption')
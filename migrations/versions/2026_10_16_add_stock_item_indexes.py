@@ -0,0 +1,39 @@
+"""Index stock items by location, category and computed status
+
+Revision ID: 2026_10_16_add_stock_item_indexes
+Revises: 2026_10_16_add_list_filter_indexes
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_add_stock_item_indexes'
+down_revision = '2026_10_16_add_list_filter_indexes'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to models.STOCK_STATUS_SQL, or queries stop matching the index
+STOCK_STATUS_SQL = (
+    "CASE WHEN quantity <= 0 THEN 'Critical' "
+    "WHEN reorder_point IS NOT NULL AND reorder_point != 0 AND quantity <= reorder_point THEN 'Low' "
+    "ELSE 'OK' END"
+)
+
+# (index name, columns) on stock_items - the /api/stock/items filters, each
+# followed by id so keyset pages are a single range scan
+STOCK_ITEM_INDEXES = [
+    ('ix_stock_items_location_id_id', ['location_id', 'id']),
+    ('ix_stock_items_category_id_id', ['category_id', 'id']),
+    ('ix_stock_items_status', [sa.text(f'({STOCK_STATUS_SQL})'), 'id']),
+]
+
+def upgrade():
+    # init_db() may already have created these on databases managed by create_all()
+    for name, columns in STOCK_ITEM_INDEXES:
+        op.create_index(name, 'stock_items', columns, if_not_exists=True)
+
+def downgrade():
+    for name, columns in reversed(STOCK_ITEM_INDEXES):
+        op.drop_index(name, table_name='stock_items', if_exists=True)
@@ -31,16 +31,13 @@ class Office(db.Model, TimestampMixin):
     manager = relationship('User', backref='managed_offices')
     
     def get_current_occupancy(self):
-        """Get current occupancy count from presence logs"""
-        from sqlalchemy import and_
-        from datetime import datetime
-        present_employees = (PresenceLog.query
-            .join(Employee, Employee.user_id == PresenceLog.user_id)
-            .filter(and_(
+        """Get current occupancy count from the current presence table"""
+        present_employees = (CurrentPresence.query
+            .join(Employee, Employee.user_id == CurrentPresence.user_id)
+            .filter(
                 Employee.office_id == self.id,
-                PresenceLog.status == PresenceStatus.IN,
-                PresenceLog.created_at <= datetime.utcnow()
-            ))
+                CurrentPresence.status == PresenceStatus.IN
+            )
             .count())
         present_visitors = (SafetyVisitor.query
             .filter_by(office_id=self.id, status='checked_in')
@@ -52,8 +49,8 @@ class Asset(db.Model, TimestampMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     serial = db.Column(db.String(200))
-    status = db.Column(db.String(100), default='available')  # available, in_use, maintenance, retired
-    office_id = db.Column(db.Integer, db.ForeignKey('offices.id'), nullable=True)
+    status = db.Column(db.String(100), default='available', index=True)  # available, in_use, maintenance, retired
+    office_id = db.Column(db.Integer, db.ForeignKey('offices.id'), nullable=True, index=True)
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     
     office = relationship('Office', backref='assets')
@@ -61,9 +58,12 @@ class Asset(db.Model, TimestampMixin):
 
 class Booking(db.Model, TimestampMixin):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        db.Index('ix_bookings_resource_start_time', 'resource', 'start_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     resource = db.Column(db.String(200), nullable=False)  # e.g. meeting room, projector
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
     notes = db.Column(db.Text)
@@ -73,9 +73,9 @@ class Booking(db.Model, TimestampMixin):
 class Maintenance(db.Model, TimestampMixin):
     __tablename__ = 'maintenances'
     id = db.Column(db.Integer, primary_key=True)
-    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False, index=True)
     description = db.Column(db.Text)
-    status = db.Column(db.String(100), default='open')  # open, in_progress, closed
+    status = db.Column(db.String(100), default='open', index=True)  # open, in_progress, closed
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     
     asset = relationship('Asset', backref='maintenances')
@@ -110,6 +110,9 @@ class DashboardMetric(db.Model, TimestampMixin):
 
 class ActivityLog(db.Model, TimestampMixin):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_category_created_at', 'category', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     category = db.Column(db.String(100), nullable=False)
@@ -120,17 +123,29 @@ class ActivityLog(db.Model, TimestampMixin):
     user = relationship('User', backref='activities')
     
     @classmethod
-    def create(cls, category, action, description, event_data=None):
-        """Helper method to create activity logs"""
+    def create(cls, category, action, description, event_data=None, user_id=None):
+        """Helper method to create activity logs
+
+        The row is queued on the buffered writer (services.activity_log) and
+        inserted in bulk on its next flush, so this never commits the caller's
+        session. The returned instance is transient. Without a bound writer
+        (scripts that skip create_app) the log joins the caller's transaction.
+        """
+        from services.activity_log import activity_writer
         log = cls(
+            user_id=user_id,
             category=category,
             action=action,
             description=description,
             event_data=event_data
         )
         try:
-            db.session.add(log)
-            db.session.commit()
+            if activity_writer.app is not None:
+                row = activity_writer.record(category, action, description, event_data, user_id)
+                log.created_at = row['created_at']
+                log.updated_at = row['updated_at']
+            else:
+                db.session.add(log)
         except:
             pass  # Silently fail if db not available
         return log
@@ -139,8 +154,8 @@ class ActivityLog(db.Model, TimestampMixin):
 class Employee(db.Model, TimestampMixin):
     __tablename__ = 'employees'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    office_id = db.Column(db.Integer, db.ForeignKey('offices.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    office_id = db.Column(db.Integer, db.ForeignKey('offices.id'), index=True)
     first_name = db.Column(db.String(200), nullable=False)
     last_name = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(200), unique=True)
@@ -159,11 +174,8 @@ class Employee(db.Model, TimestampMixin):
     
     def get_current_presence(self):
         """Get employee's current presence status"""
-        latest_log = (PresenceLog.query
-            .filter_by(user_id=self.user_id)
-            .order_by(PresenceLog.created_at.desc())
-            .first())
-        return latest_log.status if latest_log else None
+        current = db.session.get(CurrentPresence, self.user_id) if self.user_id else None
+        return current.status if current else None
     
     def record_presence(self, status, location=None, notes=None):
         """Record new presence status"""
@@ -268,14 +280,7 @@ class MeetingRoom(db.Model, TimestampMixin):
         self.last_adjusted = datetime.utcnow()
         
         # Determine HVAC action based on current vs target
-        if self.current_temperature and new_target:
-            diff = self.current_temperature - new_target
-            if diff > 1:
-                self.hvac_status = 'cooling'
-            elif diff < -1:
-                self.hvac_status = 'heating'
-            else:
-                self.hvac_status = 'auto'
+        self.hvac_status = compute_hvac_status(self.current_temperature, new_target, self.hvac_status)
         
         # Log the change
         ActivityLog.create(
@@ -294,18 +299,34 @@ class MeetingRoom(db.Model, TimestampMixin):
     
     def get_comfort_status(self):
         """Get comfort status based on temperature and humidity"""
-        if not self.current_temperature or not self.humidity:
-            return 'unknown'
-        
-        temp_ok = abs(self.current_temperature - self.target_temperature) <= 1.5
-        humidity_ok = 30 <= self.humidity <= 60
-        
-        if temp_ok and humidity_ok:
-            return 'comfortable'
-        elif temp_ok or humidity_ok:
-            return 'moderate'
+        return compute_comfort_status(self.current_temperature, self.humidity, self.target_temperature)
+
+def compute_hvac_status(current_temp, target_temp, hvac_status='auto'):
+    """HVAC action for a room; keeps ``hvac_status`` when either temperature is unknown"""
+    if current_temp and target_temp:
+        diff = current_temp - target_temp
+        if diff > 1:
+            return 'cooling'
+        elif diff < -1:
+            return 'heating'
         else:
-            return 'uncomfortable'
+            return 'auto'
+    return hvac_status
+
+def compute_comfort_status(current_temp, humidity, target_temp):
+    """'comfortable', 'moderate', 'uncomfortable' or 'unknown' for a room's conditions"""
+    if not current_temp or not humidity:
+        return 'unknown'
+    
+    temp_ok = abs(current_temp - target_temp) <= 1.5
+    humidity_ok = 30 <= humidity <= 60
+    
+    if temp_ok and humidity_ok:
+        return 'comfortable'
+    elif temp_ok or humidity_ok:
+        return 'moderate'
+    else:
+        return 'uncomfortable'
 
 class TemperatureSensor(db.Model, TimestampMixin):
     __tablename__ = 'temperature_sensors'
@@ -351,6 +372,9 @@ class WeatherStation(db.Model, TimestampMixin):
 
 class WeatherData(db.Model, TimestampMixin):
     __tablename__ = 'weather_data'
+    __table_args__ = (
+        db.Index('ix_weather_data_station_id_created_at', 'station_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     station_id = db.Column(db.Integer, db.ForeignKey('weather_stations.id'), nullable=False)
     temperature = db.Column(db.Float, nullable=False)
@@ -365,6 +389,9 @@ class WeatherData(db.Model, TimestampMixin):
 
 class TemperatureReading(db.Model, TimestampMixin):
     __tablename__ = 'temperature_readings'
+    __table_args__ = (
+        db.Index('ix_temperature_readings_sensor_id_created_at', 'sensor_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     sensor_id = db.Column(db.Integer, db.ForeignKey('temperature_sensors.id'), nullable=False)
     temperature = db.Column(db.Float, nullable=False)
@@ -377,30 +404,102 @@ class TemperatureReading(db.Model, TimestampMixin):
     
     def calculate_comfort_index(self):
         """Calculate comfort index based on temperature and humidity"""
-        if self.temperature is None or self.humidity is None:
-            return None
-            
-        # Simplified comfort index calculation
-        # Based on temperature and humidity relationship
-        temp = self.temperature
-        humidity = self.humidity
+        self.comfort_index = compute_comfort_index(self.temperature, self.humidity)
+        return self.comfort_index
+
+def compute_comfort_index(temp, humidity):
+    """Comfort index (0-100) for a temperature/humidity pair, or None if either is missing"""
+    if temp is None or humidity is None:
+        return None
+    
+    # Simplified comfort index calculation
+    # Based on temperature and humidity relationship
+    
+    # Base comfort score (0-100)
+    if temp < 18:
+        comfort = 40 - (18 - temp) * 2  # Too cold
+    elif temp > 26:
+        comfort = 40 - (temp - 26) * 2  # Too hot
+    else:
+        comfort = 100 - abs(22 - temp) * 5  # Ideal range
+        
+    # Adjust for humidity
+    if humidity < 30:
+        comfort -= (30 - humidity)  # Too dry
+    elif humidity > 60:
+        comfort -= (humidity - 60)  # Too humid
+        
+    return max(0, min(100, comfort))
+
+class ClimateRollup(db.Model):
+    """Pre-aggregated temperature/humidity/comfort per time bucket for charting
+    
+    One row per (scope, source_id, resolution, bucket_start). Scopes are
+    'sensor' and 'office_indoor' (from TemperatureReading) and 'station' and
+    'office_outdoor' (from WeatherData); resolutions are '5m', '1h' and '1d'.
+    Sums and counts are stored rather than averages so buckets can be merged
+    incrementally as readings arrive (see services.climate_rollups).
+    """
+    __tablename__ = 'climate_rollups'
+    scope = db.Column(db.String(20), primary_key=True)
+    source_id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(4), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_min = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    temperature_sum = db.Column(db.Float, nullable=False, default=0.0)
+    humidity_count = db.Column(db.Integer, nullable=False, default=0)
+    humidity_min = db.Column(db.Float)
+    humidity_max = db.Column(db.Float)
+    humidity_sum = db.Column(db.Float, nullable=False, default=0.0)
+    comfort_count = db.Column(db.Integer, nullable=False, default=0)
+    comfort_min = db.Column(db.Float)
+    comfort_max = db.Column(db.Float)
+    comfort_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    @classmethod
+    def upsert(cls, connection, rows):
+        """Merge pre-aggregated bucket rows into the table
         
-        # Base comfort score (0-100)
-        if temp < 18:
-            comfort = 40 - (18 - temp) * 2  # Too cold
-        elif temp > 26:
-            comfort = 40 - (temp - 26) * 2  # Too hot
+        One INSERT ... ON CONFLICT statement run with executemany: compiled
+        once, and with one row's parameters per execution, so a backfill of
+        any size stays within the database's bound parameter limit (a
+        multi-row VALUES list has 16 per row).
+        """
+        if not rows:
+            return
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
         else:
-            comfort = 100 - abs(22 - temp) * 5  # Ideal range
-            
-        # Adjust for humidity
-        if humidity < 30:
-            comfort -= (30 - humidity)  # Too dry
-        elif humidity > 60:
-            comfort -= (humidity - 60)  # Too humid
-            
-        self.comfort_index = max(0, min(100, comfort))
-        return self.comfort_index
+            from sqlalchemy.dialects.sqlite import insert
+        
+        table = cls.__table__
+        stmt = insert(table)
+        new = stmt.excluded
+        
+        def merged(column, pick):
+            # NULL-aware least/greatest that behaves the same on every dialect
+            old_value, new_value = table.c[column], new[column]
+            return db.case(
+                (old_value.is_(None), new_value),
+                (new_value.is_(None), old_value),
+                (pick(new_value, old_value), new_value),
+                else_=old_value
+            )
+        
+        set_ = {}
+        for column in ('sample_count', 'temperature_sum', 'humidity_count', 'humidity_sum',
+                       'comfort_count', 'comfort_sum'):
+            set_[column] = table.c[column] + new[column]
+        for prefix in ('temperature', 'humidity', 'comfort'):
+            set_[f'{prefix}_min'] = merged(f'{prefix}_min', lambda a, b: a < b)
+            set_[f'{prefix}_max'] = merged(f'{prefix}_max', lambda a, b: a > b)
+        
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.source_id, table.c.resolution, table.c.bucket_start],
+            set_=set_
+        ), rows)
 
 # Stock Management
 class StockLocation(db.Model, TimestampMixin):
@@ -425,6 +524,11 @@ class StockCategory(db.Model, TimestampMixin):
     
 class StockItem(db.Model, TimestampMixin):
     __tablename__ = 'stock_items'
+    __table_args__ = (
+        # Keyset pages of one location / category: WHERE x_id = ? AND id > ? ORDER BY id
+        db.Index('ix_stock_items_location_id_id', 'location_id', 'id'),
+        db.Index('ix_stock_items_category_id_id', 'category_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('stock_categories.id'))
     location_id = db.Column(db.Integer, db.ForeignKey('stock_locations.id'))
@@ -523,8 +627,30 @@ class StockItem(db.Model, TimestampMixin):
         db.session.add(transaction)
         return transaction
 
+# SQL twin of StockItem.get_status(). The constants are inlined (not bound
+# parameters) so queries repeat the indexed expression exactly, which is what
+# lets SQLite and PostgreSQL use ix_stock_items_status for status filters.
+STOCK_STATUS_SQL = (
+    "CASE WHEN quantity <= 0 THEN 'Critical' "
+    "WHEN reorder_point IS NOT NULL AND reorder_point != 0 AND quantity <= reorder_point THEN 'Low' "
+    "ELSE 'OK' END"
+)
+stock_status = db.case(
+    (StockItem.quantity <= db.literal_column('0'), db.literal_column("'Critical'")),
+    (db.and_(StockItem.reorder_point.isnot(None), StockItem.reorder_point != db.literal_column('0'),
+             StockItem.quantity <= StockItem.reorder_point), db.literal_column("'Low'")),
+    else_=db.literal_column("'OK'"),
+)
+db.Index('ix_stock_items_status', db.text(f'({STOCK_STATUS_SQL})'), StockItem.id)
+
+# StockItem.get_total_value() as SQL, for SUM() (NULL when there is no unit cost, which SUM skips)
+stock_value = StockItem.unit_cost * StockItem.quantity
+
 class StockTransaction(db.Model, TimestampMixin):
     __tablename__ = 'stock_transactions'
+    __table_args__ = (
+        db.Index('ix_stock_transactions_item_id_created_at', 'item_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('stock_items.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -536,6 +662,33 @@ class StockTransaction(db.Model, TimestampMixin):
     item = relationship('StockItem', backref='transactions')
     user = relationship('User', backref='stock_transactions')
 
+class StockConsumption(db.Model):
+    """Quantity consumed per stock item and day, maintained alongside every 'out' StockTransaction"""
+    __tablename__ = 'stock_consumption'
+    __table_args__ = (
+        # Covers the reorder forecast's read: a day range, in day order, without touching the table
+        db.Index('ix_stock_consumption_day_item_quantity', 'day', 'item_id', 'quantity'),
+    )
+    item_id = db.Column(db.Integer, db.ForeignKey('stock_items.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Float, nullable=False)
+    
+    @classmethod
+    def add(cls, connection, item_id, day, quantity):
+        """Add to an item's consumption for the day, creating the row if needed"""
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        table = cls.__table__
+        stmt = insert(table).values(item_id=item_id, day=day, quantity=quantity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.item_id, table.c.day],
+            set_={'quantity': table.c.quantity + stmt.excluded.quantity}
+        )
+        connection.execute(stmt)
+
 class StockOrder(db.Model, TimestampMixin):
     __tablename__ = 'stock_orders'
     id = db.Column(db.Integer, primary_key=True)
@@ -589,6 +742,9 @@ class PresenceStatus(enum.Enum):
 
 class PresenceLog(db.Model, TimestampMixin):
     __tablename__ = 'presence_logs'
+    __table_args__ = (
+        db.Index('ix_presence_logs_user_id_created_at', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.Enum(PresenceStatus), nullable=False)
@@ -597,6 +753,37 @@ class PresenceLog(db.Model, TimestampMixin):
     
     user = relationship('User', backref='presence_logs')
 
+class CurrentPresence(db.Model):
+    """Latest presence status per user, maintained alongside every PresenceLog insert"""
+    __tablename__ = 'current_presence'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    status = db.Column(db.Enum(PresenceStatus), nullable=False, index=True)
+    location = db.Column(db.String(100))
+    since = db.Column(db.DateTime, nullable=False)
+    
+    user = relationship('User', backref=db.backref('current_presence', uselist=False))
+    
+    @classmethod
+    def upsert(cls, connection, user_id, status, location, since):
+        """Insert or refresh a user's row unless it already holds a newer status"""
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        table = cls.__table__
+        stmt = insert(table).values(user_id=user_id, status=status, location=location, since=since)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                'status': stmt.excluded.status,
+                'location': stmt.excluded.location,
+                'since': stmt.excluded.since
+            },
+            where=table.c.since <= stmt.excluded.since
+        )
+        connection.execute(stmt)
+
 class SafetyVisitor(db.Model, TimestampMixin):
     __tablename__ = 'safety_visitors'
     id = db.Column(db.Integer, primary_key=True)
@@ -664,6 +851,35 @@ def stock_item_history(mapper, connection, target):
             }
         )
 
+@listens_for(PresenceLog, 'after_insert')
+def sync_current_presence(mapper, connection, target):
+    # Runs on the flush connection, so the upsert commits (or rolls back)
+    # together with the PresenceLog row itself
+    CurrentPresence.upsert(
+        connection,
+        user_id=target.user_id,
+        status=target.status,
+        location=target.location,
+        since=target.created_at or datetime.utcnow()
+    )
+
+@listens_for(StockTransaction, 'after_insert')
+def record_stock_consumption(mapper, connection, target):
+    # Same transaction as the movement, so the daily totals never drift from raw data
+    if target.type == 'out':
+        StockConsumption.add(connection, target.item_id, (target.created_at or datetime.utcnow()).date(), target.quantity)
+
+@listens_for(TemperatureReading, 'after_insert')
+def rollup_temperature_reading(mapper, connection, target):
+    # Same transaction as the reading, so the buckets never drift from raw data
+    from services.climate_rollups import record_temperature_readings
+    record_temperature_readings(connection, [target])
+
+@listens_for(WeatherData, 'after_insert')
+def rollup_weather_data(mapper, connection, target):
+    from services.climate_rollups import record_weather_data
+    record_weather_data(connection, [target])
+
 # Temporarily disabled to avoid transaction conflicts during seeding
 # @listens_for(PresenceLog, 'after_insert')
 # def presence_activity(mapper, connection, target):
@@ -6,9 +6,9 @@ Separated to avoid duplicating logic across multiple endpoints (login portal
 and safety routes).
 """
 from typing import Dict
-from sqlalchemy import desc
 
-from models import db, Employee, PresenceLog, PresenceStatus, SafetyVisitor
+from models import SafetyVisitor
+from services.presence_service import get_presence_counts
 
 
 def get_current_presence_summary(include_visitors: bool = True) -> Dict[str, int]:
@@ -23,27 +23,12 @@ def get_current_presence_summary(include_visitors: bool = True) -> Dict[str, int
       visitors_in_office: number of active checked-in visitors (only if include_visitors)
       total_in_office: employees_in_office + visitors_in_office (only if include_visitors)
     """
-    # Query all active employees that have a linked user account
-    employees = (db.session.query(Employee)
-                 .filter(Employee.status == 'active')
-                 .all())
-
-    employees_in = 0
-    for employee in employees:
-        if not employee.user_id:
-            continue
-        latest_log = (PresenceLog.query
-                       .filter_by(user_id=employee.user_id)
-                       .order_by(PresenceLog.created_at.desc())
-                       .first())
-        if latest_log and latest_log.status == PresenceStatus.IN:
-            employees_in += 1
-
-    total_employees = len([e for e in employees if e.user_id])
+    counts = get_presence_counts(active_only=True)
+    employees_in = counts['employees_in_office']
 
     summary = {
         'employees_in_office': employees_in,
-        'total_employees': total_employees,
+        'total_employees': counts['total_employees'],
     }
 
     if include_visitors:
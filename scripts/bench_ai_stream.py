@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Benchmark: /api/ai_stream against a local fake Azure OpenAI completion server.
+
+Runs the blueprint on a threaded Werkzeug server, pointed at the stub from
+outbound_stub_server.py, and fires concurrent chats at it in both stream
+modes ('inline': the request thread reads upstream, 'pool': a capped stream
+worker does, and chats over the cap wait in its queue). Reports throughput,
+time to first chunk, chats that had to queue or were refused, and how
+quickly another API endpoint answers while the chats run. Checks that every
+chat is served, and that a client disconnecting mid-answer cancels the
+upstream stream.
+
+Then runs the pool behind a server with a fixed number of request threads
+(SERVER_THREADS, like gunicorn --threads or waitress), first without and
+then with AI_STREAM_SERVER_THREADS. Without it, streaming and waiting chats
+hold every thread and the other endpoint waits behind them. With it, the
+pool keeps to half the threads, and chats it refuses retry after
+Retry-After, as the chat UI does. Checks that every chat is still served
+and that the other endpoint stays responsive.
+
+Usage: python scripts/bench_ai_stream.py [concurrent chats]    (default 16)
+"""
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import BaseWSGIServer, make_server
+
+from bench_common import create_bench_app
+from outbound_stub_server import start_stub
+
+CHUNKS = 20
+CHUNK_DELAY = 0.05  # seconds -> about one second per answer
+MAX_STREAMS = 8
+SERVER_THREADS = 12
+RESPONSIVE_MS = 500  # slowest other-endpoint answer allowed with the thread budget applied
+
+
+class FixedThreadServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed number of threads; more connections wait"""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.workers = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+    def process_request(self, request, client_address):
+        self.workers.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # noqa: BLE001 - as socketserver reports it
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def chat(base_url, read_chunks=None, retry_busy=False):
+    """One streamed chat; returns (status, seconds to first chunk, chunks, seconds).
+
+    With ``retry_busy`` a 503 is retried after its Retry-After, like the chat UI.
+    """
+    start = time.perf_counter()
+    first, chunks = None, 0
+    while True:
+        response = requests.post(f'{base_url}/api/ai_stream', json={'message': 'status report'},
+                                 stream=True, timeout=60)
+        if response.status_code == 503 and retry_busy:
+            response.close()
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+            continue
+        break
+    with response:
+        if response.status_code != 200:
+            return response.status_code, None, 0, time.perf_counter() - start
+        for line in response.iter_lines():
+            if line.startswith(b'data: ') and b'"delta"' in line:
+                chunks += 1
+                first = first or time.perf_counter() - start
+                if read_chunks and chunks >= read_chunks:
+                    break  # leave early, like a closed browser tab
+    return 200, first, chunks, time.perf_counter() - start
+
+
+def probe_latency(base_url, stop):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f'{base_url}/api/ai/stats', timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+    return samples
+
+
+def run(base_url, concurrency, retry_busy=False):
+    """Fire the chats and probe the other endpoint; returns (chats served, slowest other-endpoint ms)."""
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        probe = pool.submit(probe_latency, base_url, stop)
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: chat(base_url, retry_busy=retry_busy), range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        probe_ms = probe.result()
+
+    ok = [r for r in results if r[0] == 200 and r[2] == CHUNKS]
+    chunks = sum(r[2] for r in ok)
+    ttfb = [r[1] * 1000 for r in ok if r[1] is not None]
+    print(f"    {len(ok)} fully streamed, {len(results) - len(ok)} refused or cut short, "
+          f"{chunks / elapsed:7.1f} chunks/s over {elapsed:.2f}s")
+    if ttfb:
+        print(f"    first chunk p50 {statistics.median(ttfb):6.1f}ms   max {max(ttfb):6.1f}ms")
+    if probe_ms:
+        print(f"    other endpoint p50 {statistics.median(probe_ms):6.1f}ms   max {max(probe_ms):6.1f}ms "
+              f"({len(probe_ms)} probes)")
+    return len(ok), max(probe_ms) if probe_ms else None
+
+
+def main(concurrency):
+    stub, stub_state, stub_url = start_stub()
+    requests.post(f'{stub_url}/_faults?chunk_delay={CHUNK_DELAY}&chunks={CHUNKS}', timeout=5)
+
+    from ai import azure_ai
+    azure_ai.azure_endpoint, azure_ai.azure_api_key, azure_ai.deployment_name = stub_url, 'bench', 'bench'
+    azure_ai.response_cache.max_entries = 0  # every chat goes upstream
+
+    from flask_jwt_extended import JWTManager
+    from api import api_bp
+    from services.ai_streaming import ai_stream_pool
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_ai_stream.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    app.config.update(JWT_SECRET_KEY='bench', AI_STREAM_MAX_CONCURRENT=MAX_STREAMS, AI_STREAM_HEARTBEAT=5)
+    JWTManager(app)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    ai_stream_pool.init_app(app)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    print(f"{concurrency} concurrent chats, {CHUNKS} chunks each, {CHUNK_DELAY * 1000:.0f}ms apart "
+          f"(pool cap {MAX_STREAMS})")
+    for mode in ('inline', 'pool'):
+        app.config['AI_STREAM_MODE'] = mode
+        print(f"  {mode}")
+        queued_before = ai_stream_pool.stats()['queued']
+        served, _ = run(base_url, concurrency)
+        if mode == 'pool':
+            stats = ai_stream_pool.stats()
+            print(f"    {stats['queued'] - queued_before} waited for a slot (at most {stats['max_waiting']} at once), "
+                  f"{stats['queue_timeouts']} timed out, {stats['rejected']} refused")
+        assert served == concurrency, f'{mode}: only {served} of {concurrency} chats were served'
+
+    # Cancellation: read three chunks, hang up, and the upstream stream must stop
+    app.config['AI_STREAM_MODE'] = 'pool'
+    cancelled_before = ai_stream_pool.stats()['cancelled']
+    chat(base_url, read_chunks=3)
+    deadline = time.time() + 5
+    while ai_stream_pool.stats()['cancelled'] == cancelled_before and time.time() < deadline:
+        time.sleep(0.05)
+    stats = ai_stream_pool.stats()
+    assert stats['cancelled'] > cancelled_before, 'disconnect did not cancel the stream'
+    assert stats['active'] == 0
+    print(f"  disconnect after 3 chunks cancelled the upstream stream ({stats['chunks']} chunks relayed in total)")
+    server.shutdown()
+
+    # A server with a fixed number of request threads, without and with the thread budget
+    fixed = FixedThreadServer('127.0.0.1', 0, app, SERVER_THREADS)
+    threading.Thread(target=fixed.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{fixed.server_port}'
+    print(f"  pool on a server with {SERVER_THREADS} request threads")
+    for server_threads in (None, SERVER_THREADS):
+        app.config['AI_STREAM_SERVER_THREADS'] = server_threads
+        ai_stream_pool.init_app(app)
+        stats = ai_stream_pool.stats()
+        print(f"   AI_STREAM_SERVER_THREADS={server_threads}: {stats['max_streams']} streams, "
+              f"{stats['max_queued']} waiting at most")
+        rejected_before = stats['rejected']
+        served, probe_max = run(base_url, concurrency, retry_busy=True)
+        print(f"    {ai_stream_pool.stats()['rejected'] - rejected_before} refused with 503 and retried")
+        assert served == concurrency, f'only {served} of {concurrency} chats were served'
+        if server_threads:
+            assert probe_max is not None and probe_max < RESPONSIVE_MS, \
+                'the other endpoint waited behind the chats despite the thread budget'
+    fixed.shutdown()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
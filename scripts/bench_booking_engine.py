@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Benchmark: booking overlap checks and free-slot search.
+
+Seeds R rooms with a working week of bookings each, then compares
+
+  sql scan      one range query per room (start_time < end AND end_time > start)
+                and the gaps worked out in Python from the returned rows
+  index         services.booking_engine's in-memory interval index
+
+for conflict checks on random slots and for "free slots across all rooms in
+this afternoon" queries. Checks both give the same answers.
+
+Usage: python scripts/bench_booking_engine.py [rooms] [bookings_per_room]    (default 2,000 x 50)
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from bench_common import create_bench_app, timed
+
+from app import db
+from models import Booking, User
+from services.booking_engine import BookingEngine, Slot
+
+START = datetime(2026, 10, 19, 8, 0)
+CHECKS = 2000
+FREE_QUERIES = 20
+
+
+def seed(rooms, per_room):
+    rng = random.Random(11)
+    db.session.execute(insert(User.__table__), [{'email': 'bench@example.com', 'name': 'Bench', 'password_hash': 'x'}])
+    rows = []
+    for room in range(rooms):
+        cursor = START
+        for _ in range(per_room):
+            cursor += timedelta(minutes=rng.choice([0, 15, 30, 60, 90]))
+            length = timedelta(minutes=rng.choice([30, 45, 60, 120]))
+            rows.append({'resource': f'Room {room:04d}', 'user_id': 1, 'start_time': cursor,
+                         'end_time': cursor + length, 'created_at': START})
+            cursor += length
+            if cursor.hour >= 18:
+                cursor = cursor.replace(hour=8, minute=0) + timedelta(days=1)
+    db.session.execute(insert(Booking.__table__), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def sql_conflicts(resource, start, end):
+    return db.session.execute(
+        select(Booking.id).where(Booking.resource == resource, Booking.start_time < end, Booking.end_time > start)
+        .order_by(Booking.start_time, Booking.end_time, Booking.id)
+    ).scalars().all()
+
+
+def sql_free_slots(resources, start, end, min_length):
+    result = {}
+    for resource in resources:
+        booked = db.session.execute(
+            select(Booking.start_time, Booking.end_time)
+            .where(Booking.resource == resource, Booking.start_time < end, Booking.end_time > start)
+            .order_by(Booking.start_time, Booking.end_time)
+        ).all()
+        slots, cursor = [], start
+        for booked_start, booked_end in booked:
+            if booked_start > cursor and booked_start - cursor >= min_length:
+                slots.append(Slot(cursor, booked_start))
+            cursor = max(cursor, booked_end)
+        if end > cursor and end - cursor >= min_length:
+            slots.append(Slot(cursor, end))
+        result[resource] = slots
+    return result
+
+
+def main(rooms, per_room):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_booking_engine.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    rng = random.Random(3)
+    with app.app_context():
+        total = seed(rooms, per_room)
+        names = [f'Room {i:04d}' for i in range(rooms)]
+        engine = BookingEngine(refresh=3600)
+        with timed() as t_load:
+            engine.reload()
+        print(f"{rooms:,} rooms, {total:,} bookings; index built in {t_load['seconds']:.3f}s")
+
+        checks = []
+        for _ in range(CHECKS):
+            start = START + timedelta(days=rng.randint(0, 6), minutes=15 * rng.randint(0, 40))
+            checks.append((rng.choice(names), start, start + timedelta(minutes=rng.choice([30, 60]))))
+        with timed() as t_sql:
+            expected = [sql_conflicts(*check) for check in checks]
+        with timed() as t_index:
+            got = [engine.conflicts(*check) for check in checks]
+        assert got == expected, 'conflict checks differ'
+        print(f"  {CHECKS:,} conflict checks   sql scan {t_sql['seconds'] * 1e6 / CHECKS:8.1f}us each"
+              f"   index {t_index['seconds'] * 1e6 / CHECKS:6.1f}us each"
+              f"   {t_sql['seconds'] / t_index['seconds']:6.0f}x")
+
+        windows = []
+        for _ in range(FREE_QUERIES):
+            start = START + timedelta(days=rng.randint(0, 6), hours=rng.randint(0, 6))
+            windows.append((start, start + timedelta(hours=4)))
+        min_length = timedelta(minutes=30)
+        with timed() as t_sql:
+            expected = [sql_free_slots(names, s, e, min_length) for s, e in windows]
+        with timed() as t_index:
+            got = [engine.free_slots(names, s, e, 30) for s, e in windows]
+        assert got == expected, 'free slots differ'
+        print(f"  free slots in {rooms:,} rooms  sql scan {t_sql['seconds'] * 1e3 / FREE_QUERIES:8.1f}ms each"
+              f"   index {t_index['seconds'] * 1e3 / FREE_QUERIES:6.1f}ms each"
+              f"   {t_sql['seconds'] / t_index['seconds']:6.0f}x")
+        print("  results identical")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
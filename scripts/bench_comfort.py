@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark: comfort index, comfort status and HVAC status over many readings.
+
+Compares the per-object path (TemperatureReading.calculate_comfort_index,
+MeetingRoom.get_comfort_status and the HVAC rule from adjust_temperature,
+called once per reading) with services.comfort, and checks both agree on
+every reading. Without NumPy (a dependency, but guarded) only the list
+fallback is timed.
+
+Usage: python scripts/bench_comfort.py [readings]    (default 1,000,000)
+"""
+import random
+import sys
+
+from bench_common import timed
+
+from models import MeetingRoom, TemperatureReading, compute_hvac_status
+from services.comfort import NUMPY_AVAILABLE, evaluate_comfort, evaluate_comfort_arrays
+
+
+class Reading:
+    """Plain stand-in carrying the attributes the model methods read.
+
+    Instantiating a million mapped objects would measure the ORM rather than
+    the comfort rules, so the unbound methods are called on these instead.
+    """
+    __slots__ = ('temperature', 'humidity', 'comfort_index',
+                 'current_temperature', 'target_temperature', 'hvac_status')
+
+    def __init__(self, temperature, humidity, target):
+        self.temperature = self.current_temperature = temperature
+        self.humidity = humidity
+        self.target_temperature = target
+        self.comfort_index = None
+        self.hvac_status = 'auto'
+
+
+def make_readings(count):
+    rng = random.Random(42)
+    temps, hums, targets = [], [], []
+    for _ in range(count):
+        temps.append(None if rng.random() < 0.01 else round(rng.uniform(12, 32), 1))
+        hums.append(None if rng.random() < 0.02 else round(rng.uniform(15, 85), 1))
+        targets.append(rng.choice((20.0, 21.0, 22.0, 23.0)))
+    return temps, hums, targets
+
+
+def per_object(readings):
+    index, status, hvac = [], [], []
+    for r in readings:
+        index.append(TemperatureReading.calculate_comfort_index(r))
+        status.append(MeetingRoom.get_comfort_status(r))
+        hvac.append(compute_hvac_status(r.current_temperature, r.target_temperature, r.hvac_status))
+    return index, status, hvac
+
+
+def main(count):
+    temps, hums, targets = make_readings(count)
+    readings = [Reading(t, h, g) for t, h, g in zip(temps, hums, targets)]
+    print(f"{count:,} readings (numpy {'available' if NUMPY_AVAILABLE else 'not installed'})")
+
+    with timed() as t_obj:
+        expected = per_object(readings)
+    print(f"  per-object methods      {t_obj['seconds']:8.3f}s")
+
+    with timed() as t_list:
+        result = evaluate_comfort(temps, hums, targets)
+    print(f"  evaluate_comfort        {t_list['seconds']:8.3f}s  ({t_obj['seconds'] / t_list['seconds']:.1f}x)")
+    assert result.comfort_index == expected[0], 'comfort index mismatch'
+    assert result.comfort_status == expected[1], 'comfort status mismatch'
+    assert result.hvac_status == expected[2], 'hvac status mismatch'
+
+    if NUMPY_AVAILABLE:
+        import numpy as np
+        temp_arr = np.array([np.nan if t is None else t for t in temps])
+        hum_arr = np.array([np.nan if h is None else h for h in hums])
+        target_arr = np.array(targets)
+        with timed() as t_arr:
+            arrays = evaluate_comfort_arrays(temp_arr, hum_arr, target_arr)
+        print(f"  evaluate_comfort_arrays {t_arr['seconds']:8.3f}s  ({t_obj['seconds'] / t_arr['seconds']:.1f}x)")
+        assert arrays.comfort_status.tolist() == expected[1]
+
+    print("  results identical to the per-object path")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,73 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Builds a throwaway Flask app bound to its own SQLite database (so the shared
+temp-dir database used by the real app is never touched) and counts the SQL
+statements a block of code issues.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import event
+
+from app import db
+
+
+def create_bench_app(db_uri='sqlite://', tuned=False):
+    """Create a minimal app with every model table created on ``db_uri``.
+
+    ``tuned`` applies the production engine settings (services/db_engine.py)
+    instead of SQLAlchemy's defaults.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if tuned:
+        from services.db_engine import init_database
+        init_database(app)
+    else:
+        db.init_app(app)
+
+    with app.app_context():
+        import models  # noqa: F401 - registers the tables on db.metadata
+        db.create_all()
+    return app
+
+
+class QueryCounter:
+    """Counts statements sent to the database while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@contextmanager
+def count_queries():
+    """Yield a QueryCounter that tracks statements issued on ``db.engine``."""
+    counter = QueryCounter()
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._on_execute)
+
+
+@contextmanager
+def timed():
+    """Yield a dict whose ``seconds`` key is filled in when the block exits."""
+    result = {'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
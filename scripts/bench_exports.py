@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark: streaming exports of a large stock_transactions table.
+
+Seeds N transactions and compares exporting them all as CSV:
+
+  in memory     every StockTransaction loaded through the ORM and written to
+                one StringIO, returned as a single body (how the stock export
+                was built)
+  streamed      GET /api/stock/export/transactions: rows read with yield_per
+                and sent in chunks as they are encoded (also as gzip, NDJSON)
+
+For each it reports the time to the first byte, the total time, and the
+peak Python memory (tracemalloc, in a second run) while producing the body.
+Checks that the streamed CSV has one line per transaction.
+
+Usage: python scripts/bench_exports.py [transactions]    (default 1,000,000)
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timedelta
+from io import StringIO
+
+from sqlalchemy import insert
+
+from bench_common import create_bench_app
+
+from api.stock import stock_bp
+from app import db
+from models import StockItem, StockTransaction
+
+ITEMS = 5000
+BATCH = 100_000
+
+
+def seed(count):
+    rng = random.Random(11)
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(StockItem.__table__), [
+        {'name': f'Item {i}', 'sku': f'SKU{i:07d}', 'unit': 'pcs', 'quantity': 10, 'min_quantity': 0}
+        for i in range(ITEMS)])
+    for offset in range(0, count, BATCH):
+        db.session.execute(insert(StockTransaction.__table__), [
+            {'item_id': rng.randint(1, ITEMS), 'type': rng.choice(['in', 'out', 'out', 'adjustment']),
+             'quantity': rng.choice([1, 2, 5, 10]), 'reference': f'REF-{n}',
+             'created_at': start + timedelta(minutes=n)}
+            for n in range(offset, min(offset + BATCH, count))])
+    db.session.commit()
+
+
+def in_memory_export():
+    """The old approach: load every row, build the whole file, return it."""
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['ID', 'Date', 'Item ID', 'SKU', 'Item Name', 'Type', 'Quantity', 'Reference', 'Notes', 'User ID'])
+    for t in StockTransaction.query.join(StockItem).order_by(StockTransaction.id).all():
+        writer.writerow([t.id, t.created_at.strftime('%Y-%m-%d %H:%M:%S'), t.item_id, t.item.sku, t.item.name,
+                         t.type, t.quantity, t.reference, t.notes, t.user_id])
+    yield output.getvalue().encode()
+
+
+def measure(produce, trace=False):
+    """(seconds to first chunk, total seconds, bytes, lines, first chunk) for ``produce()``'s chunks.
+
+    With ``trace`` returns the peak traced Python memory in MB instead of the
+    timings (tracemalloc slows everything down several times).
+    """
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    first = head = None
+    size = lines = 0
+    for chunk in produce():
+        if first is None:
+            first, head = time.perf_counter() - start, chunk
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    total = time.perf_counter() - start
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        return peak
+    return first, total, size, lines, head
+
+
+def main(count):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_exports.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    app.register_blueprint(stock_bp, url_prefix='/api/stock')
+    client = app.test_client()
+    with app.app_context():
+        seed(count)
+
+    def streamed(query):
+        def produce():
+            response = client.get(f'/api/stock/export/transactions{query}')
+            try:
+                yield from response.response
+            finally:
+                response.close()
+        return produce
+
+    def in_memory():
+        with app.app_context():
+            yield from in_memory_export()
+
+    print(f"{count:,} transactions")
+    print(f"  {'export':<20}{'first byte':>12}{'total':>10}{'size':>10}{'peak memory':>13}")
+    cases = [('streamed csv', streamed('')), ('streamed csv gzip', streamed('?gzip=1')),
+             ('streamed ndjson', streamed('?format=ndjson')), ('in memory csv', in_memory)]
+    for label, produce in cases:
+        first, total, size, lines, head = measure(produce)
+        peak = measure(produce, trace=True)
+        print(f"  {label:<20}{first * 1000:10.1f}ms{total:9.2f}s{size / 1e6:8.1f}MB{peak:11.1f}MB")
+        if label == 'streamed csv':
+            assert lines == count + 1, 'streamed csv is missing rows'
+        if label == 'streamed csv gzip':
+            # Each chunk is flushed, so the first one decompresses on its own
+            assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(head).startswith(b'ID,Date,'), \
+                'gzip stream does not start with the header'
+    print(f"  streamed csv has {count:,} rows plus the header")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Benchmark: latest-presence-per-employee lookups.
+
+Compares the old per-employee loop (one PresenceLog query per person) with
+services.presence_service, which resolves everyone in a single query. The
+query count for the new path should stay flat as headcount grows.
+
+Usage: python scripts/bench_presence_queries.py [headcount ...]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bench_common import create_bench_app, count_queries, timed
+
+from app import db
+from models import User, Employee, PresenceLog, PresenceStatus
+from services.presence_service import get_employee_presence, get_presence_counts
+
+LOGS_PER_EMPLOYEE = 20
+
+
+def seed(headcount):
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+    users = [User(email=f'bench{i}@example.com', name=f'Bench {i}', password_hash='x')
+             for i in range(headcount)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all([
+        Employee(user_id=u.id, first_name='Bench', last_name=str(i),
+                 email=u.email, department='Bench', status='active')
+        for i, u in enumerate(users)
+    ])
+    statuses = list(PresenceStatus)
+    db.session.add_all([
+        PresenceLog(user_id=u.id, status=random.choice(statuses),
+                    created_at=now - timedelta(minutes=n * 30))
+        for u in users for n in range(LOGS_PER_EMPLOYEE)
+    ])
+    db.session.commit()
+
+
+def legacy_present_count():
+    """The loop this benchmark replaces (kept here for comparison only)."""
+    employees = (db.session.query(Employee, User)
+                 .join(User, Employee.user_id == User.id)
+                 .filter(Employee.status == 'active')
+                 .all())
+    present = 0
+    for employee, user in employees:
+        latest_log = (PresenceLog.query
+                      .filter_by(user_id=user.id)
+                      .order_by(PresenceLog.created_at.desc())
+                      .first())
+        if latest_log and latest_log.status == PresenceStatus.IN:
+            present += 1
+    return present
+
+
+def main(headcounts):
+    app = create_bench_app()
+    print(f"{'headcount':>10} | {'legacy q':>9} {'legacy s':>9} | {'roster q':>9} {'roster s':>9} | {'counts q':>9} {'counts s':>9}")
+    with app.app_context():
+        for headcount in headcounts:
+            seed(headcount)
+
+            with count_queries() as lq, timed() as lt:
+                legacy = legacy_present_count()
+            db.session.expire_all()
+
+            with count_queries() as rq, timed() as rt:
+                roster = get_employee_presence()
+            with count_queries() as cq, timed() as ct:
+                counts = get_presence_counts()
+
+            new = sum(1 for p in roster if p.is_in)
+            assert legacy == new == counts['employees_in_office'], (legacy, new, counts)
+            print(f"{headcount:>10} | {lq.count:>9} {lt['seconds']:>9.4f} | "
+                  f"{rq.count:>9} {rt['seconds']:>9.4f} | {cq.count:>9} {ct['seconds']:>9.4f}")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    main(sizes)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Benchmark: reorder suggestions for a large catalogue.
+
+Seeds N stock items with 90 days of intermittent consumption and compares:
+
+  per-item      one 30-day StockTransaction query per low-stock item, summed
+                in Python (how StockService.generate_reorder_suggestions worked)
+  engine        services/reorder_engine.forecast_reorders: one read of the
+                daily stock_consumption rows, Croston/SBA rates for every
+                item at once
+
+The transactions are bulk-inserted, bypassing the ORM listener that keeps
+stock_consumption up to date, so the table is backfilled with
+rebuild_consumption first (timed too). Times the engine's stages separately
+and, with NumPy installed, checks the per-day aggregated read and the array
+fit against the plain Python ones (a row per item-day, a loop per event).
+
+Usage: python scripts/bench_reorder_engine.py [items] [max daily chance]    (default 50,000 0.3)
+
+Each item consumes on a day with a chance drawn from 0.02 up to the given
+maximum; 0.3 averages about 14 consumption days per item.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert
+
+from bench_common import count_queries, create_bench_app, timed
+
+from app import db
+from models import StockItem, StockTransaction
+from services import reorder_engine
+from services.stock_service import StockService
+
+HISTORY_DAYS = 90
+BATCH = 100_000
+
+
+def seed(count, max_chance):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    db.session.execute(insert(StockItem.__table__), [
+        {'name': f'Item {i}', 'sku': f'SKU{i:07d}', 'unit': 'pcs', 'quantity': rng.choice([0, 2, 5, 10, 25, 60]),
+         'reorder_point': rng.choice([None, 5, 10]), 'min_quantity': 0, 'unit_cost': 3.5}
+        for i in range(count)])
+    rows = []
+    for item_id in range(1, count + 1):
+        daily_chance = rng.uniform(0.02, max_chance)
+        for day in range(HISTORY_DAYS):
+            if rng.random() < daily_chance:
+                rows.append({'item_id': item_id, 'type': 'out', 'quantity': rng.choice([1, 1, 2, 3, 5]),
+                             'created_at': now - timedelta(days=day, minutes=rng.randint(0, 600))})
+        if len(rows) >= BATCH:
+            db.session.execute(insert(StockTransaction.__table__), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(StockTransaction.__table__), rows)
+    db.session.commit()
+    return db.session.query(StockTransaction).count()
+
+
+def per_item_suggestions():
+    """The old approach: a transaction query per low-stock item."""
+    suggestions = []
+    for item in StockService.get_low_stock_items():
+        recent = StockTransaction.query.filter(and_(
+            StockTransaction.item_id == item.id, StockTransaction.type == 'out',
+            StockTransaction.created_at >= datetime.now() - timedelta(days=30))).all()
+        monthly_usage = sum(t.quantity for t in recent) if recent else item.reorder_point or 5
+        suggestions.append((item.id, max(monthly_usage * 2, (item.reorder_point or 5) * 2)))
+    return suggestions
+
+
+def main(count, max_chance):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_reorder_engine.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    with app.app_context():
+        transactions = seed(count, max_chance)
+        print(f"{count:,} items, {transactions:,} consumption transactions over {HISTORY_DAYS} days "
+              f"(numpy {'available' if reorder_engine.NUMPY_AVAILABLE else 'not installed'})")
+        with timed() as t_rebuild:
+            item_days = reorder_engine.rebuild_consumption()
+        print(f"  rebuild_consumption {t_rebuild['seconds']:7.3f}s  {item_days:,} item-days (one-off backfill)")
+
+        db.session.expunge_all()
+        with count_queries() as q_old, timed() as t_old:
+            old = per_item_suggestions()
+        print(f"  per-item queries   {t_old['seconds']:8.3f}s  {q_old.count:6d} queries  {len(old):,} suggestions")
+
+        with count_queries() as q_new, timed() as t_new:
+            new = reorder_engine.forecast_reorders(history_days=HISTORY_DAYS)
+        print(f"  engine             {t_new['seconds']:8.3f}s  {q_new.count:6d} queries  {len(new):,} suggestions"
+              f"  ({t_old['seconds'] / t_new['seconds']:.0f}x)")
+
+        start = datetime.utcnow().date() - timedelta(days=HISTORY_DAYS - 1)
+        item_ids = [row[0] for row in db.session.query(StockItem.id).order_by(StockItem.id)]
+        numpy_available = reorder_engine.NUMPY_AVAILABLE
+        reorder_engine.NUMPY_AVAILABLE = False
+        with timed() as t_load:
+            events = reorder_engine.load_demand(item_ids, start)
+        with timed() as t_python:
+            python_rates = reorder_engine.croston_rates(events, len(item_ids), HISTORY_DAYS)
+        reorder_engine.NUMPY_AVAILABLE = numpy_available
+        print(f"    consumption read {t_load['seconds']:8.3f}s  {len(events.day):,} item-days, a row each")
+        if numpy_available:
+            with timed() as t_arrays:
+                arrays = reorder_engine.load_demand_arrays(item_ids, start)
+            print(f"    read (per day)   {t_arrays['seconds']:8.3f}s  into arrays")
+            assert all(list(got) == list(want) for got, want in zip(
+                (arrays.item_index, arrays.day, arrays.quantity), (events.item_index, events.day, events.quantity))), \
+                'per-day and per-row reads differ'
+        print(f"    fit (python)     {t_python['seconds']:8.3f}s")
+        if numpy_available:
+            with timed() as t_numpy:
+                numpy_rates = reorder_engine.croston_rates_arrays(events, len(item_ids), HISTORY_DAYS)
+            print(f"    fit (numpy)      {t_numpy['seconds']:8.3f}s")
+            assert numpy_rates.tolist() == python_rates, 'numpy and python fits differ'
+            print("  numpy and python reads and fits identical")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.3)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark: stock item and visitor-host search at scale.
+
+Seeds N stock items and M users (the triggers index them as they go in),
+then compares, per query, fetching the first 20 matches:
+
+  ilike scan   name ILIKE '%query%' ORDER BY id LIMIT 20 (how the stock
+               list and check_in_visitor's host lookup searched)
+  fts          services/search_index.search: FTS5 trigram substring match
+               over every indexed field, fuzzy fallback for typos
+
+A query with no substring match makes the scan read the whole table; typos
+find nothing with ILIKE at all. The users also include DECOYS "Jones Smith
+<n>" ahead of one "Jonathan Smithers": a misspelt "jonathon smithers"
+shares its common trigrams with every decoy, and must still find him.
+
+Usage: python scripts/bench_search_index.py [items] [users]    (default 1,000,000 x 200,000)
+"""
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import insert
+
+from bench_common import create_bench_app, timed
+
+from app import db
+from models import StockItem, User
+from services import search_index
+
+LIMIT = 20
+BATCH = 50_000
+DECOYS = 5000
+RARE_HOST = 'Jonathan Smithers'
+
+PRODUCTS = ['Coffee beans', 'Printer paper', 'Toner cartridge', 'Oat milk', 'Green tea', 'HDMI cable',
+            'USB-C charger', 'Whiteboard marker', 'Sticky notes', 'Hand soap', 'Paper towels', 'Batteries AA',
+            'Desk lamp', 'Ergonomic mouse', 'Notebook A5', 'Stapler', 'Monitor stand', 'Water filter']
+VARIANTS = ['black', 'blue', 'large', 'small', 'pack of 10', 'pack of 50', 'refill', 'premium', 'eco', 'spare']
+FIRST = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+         'Thabo', 'Naledi', 'Sipho', 'Lerato', 'Pieter', 'Annelie', 'Ravi', 'Priya', 'Chen', 'Mei']
+LAST = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Nkosi', 'Dlamini',
+        'van der Merwe', 'Botha', 'Naidoo', 'Pillay', 'Wang', 'Li', 'Khumalo', 'Mokoena', 'Fourie', 'Pretorius']
+
+CASES = [
+    ('stock', 'sku', 'SKU0754321'),
+    ('stock', 'rare', 'whiteboard marker blue'),
+    ('stock', 'common', 'toner'),
+    ('stock', 'typo', 'whitebaord markr'),
+    ('stock', 'no match', 'projector bulb'),
+    ('users', 'host', 'naledi khumalo'),
+    ('users', 'host typo', 'naldi kumalo'),
+    ('users', 'rare typo', 'jonathon smithers'),
+    ('users', 'no match', 'zanele mbeki'),
+]
+
+
+def seed(items, users):
+    rng = random.Random(7)
+    for start in range(0, items, BATCH):
+        db.session.execute(insert(StockItem.__table__), [
+            {'name': f'{rng.choice(PRODUCTS)} {rng.choice(VARIANTS)} {i}', 'sku': f'SKU{i:07d}', 'unit': 'pcs',
+             'quantity': rng.randint(0, 100), 'description': f'Bin {rng.randint(1, 500)}'}
+            for i in range(start, min(items, start + BATCH))])
+    for start in range(0, users, BATCH):
+        db.session.execute(insert(User.__table__), [
+            {'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+            for i in range(start, min(users, start + BATCH))])
+    db.session.execute(insert(User.__table__), [
+        {'name': f'Jones Smith {i}', 'email': f'decoy{i}@example.com', 'password_hash': 'x'} for i in range(DECOYS)]
+        + [{'name': RARE_HOST, 'email': 'jsmithers@example.com', 'password_hash': 'x'}])
+    db.session.commit()
+
+
+def ilike_scan(kind, query):
+    model = StockItem if kind == 'stock' else User
+    pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return model.query.filter(model.name.ilike(f'%{pattern}%', escape='\\')).order_by(model.id).limit(LIMIT).all()
+
+
+def main(items, users):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_search_index.db')
+    app = create_bench_app(f'sqlite:///{db_path}', tuned=True)
+    with app.app_context():
+        search_index.ensure_search_index()
+        with timed() as t_seed:
+            seed(items, users)
+        print(f"{items:,} stock items and {users:,} users, indexed by triggers while inserting "
+              f"in {t_seed['seconds']:.1f}s; first {LIMIT} matches")
+        print(f"  {'query':<41}{'ilike scan':>16}{'fts':>20}{'speedup':>9}")
+        for kind, label, query in CASES:
+            search_index.search(kind, query, LIMIT)  # warm the page cache for both
+            db.session.expunge_all()
+            with timed() as t_old:
+                old = ilike_scan(kind, query)
+            with timed() as t_new:
+                hits = search_index.search(kind, query, LIMIT)
+            exact = sum(hit.exact for hit in hits)
+            print(f"  {kind + ' ' + label + ':':<16}{query!r:<25}{t_old['seconds'] * 1000:9.1f}ms {len(old):3d} hits"
+                  f"{t_new['seconds'] * 1000:9.2f}ms {exact:2d}+{len(hits) - exact:<2d} hits"
+                  f"{t_old['seconds'] / t_new['seconds']:8.0f}x")
+            if label == 'rare typo':
+                assert hits and hits[0].fields['name'] == RARE_HOST, \
+                    f"fuzzy search ranked {hits[0].fields['name'] if hits else None!r} above {RARE_HOST!r}"
+        print("  fts hits are substring+fuzzy")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200_000)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark: a bulk sensor backfill near the ingest row limit.
+
+Posts N NDJSON readings from one sensor, five minutes apart (49,000 by
+default: about 24 weeks), to POST /api/sensors/readings/bulk. Every reading
+lands in its own 5-minute bucket, so the climate rollups merge roughly two
+rows per reading (sensor and office scopes, 5m/1h/1d) - far more bound
+parameters than one statement may carry.
+
+The connection's variable limit is set to SQLite's default (32,766), as on
+stock builds, whatever this build was compiled with. Checks the request
+returns 200 with every reading accepted, that the rollups hold one sample
+per reading at each resolution, and that posting the batch again merges
+into the same buckets.
+
+Usage: python scripts/bench_sensor_ingest.py [readings]    (default 49,000)
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select
+
+from bench_common import create_bench_app, timed
+
+from api.sensors import DEFAULT_MAX_ROWS, sensors_bp
+from app import db
+from models import ClimateRollup, Office, TemperatureReading, TemperatureSensor
+
+SQLITE_DEFAULT_MAX_VARIABLES = 32766
+SENSOR_KEY = 'bench-key'
+
+
+def payload(sensor_id, count, start):
+    return '\n'.join(json.dumps({'sensor_id': sensor_id, 'temperature': round(20 + (i % 60) / 10, 1),
+                                 'humidity': 40 + i % 20,
+                                 'timestamp': (start + timedelta(minutes=5 * i)).isoformat()})
+                     for i in range(count))
+
+
+def main(count):
+    assert count <= DEFAULT_MAX_ROWS, f'the endpoint accepts at most {DEFAULT_MAX_ROWS:,} readings'
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_sensor_ingest.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    app.config['SENSOR_INGEST_KEY'] = SENSOR_KEY
+    app.register_blueprint(sensors_bp, url_prefix='/api/sensors')
+    client = app.test_client()
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def default_limit(dbapi_connection, _):
+            dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, SQLITE_DEFAULT_MAX_VARIABLES)
+        db.engine.dispose()
+
+        office = Office(name='Bench office')
+        db.session.add(office)
+        db.session.flush()
+        sensor = TemperatureSensor(name='Bench sensor', office_id=office.id)
+        db.session.add(sensor)
+        db.session.commit()
+        sensor_id = sensor.id
+
+    start = datetime(2026, 1, 1)
+    body = payload(sensor_id, count, start)
+    days = (timedelta(minutes=5 * (count - 1)) / timedelta(days=1))
+    print(f"{count:,} readings over {days:.0f} days, variable limit {SQLITE_DEFAULT_MAX_VARIABLES:,}")
+    for attempt in ('first post', 'same batch again'):
+        with timed() as t:
+            response = client.post('/api/sensors/readings/bulk', data=body, content_type='application/x-ndjson',
+                                   headers={'X-Sensor-Key': SENSOR_KEY})
+        result = response.get_json()
+        print(f"  {attempt:<18}{t['seconds']:7.2f}s  HTTP {response.status_code}  "
+              f"{result.get('accepted', 0):,} accepted  {result.get('error', '')}")
+        assert response.status_code == 200 and result['accepted'] == count, 'backfill was not stored'
+
+    with app.app_context():
+        stored = db.session.scalar(select(func.count()).select_from(TemperatureReading))
+        rollups = db.session.execute(
+            select(ClimateRollup.scope, ClimateRollup.resolution, func.count(), func.sum(ClimateRollup.sample_count))
+            .group_by(ClimateRollup.scope, ClimateRollup.resolution)
+        ).all()
+    assert stored == 2 * count, 'readings missing'
+    for scope, resolution, buckets, samples in rollups:
+        print(f"  {scope:<14}{resolution:>4}{buckets:9,d} buckets{samples:10,d} samples")
+        assert samples == 2 * count, f'{scope} {resolution} rollups lost samples'
+    print(f"  {sum(r[2] for r in rollups):,} rollup rows, every reading counted once per post")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 49_000)
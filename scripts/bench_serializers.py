@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark: marshmallow Schema.dump versus the generated serialisers.
+
+For every schema in schemas.py, fills its table with N rows (some columns
+left NULL) and times three ways of producing the list response:
+
+  orm + marshmallow   Model.query.all() then Schema(many=True).dump (the old path)
+  core + marshmallow  Core rows dumped by marshmallow
+  core + fast         Core rows (selected in the serialiser's field order)
+                      dumped by services.serializers
+
+The last two columns time the dump step alone (same Core rows, no query or
+JSON encoding). Checks that the JSON Flask sends is byte-identical for all
+three, and for the streamed iter_json output.
+
+Usage: python scripts/bench_serializers.py [rows]    (default 100,000)
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from bench_common import create_bench_app, timed
+
+from app import db
+from models import Asset, Booking, Employee, Maintenance, Office, User
+from schemas import AssetSchema, BookingSchema, EmployeeSchema, MaintenanceSchema, OfficeSchema, UserSchema
+from services.serializers import dump_rows, fast_schema, iter_json
+
+CASES = [
+    ('users', User, UserSchema),
+    ('offices', Office, OfficeSchema),
+    ('employees', Employee, EmployeeSchema),
+    ('assets', Asset, AssetSchema),
+    ('bookings', Booking, BookingSchema),
+    ('maintenances', Maintenance, MaintenanceSchema),
+]
+
+
+def seed(count):
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1, 8, 0)
+
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+
+    db.session.execute(insert(User.__table__), [
+        {'email': f'user{i}@example.com', 'name': maybe(f'User {i}'), 'password_hash': 'x',
+         'is_admin': i % 50 == 0, 'created_at': start + timedelta(minutes=i)} for i in range(count)])
+    db.session.execute(insert(Office.__table__), [
+        {'name': f'Office {i}', 'address': maybe(f'{i} Main Road'), 'description': maybe('Ünïcode "quoted" text'),
+         'created_at': maybe(start)} for i in range(count)])
+    db.session.execute(insert(Employee.__table__), [
+        {'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': maybe(f'emp{i}@example.com'),
+         'phone': maybe('+27 21 555 0101'), 'role': maybe('Engineer'), 'office_id': maybe(1 + i % 50),
+         'created_at': start + timedelta(seconds=i)} for i in range(count)])
+    db.session.execute(insert(Asset.__table__), [
+        {'name': f'Asset {i}', 'serial': maybe(f'SN-{i:08d}'), 'status': rng.choice(['available', 'in_use']),
+         'office_id': maybe(1 + i % 50), 'created_at': start} for i in range(count)])
+    db.session.execute(insert(Booking.__table__), [
+        {'resource': f'Room {i % 40}', 'user_id': 1 + i % 500, 'start_time': start + timedelta(hours=i),
+         'end_time': start + timedelta(hours=i, minutes=45), 'notes': maybe('Weekly sync\nline two'),
+         'created_at': start} for i in range(count)])
+    db.session.execute(insert(Maintenance.__table__), [
+        {'asset_id': 1 + i % 1000, 'description': maybe('Replace filter'), 'status': 'open',
+         'created_at': start + timedelta(microseconds=i)} for i in range(count)])
+    db.session.commit()
+
+
+def main(count):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_serializers.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    with app.app_context():
+        seed(count)
+        print(f"{count:,} rows per table")
+        print(f"  {'schema':<14}{'orm+marshmallow':>17}{'core+marshmallow':>18}{'core+fast':>11}{'speedup':>9}"
+              f"{'dump: mm':>11}{'fast':>8}")
+        for name, model, schema_cls in CASES:
+            columns = [getattr(model, f) for f in schema_cls._declared_fields]
+            db.session.expunge_all()
+
+            with timed() as t_orm:
+                expected = app.json.response(schema_cls(many=True).dump(model.query.all())).get_data()
+            db.session.expunge_all()
+
+            with timed() as t_core:
+                rows = db.session.execute(select(*columns)).all()
+                core = app.json.response(schema_cls(many=True).dump(rows)).get_data()
+
+            with timed() as t_fast:
+                rows = db.session.execute(select(*fast_schema(schema_cls).columns(model))).all()
+                fast = app.json.response(dump_rows(schema_cls, rows)).get_data()
+
+            with timed() as d_mm:
+                schema_cls(many=True).dump(rows)
+            with timed() as d_fast:
+                dump_rows(schema_cls, rows)
+
+            with app.test_request_context():
+                result = db.session.execute(select(*fast_schema(schema_cls).columns(model)))
+                streamed = ''.join(iter_json(schema_cls, result)).encode()
+
+            assert core == expected, f'{name}: core+marshmallow differs'
+            assert fast == expected, f'{name}: fast serialiser differs'
+            assert streamed == expected, f'{name}: streamed JSON differs'
+            print(f"  {name:<14}{t_orm['seconds']:16.3f}s{t_core['seconds']:17.3f}s"
+                  f"{t_fast['seconds']:10.3f}s{t_orm['seconds'] / t_fast['seconds']:8.1f}x"
+                  f"{d_mm['seconds']:10.3f}s{d_fast['seconds']:7.3f}s")
+        print("  JSON byte-identical for every schema (list and streamed)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark: several processes writing check-ins while others read the dashboard.
+
+Runs the same workload against two fresh database files:
+
+  default   SQLAlchemy's stock SQLite settings (rollback journal)
+  tuned     services/db_engine.py (WAL, synchronous=NORMAL, busy_timeout,
+            cache/mmap, sized pool) with run_with_retry around each write
+
+Writer processes insert one PresenceLog per transaction (as the check-in
+portal does); reader processes run the dashboard's presence queries. Reports
+throughput, latency percentiles and how many requests failed with
+"database is locked".
+
+Usage: python scripts/bench_sqlite_contention.py [writers] [readers] [seconds]    (default 4 4 10)
+"""
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_common import create_bench_app
+
+SEED_EMPLOYEES = 500
+SEED_LOGS_PER_EMPLOYEE = 20
+
+
+def seed(db_uri, tuned):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+
+    from app import db
+    from models import Employee, PresenceLog, PresenceStatus, User
+
+    app = create_bench_app(db_uri, tuned)
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(insert(User.__table__), [
+            {'email': f'bench{i}@example.com', 'name': f'Bench {i}', 'password_hash': 'x'}
+            for i in range(SEED_EMPLOYEES)])
+        db.session.execute(insert(Employee.__table__), [
+            {'user_id': i + 1, 'first_name': 'Bench', 'last_name': str(i), 'email': f'bench{i}@example.com',
+             'department': 'Bench', 'status': 'active'} for i in range(SEED_EMPLOYEES)])
+        db.session.execute(insert(PresenceLog.__table__), [
+            {'user_id': i % SEED_EMPLOYEES + 1, 'status': PresenceStatus.IN.name if i % 3 else PresenceStatus.OUT.name,
+             'created_at': now - timedelta(minutes=i)} for i in range(SEED_EMPLOYEES * SEED_LOGS_PER_EMPLOYEE)])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(kind, db_uri, tuned, seconds, results):
+    from sqlalchemy.exc import OperationalError
+
+    from app import db
+    from models import PresenceLog, PresenceStatus
+    from services.db_engine import is_locked_error, run_with_retry
+    from services.presence_service import get_employee_presence, get_presence_counts
+
+    app = create_bench_app(db_uri, tuned)
+    latencies, locked, errors = [], 0, 0
+    with app.app_context():
+        n = os.getpid()
+
+        def check_in():
+            n_user = (n + len(latencies)) % SEED_EMPLOYEES + 1
+            db.session.add(PresenceLog(user_id=n_user, status=PresenceStatus.IN, notes='bench'))
+            db.session.commit()
+
+        def dashboard():
+            get_presence_counts()
+            get_employee_presence()
+            db.session.commit()
+
+        work = check_in if kind == 'writer' else dashboard
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if tuned and kind == 'writer':
+                    run_with_retry(work)
+                else:
+                    work()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                if is_locked_error(e):
+                    locked += 1
+                else:
+                    errors += 1
+    results.put((kind, latencies, locked, errors))
+
+
+def run(label, writers, readers, seconds, tuned):
+    db_path = os.path.join(tempfile.mkdtemp(), f'bench_contention_{label}.db')
+    db_uri = f'sqlite:///{db_path}'
+    seed(db_uri, tuned)
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(kind, db_uri, tuned, seconds, results))
+                 for kind in ['writer'] * writers + ['reader'] * readers]
+    for p in processes:
+        p.start()
+    collected = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    for kind in ('writer', 'reader'):
+        latencies = sorted(l for k, ls, _, _ in collected if k == kind for l in ls)
+        locked = sum(lk for k, _, lk, _ in collected if k == kind)
+        errors = sum(e for k, _, _, e in collected if k == kind)
+        if not latencies:
+            print(f"  {label:<8}{kind + 's':<9}     no successful requests, {locked} locked, {errors} other errors")
+            continue
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        print(f"  {label:<8}{kind + 's':<9}{len(latencies) / seconds:9.1f}/s   p50 {p50:7.1f}ms   p99 {p99:8.1f}ms"
+              f"   locked {locked:5d}   other errors {errors}")
+
+
+def main(writers, readers, seconds):
+    print(f"{writers} writer and {readers} reader processes for {seconds}s each")
+    run('default', writers, readers, seconds, tuned=False)
+    run('tuned', writers, readers, seconds, tuned=True)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]]
+    main(*(args + [4, 4, 10][len(args):]))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Benchmark: /api/stock/items listing at scale.
+
+Seeds N stock items across many locations and categories and compares, per
+filter, fetching one page of 100 items:
+
+  python filter   every StockItem loaded, status computed and filters applied
+                  in Python (how the endpoint filtered its in-memory list)
+  sql keyset      StockService.list_items: filters in SQL on indexes,
+                  WHERE id > cursor ORDER BY id LIMIT 101
+
+Also times a page deep into the table (cursor near the end). Checks both
+return the same items.
+
+Usage: python scripts/bench_stock_listing.py [items] [locations]    (default 100,000 x 200)
+"""
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import insert, select
+
+from bench_common import create_bench_app, timed
+
+from app import db
+from models import StockCategory, StockItem, StockLocation
+from services.stock_service import StockService
+
+PAGE = 100
+CATEGORIES = 30
+
+
+def seed(count, locations):
+    rng = random.Random(5)
+    db.session.execute(insert(StockLocation.__table__),
+                       [{'name': f'Location {i:03d}', 'area': 'General'} for i in range(locations)])
+    db.session.execute(insert(StockCategory.__table__), [{'name': f'Category {i:02d}'} for i in range(CATEGORIES)])
+    db.session.execute(insert(StockItem.__table__), [
+        {'name': f'{rng.choice(["Coffee", "Paper", "Toner", "Milk", "Tea", "Cable"])} item {i}',
+         'sku': f'SKU{i:07d}', 'unit': 'pcs', 'quantity': rng.choice([0, 1, 2, 5, 10, 20, 50, 100]),
+         'reorder_point': rng.choice([None, 0, 5, 10]), 'min_quantity': 0, 'unit_cost': 10.0,
+         'location_id': rng.randint(1, locations), 'category_id': rng.randint(1, CATEGORIES)}
+        for i in range(count)])
+    db.session.commit()
+
+
+def python_filter(status=None, location=None, category=None, search=None, after_id=None):
+    """The old endpoint's approach: load everything, filter in a loop."""
+    page = []
+    for item in StockItem.query.order_by(StockItem.id).all():
+        if after_id is not None and item.id <= after_id:
+            continue
+        if status and item.get_status() != status:
+            continue
+        if location and (item.location.name if item.location else None) != location:
+            continue
+        if category and (item.category.name if item.category else None) != category:
+            continue
+        if search and search.lower() not in item.name.lower():
+            continue
+        page.append((item.id, item.get_status()))
+        if len(page) == PAGE:
+            break
+    return page
+
+
+def main(count, locations):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_stock_listing.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    with app.app_context():
+        seed(count, locations)
+        last_id = db.session.execute(select(StockItem.id).order_by(StockItem.id.desc()).limit(1)).scalar()
+        cases = [
+            ('no filter', {}),
+            ('status=Low', {'status': 'Low'}),
+            ('status=Critical', {'status': 'Critical'}),
+            ('location', {'location': 'Location 042'}),
+            ('category', {'category': 'Category 07'}),
+            ('location+status', {'location': 'Location 042', 'status': 'OK'}),
+            ('search', {'search': 'toner'}),
+            ('deep page', {'after_id': last_id - 500}),
+        ]
+        print(f"{count:,} items in {locations} locations; one page of {PAGE}")
+        print(f"  {'filter':<18}{'python filter':>15}{'sql keyset':>12}{'speedup':>9}")
+        for label, filters in cases:
+            db.session.expunge_all()
+            with timed() as t_old:
+                expected = python_filter(**filters)
+            db.session.expunge_all()
+            with timed() as t_new:
+                rows, _ = StockService.list_items(limit=PAGE, **filters)
+            got = [(row.id, row.status) for row in rows]
+            assert got == expected, f'{label}: results differ'
+            print(f"  {label:<18}{t_old['seconds'] * 1000:13.1f}ms{t_new['seconds'] * 1000:10.2f}ms"
+                  f"{t_old['seconds'] / t_new['seconds']:8.0f}x")
+        print("  same items for every filter")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
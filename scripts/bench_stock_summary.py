@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Benchmark: stock dashboard tiles (summary, alerts, valuation) at scale.
+
+Seeds N stock items across many locations and categories and compares:
+
+  python loop   every StockItem loaded and walked in Python; breakdowns
+                through location.items / category.items (how /summary,
+                /alerts and StockService.get_stock_report worked)
+  sql           StockService.get_stock_totals / get_stock_alerts /
+                get_breakdown: GROUP BY queries, alerts via the status index
+
+Reports time and statements issued per tile, and checks both agree.
+
+Usage: python scripts/bench_stock_summary.py [items] [locations]    (default 100,000 x 200)
+"""
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import insert
+
+from bench_common import count_queries, create_bench_app, timed
+
+from app import db
+from models import StockCategory, StockItem, StockLocation
+from services.stock_service import StockService
+
+CATEGORIES = 30
+
+
+def seed(count, locations):
+    rng = random.Random(11)
+    db.session.execute(insert(StockLocation.__table__),
+                       [{'name': f'Location {i:03d}', 'area': 'General'} for i in range(locations)])
+    db.session.execute(insert(StockCategory.__table__), [{'name': f'Category {i:02d}'} for i in range(CATEGORIES)])
+    db.session.execute(insert(StockItem.__table__), [
+        {'name': f'Item {i}', 'sku': f'SKU{i:07d}', 'unit': 'pcs',
+         'quantity': rng.choice([0, 1, 2, 5, 10, 20, 50, 100]), 'reorder_point': rng.choice([None, 0, 5, 10]),
+         'min_quantity': 0, 'unit_cost': rng.choice([None, 0.5, 2.25, 10.0]),
+         'location_id': rng.choice([None] + list(range(1, locations + 1))),
+         'category_id': rng.choice([None] + list(range(1, CATEGORIES + 1)))}
+        for i in range(count)])
+    db.session.commit()
+
+
+def loop_summary():
+    counts = {'total_items': 0, 'Low': 0, 'Critical': 0, 'total_value': 0.0}
+    for item in StockItem.query.all():
+        counts['total_items'] += 1
+        if item.get_status() != 'OK':
+            counts[item.get_status()] += 1
+        counts['total_value'] += item.unit_cost * item.quantity if item.unit_cost and item.quantity else 0
+    counts['total_value'] = round(counts['total_value'], 2)
+    return counts
+
+
+def loop_alerts():
+    return sorted(item.id for item in StockItem.query.all() if item.get_status() != 'OK')
+
+
+def loop_breakdown():
+    return {location.name: (len(location.items), round(sum(item.get_total_value() for item in location.items), 2))
+            for location in StockLocation.query.all()}
+
+
+def sql_summary():
+    totals = StockService.get_stock_totals()
+    return {'total_items': totals['total_items'], 'Low': totals['by_status']['Low'],
+            'Critical': totals['by_status']['Critical'], 'total_value': totals['total_value']}
+
+
+def sql_alerts():
+    return sorted(alert['id'] for alert in StockService.get_stock_alerts())
+
+
+def sql_breakdown():
+    return {entry['name']: (entry['item_count'], entry['total_value'])
+            for entry in StockService.get_breakdown('location') if entry['id'] is not None}
+
+
+def main(count, locations):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_stock_summary.db')
+    app = create_bench_app(f'sqlite:///{db_path}')
+    with app.app_context():
+        seed(count, locations)
+        print(f"{count:,} items in {locations} locations and {CATEGORIES} categories")
+        print(f"  {'tile':<12}{'python loop':>24}{'sql':>22}{'speedup':>9}")
+        for label, old, new in [('summary', loop_summary, sql_summary), ('alerts', loop_alerts, sql_alerts),
+                                ('locations', loop_breakdown, sql_breakdown)]:
+            db.session.expunge_all()
+            with count_queries() as q_old, timed() as t_old:
+                expected = old()
+            db.session.expunge_all()
+            with count_queries() as q_new, timed() as t_new:
+                got = new()
+            if label == 'locations':
+                # The loop rounds per item, SUM() rounds the total
+                assert got.keys() == expected.keys() and all(
+                    got[k][0] == expected[k][0] and abs(got[k][1] - expected[k][1]) < 0.05 for k in got), label
+            elif label == 'summary':
+                assert {k: v for k, v in got.items() if k != 'total_value'} == \
+                       {k: v for k, v in expected.items() if k != 'total_value'}, label
+                assert abs(got['total_value'] - expected['total_value']) < 0.05, label
+            else:
+                assert got == expected, label
+            print(f"  {label:<12}{t_old['seconds'] * 1000:10.1f}ms {q_old.count:6d} queries"
+                  f"{t_new['seconds'] * 1000:9.1f}ms {q_new.count:4d} queries"
+                  f"{t_old['seconds'] / t_new['seconds']:8.0f}x")
+        print("  same results for every tile")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Index advisor: run EXPLAIN QUERY PLAN over the app's hot queries.
+
+Each entry in query_catalogue() mirrors a lookup the app really performs. The
+advisor asks SQLite how it would execute each one and flags any full table
+scan, so a dropped or missing index is caught before it reaches production.
+
+Usage:
+    python scripts/index_advisor.py                  # scratch DB built from models.py
+    python scripts/index_advisor.py --db sqlite:////tmp/office_eathon.db
+    python scripts/index_advisor.py --verbose        # print every plan
+
+Exits with status 1 when any query needs a full table scan.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import select
+
+from app import db
+
+SCAN_RE = re.compile(r'^SCAN (\w+)(.*)$')
+
+
+def query_catalogue():
+    """(name, statement) pairs for the lookups the app issues."""
+    from models import (
+        ActivityLog, CurrentPresence, Employee, PresenceLog, PresenceStatus, StockTransaction,
+        TemperatureReading, User, WeatherData
+    )
+    from services.presence_service import latest_presence_subquery
+
+    since = datetime.utcnow()
+    latest = latest_presence_subquery()
+    return [
+        ('auth login: user by email',
+         select(User).where(User.email == 'someone@example.com')),
+        ('seed presence: latest presence log for user since a date',
+         select(PresenceLog).where(PresenceLog.user_id == 1, PresenceLog.created_at >= since)
+         .order_by(PresenceLog.created_at.desc()).limit(1)),
+        ('presence_service: present employees',
+         select(Employee.id, CurrentPresence.since)
+         .join(CurrentPresence, CurrentPresence.user_id == Employee.user_id)
+         .where(CurrentPresence.status == PresenceStatus.IN)),
+        ('presence_service: rebuild from history',
+         select(latest.c.user_id, latest.c.status, latest.c.created_at)),
+        ('TemperatureSensor.get_latest_reading',
+         select(TemperatureReading).where(TemperatureReading.sensor_id == 1)
+         .order_by(TemperatureReading.created_at.desc()).limit(1)),
+        ('WeatherStation.get_latest_weather',
+         select(WeatherData).where(WeatherData.station_id == 1)
+         .order_by(WeatherData.created_at.desc()).limit(1)),
+        ('stock: recent transactions for item',
+         select(StockTransaction).where(StockTransaction.item_id == 1,
+                                        StockTransaction.created_at >= since)),
+        ('stock: transaction history for item',
+         select(StockTransaction).where(StockTransaction.item_id == 1)
+         .order_by(StockTransaction.created_at.desc()).limit(50)),
+        ('stock summary: recent activity in category',
+         select(ActivityLog).where(ActivityLog.category == 'stock',
+                                   ActivityLog.created_at >= since)),
+    ]
+
+
+def explain(conn, stmt):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    # Compile with named parameters; plan selection does not depend on the
+    # bound values, so every parameter is sent as NULL
+    dialect = type(conn.dialect)(paramstyle='named')
+    compiled = stmt.compile(dialect=dialect)
+    params = {key: None for key in compiled.params}
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + compiled.string, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan, table_names):
+    """Plan lines that read a whole table without an index."""
+    flagged = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if match and match.group(1) in table_names and 'USING' not in match.group(2):
+            flagged.append(detail)
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', help='SQLAlchemy URI of the SQLite database to inspect '
+                                     '(default: a scratch in-memory DB built from models.py)')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every query')
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.db or 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        import models  # noqa: F401 - registers the tables on db.metadata
+        if db.engine.dialect.name != 'sqlite':
+            print(f"Index advisor only understands SQLite plans (got {db.engine.dialect.name})")
+            return 2
+        if not args.db:
+            db.create_all()
+
+        table_names = set(db.metadata.tables)
+        catalogue = query_catalogue()
+        problems = 0
+        with db.engine.connect() as conn:
+            for name, stmt in catalogue:
+                plan = explain(conn, stmt)
+                scans = full_scans(plan, table_names)
+                marker = '❌' if scans else '✅'
+                print(f"{marker} {name}")
+                for detail in (plan if args.verbose else scans):
+                    print(f"     {detail}")
+                problems += bool(scans)
+
+        print(f"\n{problems} of {len(catalogue)} queries need a full table scan")
+        return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
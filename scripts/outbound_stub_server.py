@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the OpenWeatherMap API, with fault injection.
+
+Serves /data/2.5/weather, /data/2.5/forecast and /geo/1.0/direct in the
+shapes services/openweathermap.py reads. Point the app at it with
+OPENWEATHER_BASE_URL=http://127.0.0.1:<port>. Faults are set per server with
+POST /_faults?mode=<ok|fail|flaky|slow|rate_limit>&count=<n>&delay=<s>
+(count limits how many requests are affected; default unlimited).
+
+Also answers Azure OpenAI chat completions
+(POST /openai/deployments/<name>/chat/completions, streamed or not) with a
+canned reply, sending streamed chunks ``chunk_delay`` seconds apart
+(POST /_faults?chunk_delay=<s>&chunks=<n>), for AZURE_OPENAI_ENDPOINT.
+
+Usage:
+    python scripts/outbound_stub_server.py serve [port]    (default 8765)
+    python scripts/outbound_stub_server.py selftest
+
+selftest starts the stub on a free port and checks the shared outbound
+client against it: retries of 5xx/429, the circuit breaker opening and
+recovering, per-host concurrency limits, and the latency histogram.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubState:
+    def __init__(self):
+        self.mode = 'ok'
+        self.remaining = None  # requests left to apply the fault to; None = all
+        self.delay = 0.0
+        self.chunk_delay = 0.0
+        self.chunks = 20
+        self.completions = 0
+        self.disconnects = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def next_fault(self):
+        with self.lock:
+            self.requests += 1
+            if self.mode == 'ok' or self.remaining == 0:
+                return 'ok'
+            if self.remaining is not None:
+                self.remaining -= 1
+            if self.mode == 'flaky':
+                return 'fail' if self.requests % 2 else 'ok'
+            return self.mode
+
+
+def weather_body(params):
+    return {
+        'name': params.get('q', ['Cape Town'])[0].split(',')[0],
+        'main': {'temp': 21.4, 'humidity': 58, 'feels_like': 21.0, 'pressure': 1016},
+        'weather': [{'id': 801, 'description': 'few clouds'}],
+        'wind': {'speed': 4.1, 'deg': 200},
+        'sys': {'country': 'ZA'},
+    }
+
+
+def forecast_body(params):
+    now = int(time.time())
+    return {'list': [
+        {'dt': now + i * 10800, 'main': {'temp': 18 + i % 5, 'humidity': 60},
+         'weather': [{'description': 'clear sky'}]}
+        for i in range(8)
+    ]}
+
+
+def geocode_body(params):
+    return [{'lat': -33.94, 'lon': 18.52, 'name': 'Cape Town', 'country': 'ZA'}]
+
+
+ROUTES = {
+    '/data/2.5/weather': weather_body,
+    '/data/2.5/forecast': forecast_body,
+    '/geo/1.0/direct': geocode_body,
+}
+
+
+def completion_chunk(text):
+    return {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': 'stub',
+            'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}]}
+
+
+def completion_body(text):
+    return {'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'stub',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 120, 'completion_tokens': len(text) // 4,
+                      'total_tokens': 120 + len(text) // 4}}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so pooling is exercised
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if url.path.endswith('/chat/completions'):
+                return self._completion(json.loads(body or b'{}'))
+            if url.path != '/_faults':
+                return self._send(404, {'message': 'not found'})
+            params = parse_qs(url.query)
+            with state.lock:
+                state.mode = params.get('mode', ['ok'])[0]
+                count = params.get('count', [None])[0]
+                state.remaining = int(count) if count is not None else None
+                state.delay = float(params.get('delay', ['0'])[0])
+                state.chunk_delay = float(params.get('chunk_delay', [state.chunk_delay])[0])
+                state.chunks = int(params.get('chunks', [state.chunks])[0])
+            self._send(200, {'mode': state.mode})
+
+        def _completion(self, request):
+            with state.lock:
+                state.completions += 1
+            words = [f'word{i} ' for i in range(state.chunks)]
+            if not request.get('stream'):
+                return self._send(200, completion_body(''.join(words).strip()))
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for word in words:
+                    self.wfile.write(f'data: {json.dumps(completion_chunk(word))}\n\n'.encode())
+                    self.wfile.flush()
+                    time.sleep(state.chunk_delay)
+                self.wfile.write(b'data: [DONE]\n\n')
+            except (BrokenPipeError, ConnectionResetError):
+                with state.lock:
+                    state.disconnects += 1
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/_stats':
+                return self._send(200, {'requests': state.requests, 'max_in_flight': state.max_in_flight,
+                                        'completions': state.completions, 'disconnects': state.disconnects})
+            route = ROUTES.get(url.path)
+            if route is None:
+                return self._send(404, {'message': 'not found'})
+
+            with state.lock:
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                fault = state.next_fault()
+                if fault == 'slow' or state.delay:
+                    time.sleep(state.delay or 1.0)
+                if fault == 'fail':
+                    return self._send(503, {'message': 'injected failure'})
+                if fault == 'rate_limit':
+                    return self._send(429, {'message': 'injected rate limit'}, {'Retry-After': '0'})
+                self._send(200, route(parse_qs(url.query)))
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def start_stub(port=0):
+    """Start the stub in a daemon thread; returns (server, state, base_url)."""
+    state = StubState()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def selftest():
+    server, state, base_url = start_stub()
+    os.environ['OPENWEATHER_BASE_URL'] = base_url
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    import requests
+    from services import openweathermap
+    from services.http_client import outbound
+
+    def set_fault(mode, count=None, delay=0):
+        query = f'mode={mode}&delay={delay}' + (f'&count={count}' if count is not None else '')
+        requests.post(f'{base_url}/_faults?{query}', timeout=5)
+
+    outbound.defaults.update(backoff_base=0.01, backoff_cap=0.05, reset_timeout=0.5,
+                             failure_threshold=3, max_per_host=4)
+    client = outbound.client('openweathermap')
+
+    assert openweathermap.fetch_current_weather_by_coords(-33.9, 18.5)['temperature'] == 21.4
+    print('  ok      plain request')
+
+    set_fault('fail', count=2)
+    assert openweathermap.fetch_current_weather_by_coords(-33.9, 18.5) is not None
+    assert client.counters['retries'] == 2
+    print('  ok      two 503s retried, third attempt succeeds')
+
+    set_fault('rate_limit', count=1)
+    assert openweathermap.geocode_city('Cape Town')['lat'] == -33.94
+    print('  ok      429 with Retry-After retried')
+
+    set_fault('fail')
+    assert openweathermap.fetch_current_weather_by_coords(-33.9, 18.5) is None
+    before = state.requests
+    assert openweathermap.fetch_current_weather_by_coords(-33.9, 18.5) is None
+    assert state.requests == before, 'open breaker must not reach the host'
+    assert next(iter(client.stats()['breakers'].values()))['state'] == 'open'
+    print('  ok      breaker opens after repeated failures and short-circuits')
+
+    set_fault('ok')
+    time.sleep(0.6)
+    assert openweathermap.fetch_current_weather_by_coords(-33.9, 18.5) is not None
+    assert next(iter(client.stats()['breakers'].values()))['state'] == 'closed'
+    print('  ok      breaker half-opens after the reset timeout and closes on success')
+
+    set_fault('slow', delay=0.1)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(lambda _: openweathermap.fetch_current_weather_by_coords(-33.9, 18.5), range(12)))
+    assert state.max_in_flight <= 4, state.max_in_flight
+    print(f'  ok      per-host limit held (max {state.max_in_flight} in flight)')
+
+    latency = client.stats()['latency']
+    assert latency['count'] == client.counters['attempts']
+    print(f"  ok      histogram: {latency['count']} attempts, p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms")
+    server.shutdown()
+    print('All outbound checks passed')
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    if command == 'selftest':
+        selftest()
+    else:
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+        server, _, base_url = start_stub(port)
+        print(f'OpenWeatherMap stub listening on {base_url} (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
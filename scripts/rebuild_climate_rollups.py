@@ -0,0 +1,29 @@
+"""
+Rebuild Climate Rollups
+Recomputes the 5-minute, hourly and daily climate_rollups buckets from the
+raw temperature_readings and weather_data history.
+
+Safe to re-run at any time: the table is cleared and repopulated in a single
+transaction.
+"""
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from services.climate_rollups import rebuild_rollups
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding climate rollups from raw readings...")
+        buckets = rebuild_rollups()
+        print(f"✅ climate_rollups now holds {buckets} buckets")
+
+
+if __name__ == '__main__':
+    main()
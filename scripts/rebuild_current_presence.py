@@ -0,0 +1,28 @@
+"""
+Rebuild Current Presence
+Backfills the current_presence table from the full presence_logs history.
+
+Safe to re-run at any time: the table is cleared and repopulated with each
+user's newest PresenceLog in a single transaction.
+"""
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from services.presence_service import rebuild_current_presence
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding current presence from presence log history...")
+        rows = rebuild_current_presence()
+        print(f"✅ current_presence now holds {rows} users")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Rebuild Search Index
+Refills the FTS5 search tables (services/search_index.py) from their source tables.
+
+The triggers keep the index in step with every write, so this is only needed
+after restoring a backup taken without the search tables or after changing
+the indexed columns. Safe to re-run at any time.
+"""
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from services.search_index import rebuild
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding search index...")
+        counts = rebuild()
+        if not counts:
+            print("⚠️  Search index needs SQLite with FTS5 trigram support; searches use LIKE instead")
+            return
+        for kind, rows in counts.items():
+            print(f"✅ {kind}: {rows} rows indexed")
+
+
+if __name__ == '__main__':
+    main()
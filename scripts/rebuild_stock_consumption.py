@@ -0,0 +1,29 @@
+"""
+Rebuild Stock Consumption
+Backfills the stock_consumption table (daily quantity taken out per item,
+read by the reorder forecast) from the full stock_transactions history.
+
+Safe to re-run at any time: the table is cleared and repopulated in a single
+transaction.
+"""
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from services.reorder_engine import rebuild_consumption
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding stock consumption from transaction history...")
+        rows = rebuild_consumption()
+        print(f"✅ stock_consumption now holds {rows} item-days")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+# services/activity_log.py - Buffered ActivityLog writer
+"""Batched, deferred writes for ActivityLog events.
+
+``ActivityLog.create`` used to add and commit one row per event, costing a
+separate SQLite transaction each time and committing whatever else the caller
+had pending in the session. Events now go into an in-memory buffer and are
+written in bulk (a single ``executemany`` INSERT on a dedicated connection)
+either by a background flusher, bounded by batch size and time, or at request
+teardown when the background thread is disabled.
+
+Every buffered event is also appended to a JSON-lines spill file, which is
+replayed the next time the app starts, so a crash loses nothing that was
+accepted. Delivery is at-least-once: a crash between the INSERT committing and
+the spill file being removed replays that batch.
+
+Several processes share the spill directory (dashboard, portal, workers, the
+rebuild scripts), so each one spills to ``<path>.<pid>`` and holds an
+exclusive lock on ``<path>.<pid>.lock`` while it lives. A starting process
+only replays the files of owners whose lock it can take, i.e. processes that
+have exited; the lock is released by the OS however the owner died.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app import db
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+
+
+class ActivityLogWriter:
+    """Buffers ActivityLog rows and flushes them in bulk"""
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.spill_path = None      # this process's spill file: <base>.<pid>
+
+        self._spill_base = None
+        self._spill_pid = None
+        self._spill_lock_file = None
+        self._spilled = False       # has this process written to its spill file yet
+
+        self._buffer = deque()
+        self._lock = threading.Lock()          # guards buffer, spill file and metrics
+        self._flush_lock = threading.Lock()    # one flush at a time
+        self._wake = threading.Event()
+        self._thread = None
+        self._spill_file = None
+
+        self._flushed_events = 0
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def init_app(self, app):
+        """Bind to an app, replay any spilled events and start flushing."""
+        self.app = app
+        self.batch_size = int(app.config.get('ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+        self.flush_interval = float(app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+        base = app.config.get('ACTIVITY_LOG_SPILL_PATH') or os.path.join(
+            tempfile.gettempdir(), 'office_activity_spill.jsonl')
+        with self._lock:
+            if base != self._spill_base:
+                self._release_spill_lock()
+                self._spill_base = base
+            self._claim_spill_path()
+
+        self._replay_spill()
+
+        if app.config.get('ACTIVITY_LOG_BACKGROUND', True):
+            self._start_thread()
+        else:
+            @app.teardown_request
+            def _flush_activity_log(exc):
+                self.flush()
+
+        if not getattr(self, '_atexit_registered', False):
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    # ------------------------------------------------------------------ writes
+
+    def record(self, category: str, action: str, description: Optional[str] = None,
+               event_data: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Queue one event; it is stamped now and written on the next flush."""
+        now = datetime.utcnow()
+        row = {
+            'user_id': user_id,
+            'category': category,
+            'action': action,
+            'description': description,
+            'event_data': event_data,
+            'created_at': now,
+            'updated_at': now,
+        }
+        with self._lock:
+            self._buffer.append(row)
+            self._spill([row])
+            depth = len(self._buffer)
+
+        if depth >= self.batch_size:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+        return row
+
+    def flush(self) -> int:
+        """Write every buffered event in one INSERT; returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                rows = list(self._buffer)
+                self._buffer.clear()
+                flushing_path = self._rotate_spill()
+
+            from models import ActivityLog
+
+            start = time.perf_counter()
+            try:
+                with (self.app.app_context() if self.app else nullcontext()):
+                    with db.engine.begin() as conn:
+                        conn.execute(ActivityLog.__table__.insert(), rows)
+            except Exception as e:
+                with self._lock:
+                    # Put the batch back in front of anything queued meanwhile
+                    self._buffer.extendleft(reversed(rows))
+                    self._spill(rows)
+                    self._failed_flushes += 1
+                self._remove(flushing_path)
+                print(f"Activity log flush failed, {len(rows)} events kept for retry: {e}")
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._remove(flushing_path)
+            with self._lock:
+                self._flushed_events += len(rows)
+                self._flush_count += 1
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+            return len(rows)
+
+    def shutdown(self):
+        """Stop the background flusher and write whatever is still buffered."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        with self._lock:
+            # Keep the lock (and so the spill file) only if events are left over
+            if not self._buffer and self._spill_file is None:
+                self._release_spill_lock(remove=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and flush latency figures for monitoring."""
+        with self._lock:
+            return {
+                'queue_depth': len(self._buffer),
+                'flushed_events': self._flushed_events,
+                'flush_count': self._flush_count,
+                'failed_flushes': self._failed_flushes,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'max_flush_ms': round(self._max_flush_ms, 3),
+                'avg_flush_ms': round(self._total_flush_ms / self._flush_count, 3) if self._flush_count else 0.0,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'background': self._thread is not None,
+            }
+
+    # -------------------------------------------------------------- internals
+
+    def _start_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='activity-log-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._thread is threading.current_thread():
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # noqa: BLE001 - never let the flusher die
+                print(f"Activity log flusher error: {e}")
+
+    def _claim_spill_path(self):
+        """Lock this process's spill file name (caller holds self._lock).
+
+        Called again after a fork, so a child never writes to its parent's file.
+        """
+        pid = os.getpid()
+        if self._spill_base is None or (self._spill_pid == pid and self._spill_lock_file is not None):
+            return
+        self._spill_lock_file = None   # a parent's handle: the lock stays with the parent
+        self._spill_pid = pid
+        self._spilled = False
+        self.spill_path = None
+        try:
+            lock_file = open(f"{self._spill_base}.{pid}.lock", 'a+')
+        except OSError as e:
+            print(f"Activity log spill disabled, cannot create lock file: {e}")
+            return
+        if not _try_lock(lock_file):
+            lock_file.close()
+            print(f"Activity log spill disabled, {self._spill_base}.{pid} is locked by another process")
+            return
+        self._spill_lock_file = lock_file
+        self.spill_path = f"{self._spill_base}.{pid}"
+
+    def _release_spill_lock(self, remove: bool = False):
+        """Drop this process's spill lock (caller holds self._lock)."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self._spill_lock_file is not None and self._spill_pid == os.getpid():
+            if remove:
+                self._remove(self._spill_lock_file.name)
+            self._spill_lock_file.close()
+        self._spill_lock_file = None
+        self._spill_pid = None
+        self.spill_path = None
+
+    def _after_fork(self):
+        """In a forked child: the parent owns the queued events and the spill file."""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer.clear()
+        self._spill_file = None
+        self._thread = None
+        with self._lock:
+            self._claim_spill_path()
+        if self.app is not None and self.app.config.get('ACTIVITY_LOG_BACKGROUND', True):
+            self._start_thread()
+
+    def _spill(self, rows: List[Dict[str, Any]]):
+        """Append rows to the spill file (caller holds self._lock)."""
+        if not self.spill_path:
+            return
+        try:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            for row in rows:
+                self._spill_file.write(json.dumps(row, default=_encode_datetime) + '\n')
+            self._spill_file.flush()
+            self._spilled = True
+        except OSError as e:
+            print(f"Activity log spill write failed: {e}")
+
+    def _rotate_spill(self) -> Optional[str]:
+        """Move the live spill file aside for the batch being flushed (caller holds self._lock)."""
+        if not self.spill_path:
+            return None
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if not os.path.exists(self.spill_path):
+            return None
+        flushing_path = f"{self.spill_path}.{time.time_ns()}.flushing"
+        os.replace(self.spill_path, flushing_path)
+        return flushing_path
+
+    def _replay_spill(self):
+        """Load events left behind by processes that have exited."""
+        if self._spill_base is None:
+            return
+        directory = os.path.dirname(self._spill_base) or '.'
+        prefix = os.path.basename(self._spill_base) + '.'
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+
+        # <base>.<pid>, <base>.<pid>.<ns>.flushing and <base>.<pid>.lock, by owner pid
+        owners: Dict[int, List[str]] = {}
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            parts = name[len(prefix):].split('.')
+            if not parts[0].isdigit():
+                continue
+            if len(parts) == 1 or (len(parts) == 3 and parts[2] == 'flushing'):
+                owners.setdefault(int(parts[0]), []).append(os.path.join(directory, name))
+            elif parts[1:] == ['lock']:
+                owners.setdefault(int(parts[0]), [])
+
+        rows = []
+        for pid, paths in sorted(owners.items()):
+            if pid == os.getpid():
+                # Our own lock is held already; these files are a dead predecessor's
+                # with the same pid unless this process has spilled since it started
+                with self._lock:
+                    if self._spilled or self.spill_path is None:
+                        continue
+                rows.extend(self._read_spill_files(paths))
+                continue
+            lock_path = f"{self._spill_base}.{pid}.lock"
+            try:
+                lock_file = open(lock_path, 'a+')
+            except OSError:
+                continue
+            try:
+                if not _try_lock(lock_file):
+                    continue  # the owner is still running
+                rows.extend(self._read_spill_files(paths))
+                self._remove(lock_path)
+            finally:
+                lock_file.close()
+
+        if rows:
+            print(f"Replaying {len(rows)} spilled activity log events")
+            with self._lock:
+                self._buffer.extend(rows)
+                self._spill(rows)
+
+    def _read_spill_files(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """Rows from spill files, which are removed once read."""
+        rows = []
+        for path in sorted(paths):
+            try:
+                fh = open(path, encoding='utf-8')
+            except OSError:
+                continue  # replayed by another process meanwhile
+            with fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rows.append(_decode_row(json.loads(line)))
+                    except (ValueError, TypeError):
+                        continue  # torn final line from a crash mid-write
+            self._remove(path)
+        return rows
+
+    @staticmethod
+    def _remove(path: Optional[str]):
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _try_lock(fh) -> bool:
+    """Take an exclusive lock on an open file without blocking."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _encode_datetime(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ('created_at', 'updated_at'):
+        if row.get(key):
+            row[key] = datetime.fromisoformat(row[key])
+    return row
+
+
+# Create global instance
+activity_writer = ActivityLogWriter()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=activity_writer._after_fork)
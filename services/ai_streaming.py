@@ -0,0 +1,255 @@
+# services/ai_streaming.py - Pooled AI answer streaming
+"""Runs AI answer streams on a dedicated, capped pool of stream workers.
+
+The upstream completion (or the fallback chunker) is read by a stream worker
+and handed to the request through a small bounded buffer. The request thread
+only drains that buffer:
+
+- backpressure: when the client reads slowly the buffer fills, the worker
+  stops reading upstream, and TCP flow control slows the upstream sender,
+- cancellation: when the client disconnects the response generator is closed,
+  which cancels the worker and closes the upstream connection, so no more
+  tokens are paid for,
+- concurrency cap: at most ``AI_STREAM_MAX_CONCURRENT`` upstream streams run
+  at once. Further chats wait in a FIFO queue, at most
+  ``AI_STREAM_MAX_QUEUED`` of them, each for up to ``AI_STREAM_QUEUE_TIMEOUT``
+  seconds. Their response is already open and receives ``('queued', position)``
+  events while they wait. Only a chat that finds the queue full is refused
+  with ``StreamBusyError`` (the endpoint answers 503 with Retry-After).
+
+The pool does not give the WSGI request thread back: a WSGI response body
+is iterated on a request thread, so a chat holds one while it is queued and
+while it streams, as it would inline. Up to ``AI_STREAM_MAX_CONCURRENT +
+AI_STREAM_MAX_QUEUED`` request threads per process can be taken by chats.
+
+- Thread-per-connection servers (``app.run``, Werkzeug's threaded server):
+  leave ``AI_STREAM_SERVER_THREADS`` unset; every other request still gets
+  its own thread.
+- Servers with a fixed thread count (gunicorn ``--threads``, waitress
+  ``threads``, mod_wsgi ``threads``): set ``AI_STREAM_SERVER_THREADS`` (config
+  or environment) to that count per process. Streams and waiting chats are
+  then held to ``SERVER_THREAD_SHARE`` of it (half): the stream cap is
+  lowered to fit first, then the queue, possibly to none, so chats beyond
+  it get the 503 and retry instead of parking threads the rest of the API
+  needs. ``stats()`` reports the limits in effect.
+
+Idle gaps longer than ``AI_STREAM_HEARTBEAT`` seconds produce heartbeat
+events, which keep proxies from timing out and reveal dropped clients while
+the upstream is still thinking.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+DEFAULT_MAX_STREAMS = 8
+DEFAULT_BUFFER_SIZE = 32     # chunks held between the worker and the client
+DEFAULT_HEARTBEAT = 15.0     # seconds
+DEFAULT_MAX_QUEUED = 8       # chats waiting for a stream slot
+DEFAULT_QUEUE_TIMEOUT = 30.0 # seconds a chat may wait for a slot
+SERVER_THREAD_SHARE = 0.5    # of AI_STREAM_SERVER_THREADS that streams and waiting chats may hold
+PUT_POLL_INTERVAL = 0.5      # seconds between cancellation checks while the buffer is full
+
+_END = object()
+
+
+class StreamBusyError(RuntimeError):
+    """Every stream slot is in use and the wait queue is full."""
+
+
+class StreamSession:
+    """One chat; iterate for ('queued', position), ('delta', text), ('heartbeat', None) or ('error', message)"""
+
+    def __init__(self, pool: 'AIStreamPool', buffer_size: int, heartbeat: float, queue_timeout: float):
+        self.pool = pool
+        self.heartbeat = heartbeat
+        self.deadline = time.monotonic() + queue_timeout
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        self._buffer: queue.Queue = queue.Queue(maxsize=buffer_size)
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        while not self.started.is_set():
+            position = self.pool._position(self)
+            if position is None:
+                break  # started meanwhile
+            if time.monotonic() >= self.deadline:
+                if self.pool._withdraw(self, timed_out=True):
+                    yield 'error', 'The assistant is busy, please try again in a moment'
+                    return
+                break
+            yield 'queued', position
+            self.started.wait(min(self.heartbeat, max(self.deadline - time.monotonic(), 0.0)))
+
+        while True:
+            try:
+                item = self._buffer.get(timeout=self.heartbeat)
+            except queue.Empty:
+                yield 'heartbeat', None
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def cancel(self):
+        """Stop the worker, or leave the queue (safe to call more than once, or after it finished)."""
+        self.cancelled.set()
+        if not self.started.is_set():
+            self.pool._withdraw(self)
+
+    def _put(self, item) -> bool:
+        """Hand an item to the client, waiting while the buffer is full; False once cancelled."""
+        while not self.cancelled.is_set():
+            try:
+                self._buffer.put(item, timeout=PUT_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _finish(self):
+        # Never block here: a cancelled session has nobody reading the buffer
+        try:
+            self._buffer.put_nowait(_END)
+        except queue.Full:
+            if not self.cancelled.is_set():
+                self._put(_END)
+
+
+class AIStreamPool:
+    """Capped pool of stream workers feeding bounded per-request buffers, with a FIFO wait queue"""
+
+    def __init__(self, max_streams: int = DEFAULT_MAX_STREAMS, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 heartbeat: float = DEFAULT_HEARTBEAT, max_queued: int = DEFAULT_MAX_QUEUED,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, server_threads: Optional[int] = None):
+        self.max_streams = max_streams
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.server_threads = server_threads
+        self._fit_thread_budget()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._waiting: deque = deque()   # (session, produce) in arrival order
+        self._lock = threading.Lock()
+        self._counters = {'started': 0, 'completed': 0, 'cancelled': 0, 'failed': 0, 'rejected': 0,
+                          'queued': 0, 'queue_timeouts': 0, 'chunks': 0, 'active': 0, 'max_active': 0,
+                          'max_waiting': 0}
+
+    def init_app(self, app):
+        """Read the pool size, queue limits, buffer size, heartbeat interval and server thread count from the app config."""
+        server_threads = app.config.get('AI_STREAM_SERVER_THREADS') or os.getenv('AI_STREAM_SERVER_THREADS')
+        with self._lock:
+            if self._counters['active'] or self._waiting:
+                return  # never resize under running streams
+            self.max_streams = app.config.get('AI_STREAM_MAX_CONCURRENT', DEFAULT_MAX_STREAMS)
+            self.buffer_size = app.config.get('AI_STREAM_BUFFER', DEFAULT_BUFFER_SIZE)
+            self.heartbeat = app.config.get('AI_STREAM_HEARTBEAT', DEFAULT_HEARTBEAT)
+            self.max_queued = app.config.get('AI_STREAM_MAX_QUEUED', DEFAULT_MAX_QUEUED)
+            self.queue_timeout = app.config.get('AI_STREAM_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT)
+            self.server_threads = int(server_threads) if server_threads else None
+            self._fit_thread_budget()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _fit_thread_budget(self):
+        """Hold streams plus waiting chats to SERVER_THREAD_SHARE of a fixed-size server's threads."""
+        if not self.server_threads:
+            return
+        budget = max(1, int(self.server_threads * SERVER_THREAD_SHARE))
+        self.max_streams = max(1, min(self.max_streams, budget))
+        self.max_queued = max(0, min(self.max_queued, budget - self.max_streams))
+
+    def open(self, produce: Callable[[], Iterator[str]]) -> StreamSession:
+        """Start streaming the chunks of ``produce()`` on a worker, or queue it for the next free one.
+
+        Raises:
+            StreamBusyError: if ``max_streams`` streams are running and
+                ``max_queued`` chats are already waiting.
+        """
+        session = StreamSession(self, self.buffer_size, self.heartbeat, self.queue_timeout)
+        with self._lock:
+            if self._counters['active'] < self.max_streams:
+                self._start(session, produce)
+            elif len(self._waiting) < self.max_queued:
+                self._waiting.append((session, produce))
+                self._counters['queued'] += 1
+                self._counters['max_waiting'] = max(self._counters['max_waiting'], len(self._waiting))
+            else:
+                self._counters['rejected'] += 1
+                raise StreamBusyError(f'{self.max_streams} AI streams running and {self.max_queued} waiting')
+        return session
+
+    def _start(self, session: StreamSession, produce):
+        """Hand a session to a worker (caller holds self._lock)."""
+        self._counters['started'] += 1
+        self._counters['active'] += 1
+        self._counters['max_active'] = max(self._counters['max_active'], self._counters['active'])
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_streams, thread_name_prefix='ai-stream')
+        self._executor.submit(self._run, session, produce)
+        session.started.set()
+
+    def _position(self, session: StreamSession) -> Optional[int]:
+        """1-based place in the queue, or None once the session has left it."""
+        with self._lock:
+            for position, (waiting, _) in enumerate(self._waiting, 1):
+                if waiting is session:
+                    return position
+        return None
+
+    def _withdraw(self, session: StreamSession, timed_out: bool = False) -> bool:
+        """Take a waiting session out of the queue; False if it was no longer waiting."""
+        with self._lock:
+            for entry in self._waiting:
+                if entry[0] is session:
+                    self._waiting.remove(entry)
+                    self._counters['queue_timeouts' if timed_out else 'cancelled'] += 1
+                    return True
+        return False
+
+    def _run(self, session: StreamSession, produce):
+        outcome = 'completed'
+        chunks = None
+        try:
+            chunks = produce()
+            for chunk in chunks:
+                if not session._put(('delta', chunk)):
+                    outcome = 'cancelled'
+                    break
+                self._count('chunks')
+        except Exception as e:  # noqa: BLE001 - reported to the client as an SSE error
+            outcome = 'failed'
+            print(f"AI stream worker error: {e}")
+            session._put(('error', f'Streaming error: {e}'))
+        finally:
+            if chunks is not None and hasattr(chunks, 'close'):
+                chunks.close()  # closes the upstream response when cancelled mid-stream
+            session._finish()
+            with self._lock:
+                self._counters[outcome] += 1
+                self._counters['active'] -= 1
+                # The freed slot goes to the longest-waiting chat
+                if self._waiting and self._counters['active'] < self.max_streams:
+                    self._start(*self._waiting.popleft())
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['waiting'] = len(self._waiting)
+        stats['max_streams'] = self.max_streams
+        stats['max_queued'] = self.max_queued
+        stats['server_threads'] = self.server_threads
+        return stats
+
+
+# Create global instance
+ai_stream_pool = AIStreamPool()
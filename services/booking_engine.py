@@ -0,0 +1,333 @@
+# services/booking_engine.py - Booking overlap checks and free-slot search
+"""In-memory interval index of bookings per resource.
+
+Each resource keeps its bookings sorted by start time, together with a
+running maximum of the end times. Because that maximum never decreases, a
+binary search finds the first booking that can still reach into a window,
+and another finds the last one that starts before it ends. Overlap checks
+and free-slot queries therefore cost O(log n + overlaps), which is
+microseconds per resource. Overlapping legacy rows are handled correctly;
+they just widen the scan.
+
+The index is kept in sync with the database:
+
+- loaded on first use and reloaded every ``BOOKING_INDEX_REFRESH`` seconds,
+  so bookings written by other processes show up,
+- patched from committed ORM writes (inserts, updates, deletes of Booking)
+  via session hooks, so this process sees its own writes immediately.
+
+``create_booking`` does not trust the index alone. After the fast
+in-memory check it takes the database's write lock for the resource and
+then re-checks the database inside the inserting transaction (an indexed
+range query on resource/start_time). The lock is what stops two writers
+double-booking, in this process or in another one (dashboard, portal,
+extra workers):
+
+- SQLite: a no-op UPDATE on bookings starts the transaction as a write
+  transaction, so other writers wait (busy_timeout) until it commits,
+- PostgreSQL: a transaction-scoped advisory lock on the resource name,
+- other databases: SELECT ... FOR UPDATE on the conflict check.
+
+A per-resource ``threading.Lock`` in front of it keeps this process's own
+threads from queueing on the database lock.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, false, func, select, update
+from sqlalchemy.orm import Session
+
+DEFAULT_REFRESH = 30  # seconds between full reloads from the database
+
+
+class BookingConflict(ValueError):
+    """The requested slot overlaps existing bookings."""
+
+    def __init__(self, resource: str, conflicts: List[int]):
+        super().__init__(f'{resource} is already booked in that period')
+        self.resource = resource
+        self.conflicts = conflicts
+
+
+@dataclass(frozen=True)
+class Slot:
+    start: datetime
+    end: datetime
+
+    def to_dict(self):
+        return {'start': self.start.isoformat(), 'end': self.end.isoformat(),
+                'minutes': int((self.end - self.start).total_seconds() // 60)}
+
+
+def _lock_resource(session, resource: str) -> bool:
+    """Take the database write lock for booking ``resource`` in the session's transaction.
+
+    Returns False on databases without a suitable lock, where the caller
+    locks the conflicting rows with SELECT ... FOR UPDATE instead.
+    """
+    from models import Booking
+    from services.db_engine import read_from_primary
+
+    read_from_primary(session)  # the lock, the check and the insert all belong on the primary
+    dialect = session.connection(bind_arguments={'mapper': Booking.__mapper__}).dialect.name
+    if dialect == 'sqlite':
+        # Matches no rows, but makes SQLite begin a write transaction (RESERVED lock)
+        session.execute(update(Booking).where(false()).values(id=Booking.id))
+        return True
+    if dialect == 'postgresql':
+        session.execute(select(func.pg_advisory_xact_lock(func.hashtext(f'booking:{resource}'))))
+        return True
+    return False
+
+
+class IntervalIndex:
+    """Half-open [start, end) intervals of one resource, sorted by start"""
+
+    __slots__ = ('starts', 'entries', '_max_end')
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.entries: List[Tuple[datetime, datetime, int]] = []  # (start, end, booking id)
+        self._max_end: Optional[List[datetime]] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, start: datetime, end: datetime, booking_id: int):
+        entry = (start, end, booking_id)
+        i = bisect_right(self.entries, entry)
+        self.entries.insert(i, entry)
+        self.starts.insert(i, start)
+        self._max_end = None
+
+    def remove(self, start: datetime, end: datetime, booking_id: int) -> bool:
+        i = bisect_left(self.entries, (start, end, booking_id))
+        if i < len(self.entries) and self.entries[i] == (start, end, booking_id):
+            del self.entries[i]
+            del self.starts[i]
+            self._max_end = None
+            return True
+        return False
+
+    def overlapping(self, start: datetime, end: datetime) -> Iterable[Tuple[datetime, datetime, int]]:
+        """Entries intersecting [start, end), in start order."""
+        max_end = self._max_ends()
+        first = bisect_right(max_end, start)   # earlier entries all end by `start`
+        last = bisect_left(self.starts, end)    # later entries all start at or after `end`
+        for i in range(first, last):
+            entry = self.entries[i]
+            if entry[1] > start:
+                yield entry
+
+    def free(self, start: datetime, end: datetime, min_length: timedelta) -> List[Slot]:
+        """Gaps of at least ``min_length`` inside [start, end)."""
+        slots, cursor = [], start
+        for booked_start, booked_end, _ in self.overlapping(start, end):
+            if booked_start - cursor >= min_length and booked_start > cursor:
+                slots.append(Slot(cursor, booked_start))
+            if booked_end > cursor:
+                cursor = booked_end
+        if end - cursor >= min_length and end > cursor:
+            slots.append(Slot(cursor, end))
+        return slots
+
+    def _max_ends(self) -> List[datetime]:
+        if self._max_end is None:
+            running, max_end = None, []
+            for _, entry_end, _ in self.entries:
+                running = entry_end if running is None or entry_end > running else running
+                max_end.append(running)
+            self._max_end = max_end
+        return self._max_end
+
+
+class BookingEngine:
+    """Interval indexes for every booked resource, synced with the bookings table"""
+
+    def __init__(self, refresh: float = DEFAULT_REFRESH, clock=time.monotonic):
+        self.refresh = refresh
+        self.clock = clock
+        self._indexes: Dict[str, IntervalIndex] = {}
+        self._by_id: Dict[int, Tuple[str, datetime, datetime]] = {}
+        self._versions: Dict[str, int] = {}   # bumped on every change to a resource
+        self._generation = 0                  # bumped on every full reload
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._resource_locks: Dict[str, threading.Lock] = {}
+        self._listening = False
+
+    def init_app(self, app):
+        """Read the refresh interval and start following committed Booking writes."""
+        self.refresh = app.config.get('BOOKING_INDEX_REFRESH', DEFAULT_REFRESH)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._collect_changes)
+            event.listen(Session, 'after_commit', self._apply_changes)
+            event.listen(Session, 'after_rollback', self._discard_changes)
+            self._listening = True
+
+    # ---------------------------------------------------------------- queries
+
+    def conflicts(self, resource: str, start: datetime, end: datetime,
+                  exclude_id: Optional[int] = None) -> List[int]:
+        """Ids of bookings of ``resource`` overlapping [start, end)."""
+        self._ensure_loaded()
+        with self._lock:
+            index = self._indexes.get(resource)
+            if index is None:
+                return []
+            return [booking_id for _, _, booking_id in index.overlapping(start, end) if booking_id != exclude_id]
+
+    def free_slots(self, resources: Optional[Iterable[str]], start: datetime, end: datetime,
+                   min_minutes: int = 0) -> Dict[str, List[Slot]]:
+        """Free gaps in [start, end) per resource (all booked resources if None)."""
+        self._ensure_loaded()
+        min_length = timedelta(minutes=min_minutes)
+        empty = IntervalIndex()
+        with self._lock:
+            names = sorted(self._indexes) if resources is None else resources
+            return {name: self._indexes.get(name, empty).free(start, end, min_length) for name in names}
+
+    def intervals(self, resource: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, int]]:
+        """(start, end, id) of the bookings of ``resource`` overlapping [start, end)."""
+        self._ensure_loaded()
+        with self._lock:
+            index = self._indexes.get(resource)
+            return [] if index is None else list(index.overlapping(start, end))
+
+    def version(self, resource: str) -> Tuple[int, int]:
+        """Changes whenever the bookings of ``resource`` may have changed (for caches built on them)."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._generation, self._versions.get(resource, 0)
+
+    def resources(self) -> List[str]:
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(name for name, index in self._indexes.items() if len(index))
+
+    # ----------------------------------------------------------------- writes
+
+    def create_booking(self, resource: str, user_id: int, start: datetime, end: datetime,
+                       notes: Optional[str] = None):
+        """Insert a booking unless it overlaps another one.
+
+        Raises:
+            ValueError: if end is not after start
+            BookingConflict: if the slot is taken (``conflicts`` lists the ids)
+        """
+        from app import db
+        from models import Booking
+
+        if end <= start:
+            raise ValueError('end_time must be after start_time')
+
+        clashes = self.conflicts(resource, start, end)
+        if clashes:
+            raise BookingConflict(resource, clashes)
+
+        with self._resource_lock(resource):
+            # Authoritative check in the inserting transaction, after taking the
+            # write lock, so no other process can insert between check and insert
+            check = select(Booking.id).where(Booking.resource == resource,
+                                             Booking.start_time < end,
+                                             Booking.end_time > start)
+            if not _lock_resource(db.session, resource):
+                check = check.with_for_update()
+            clashes = db.session.execute(check).scalars().all()
+            if clashes:
+                db.session.rollback()
+                raise BookingConflict(resource, list(clashes))
+            booking = Booking(resource=resource, user_id=user_id, start_time=start, end_time=end, notes=notes)
+            db.session.add(booking)
+            db.session.commit()  # the after_commit hook adds it to the index
+        return booking
+
+    # -------------------------------------------------------------- internals
+
+    def _resource_lock(self, resource: str) -> threading.Lock:
+        with self._lock:
+            return self._resource_locks.setdefault(resource, threading.Lock())
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and self.clock() - self._loaded_at < self.refresh:
+            return
+        self.reload()
+
+    def reload(self):
+        """Rebuild every index from the bookings table (needs an app context)."""
+        from app import db
+        from models import Booking
+        from services.db_engine import primary_reads
+
+        with primary_reads(db.session):
+            rows = db.session.execute(
+                select(Booking.resource, Booking.start_time, Booking.end_time, Booking.id)
+                .order_by(Booking.resource, Booking.start_time, Booking.end_time, Booking.id)
+            ).all()
+        indexes: Dict[str, IntervalIndex] = {}
+        by_id = {}
+        for resource, start, end, booking_id in rows:
+            if start is None or end is None:
+                continue
+            index = indexes.get(resource)
+            if index is None:
+                index = indexes[resource] = IntervalIndex()
+            # Rows arrive sorted, so appending keeps each index ordered
+            index.entries.append((start, end, booking_id))
+            index.starts.append(start)
+            by_id[booking_id] = (resource, start, end)
+        with self._lock:
+            self._indexes, self._by_id = indexes, by_id
+            self._versions = {}
+            self._generation += 1
+            self._loaded_at = self.clock()
+
+    def _upsert(self, booking_id: int, resource: str, start: datetime, end: datetime):
+        self._delete(booking_id)
+        if start is None or end is None:
+            return
+        index = self._indexes.get(resource)
+        if index is None:
+            index = self._indexes[resource] = IntervalIndex()
+        index.add(start, end, booking_id)
+        self._by_id[booking_id] = (resource, start, end)
+        self._versions[resource] = self._versions.get(resource, 0) + 1
+
+    def _delete(self, booking_id: int):
+        previous = self._by_id.pop(booking_id, None)
+        if previous is not None:
+            resource, start, end = previous
+            self._indexes[resource].remove(start, end, booking_id)
+            self._versions[resource] = self._versions.get(resource, 0) + 1
+
+    def _collect_changes(self, session, flush_context):
+        from models import Booking
+        changes = session.info.setdefault('booking_engine_changes', {})
+        for obj in (*session.new, *session.dirty):
+            if isinstance(obj, Booking) and obj.id is not None:
+                changes[obj.id] = (obj.resource, obj.start_time, obj.end_time)
+        for obj in session.deleted:
+            if isinstance(obj, Booking) and obj.id is not None:
+                changes[obj.id] = None
+
+    def _apply_changes(self, session):
+        changes = session.info.pop('booking_engine_changes', None)
+        if not changes or self._loaded_at is None:
+            return  # nothing loaded yet; the first query reads the table anyway
+        with self._lock:
+            for booking_id, values in changes.items():
+                if values is None:
+                    self._delete(booking_id)
+                else:
+                    self._upsert(booking_id, *values)
+
+    def _discard_changes(self, session):
+        session.info.pop('booking_engine_changes', None)
+
+
+# Create global instance
+booking_engine = BookingEngine()
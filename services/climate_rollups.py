@@ -0,0 +1,206 @@
+# services/climate_rollups.py - Time-bucketed temperature/weather rollups
+"""5-minute, hourly and daily rollups of TemperatureReading and WeatherData.
+
+Every reading is folded into the ``climate_rollups`` buckets for its sensor or
+station and for the owning office, at all three resolutions, inside the same
+transaction as the reading itself. Chart endpoints read the rollups with
+``get_series``, which picks the finest resolution that keeps the number of
+points under ``MAX_POINTS``, so they never scan raw readings.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from app import db
+from models import (
+    ClimateRollup, TemperatureReading, TemperatureSensor, WeatherData, WeatherStation,
+    compute_comfort_index
+)
+
+# Finest first; bucket length for each resolution
+RESOLUTIONS = OrderedDict([
+    ('5m', timedelta(minutes=5)),
+    ('1h', timedelta(hours=1)),
+    ('1d', timedelta(days=1)),
+])
+
+# Upper bound on points returned for one chart series
+MAX_POINTS = 500
+
+# Sensors and their offices roll up TemperatureReading, stations WeatherData
+SCOPES = ('sensor', 'office_indoor', 'station', 'office_outdoor')
+
+REBUILD_CHUNK = 5000
+
+# (scopes, timestamp, temperature, humidity, comfort)
+Sample = Tuple[List[Tuple[str, int]], datetime, float, Optional[float], Optional[float]]
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Start of the bucket containing ``timestamp`` at ``resolution``."""
+    if resolution == '1d':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == '1h':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=timestamp.minute - timestamp.minute % 5, second=0, microsecond=0)
+
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    """Finest resolution that covers ``start``..``end`` in at most MAX_POINTS buckets."""
+    span = end - start
+    for resolution, step in RESOLUTIONS.items():
+        if span / step <= MAX_POINTS:
+            return resolution
+    return next(reversed(RESOLUTIONS))
+
+
+def aggregate(samples: Iterable[Sample]) -> List[Dict[str, Any]]:
+    """Fold samples into one row per bucket, ready for ClimateRollup.upsert."""
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for scopes, timestamp, temperature, humidity, comfort in samples:
+        for resolution in RESOLUTIONS:
+            start = bucket_start(timestamp, resolution)
+            for scope, source_id in scopes:
+                if source_id is None:
+                    continue
+                key = (scope, source_id, resolution, start)
+                row = buckets.get(key)
+                if row is None:
+                    row = buckets[key] = _empty_row(key)
+                _add(row, 'temperature', temperature)
+                _add(row, 'humidity', humidity)
+                _add(row, 'comfort', comfort)
+                row['sample_count'] += 1
+    return list(buckets.values())
+
+
+def _empty_row(key) -> Dict[str, Any]:
+    scope, source_id, resolution, start = key
+    row = {'scope': scope, 'source_id': source_id, 'resolution': resolution, 'bucket_start': start,
+           'sample_count': 0}
+    for prefix in ('temperature', 'humidity', 'comfort'):
+        row.update({f'{prefix}_min': None, f'{prefix}_max': None, f'{prefix}_sum': 0.0})
+    row.update({'humidity_count': 0, 'comfort_count': 0})
+    return row
+
+
+def _add(row: Dict[str, Any], prefix: str, value: Optional[float]):
+    if value is None:
+        return
+    row[f'{prefix}_sum'] += value
+    if prefix != 'temperature':
+        row[f'{prefix}_count'] += 1
+    if row[f'{prefix}_min'] is None or value < row[f'{prefix}_min']:
+        row[f'{prefix}_min'] = value
+    if row[f'{prefix}_max'] is None or value > row[f'{prefix}_max']:
+        row[f'{prefix}_max'] = value
+
+
+def _office_lookup(connection, model, ids) -> Dict[int, Optional[int]]:
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    rows = connection.execute(select(model.id, model.office_id).where(model.id.in_(ids)))
+    return dict(rows.all())
+
+
+def _temperature_samples(readings, offices) -> Iterable[Sample]:
+    for r in readings:
+        comfort = r.comfort_index if r.comfort_index is not None else compute_comfort_index(r.temperature, r.humidity)
+        yield ([('sensor', r.sensor_id), ('office_indoor', offices.get(r.sensor_id))],
+               r.created_at or datetime.utcnow(), r.temperature, r.humidity, comfort)
+
+
+def _weather_samples(readings, offices) -> Iterable[Sample]:
+    for w in readings:
+        yield ([('station', w.station_id), ('office_outdoor', offices.get(w.station_id))],
+               w.created_at or datetime.utcnow(), w.temperature, w.humidity,
+               compute_comfort_index(w.temperature, w.humidity))
+
+
+def record_temperature_readings(connection, readings):
+    """Fold TemperatureReading-like objects into the rollups on ``connection``."""
+    offices = _office_lookup(connection, TemperatureSensor, (r.sensor_id for r in readings))
+    ClimateRollup.upsert(connection, aggregate(_temperature_samples(readings, offices)))
+
+
+def record_weather_data(connection, readings):
+    """Fold WeatherData-like objects into the rollups on ``connection``."""
+    offices = _office_lookup(connection, WeatherStation, (w.station_id for w in readings))
+    ClimateRollup.upsert(connection, aggregate(_weather_samples(readings, offices)))
+
+
+def rebuild_rollups() -> int:
+    """Recompute every rollup from raw readings; returns the number of buckets.
+
+    Used to backfill the table after it is first created, or to repair it if
+    readings were written outside the ORM. Raw rows are streamed in chunks and
+    folded in memory, then merged in one transaction.
+    """
+    db.session.execute(delete(ClimateRollup))
+    connection = db.session.connection()
+
+    for model, record in ((TemperatureReading, record_temperature_readings),
+                          (WeatherData, record_weather_data)):
+        query = select(model).order_by(model.id).execution_options(yield_per=REBUILD_CHUNK)
+        for chunk in db.session.scalars(query).partitions():
+            record(connection, chunk)
+            for obj in chunk:
+                db.session.expunge(obj)  # keep memory flat on large histories
+
+    db.session.commit()
+    return db.session.query(ClimateRollup).count()
+
+
+def get_series(scope: str, source_id: int, start: datetime, end: datetime,
+               resolution: Optional[str] = None) -> Dict[str, Any]:
+    """Chart series for one sensor/station/office between ``start`` and ``end``.
+
+    Args:
+        scope: 'sensor', 'station', 'office_indoor' or 'office_outdoor'
+        source_id: Sensor, station or office id matching the scope
+        start, end: Range to cover (UTC, naive)
+        resolution: '5m', '1h' or '1d'; chosen from the range when omitted
+
+    Returns:
+        Dict with the ``resolution`` used and ``points``, each holding the
+        bucket timestamp plus avg/min/max temperature, humidity and comfort.
+    """
+    if resolution not in RESOLUTIONS:
+        resolution = pick_resolution(start, end)
+
+    rows = (ClimateRollup.query
+            .filter(ClimateRollup.scope == scope,
+                    ClimateRollup.source_id == source_id,
+                    ClimateRollup.resolution == resolution,
+                    ClimateRollup.bucket_start >= bucket_start(start, resolution),
+                    ClimateRollup.bucket_start <= end)
+            .order_by(ClimateRollup.bucket_start)
+            .all())
+
+    return {
+        'resolution': resolution,
+        'points': [_point(row) for row in rows],
+    }
+
+
+def _avg(total, count):
+    return round(total / count, 2) if count else None
+
+
+def _point(row: ClimateRollup) -> Dict[str, Any]:
+    return {
+        'timestamp': row.bucket_start.isoformat(),
+        'samples': row.sample_count,
+        'temperature': _avg(row.temperature_sum, row.sample_count),
+        'temperature_min': row.temperature_min,
+        'temperature_max': row.temperature_max,
+        'humidity': _avg(row.humidity_sum, row.humidity_count),
+        'humidity_min': row.humidity_min,
+        'humidity_max': row.humidity_max,
+        'comfort_index': _avg(row.comfort_sum, row.comfort_count),
+        'comfort_min': row.comfort_min,
+        'comfort_max': row.comfort_max,
+    }
@@ -0,0 +1,160 @@
+# services/comfort.py - Batch comfort and HVAC calculations
+"""Comfort index, comfort status and HVAC status for many readings in one call.
+
+Produces exactly the values of the scalar helpers in models.py
+(``compute_comfort_index``, ``compute_comfort_status`` and
+``compute_hvac_status``, which back ``TemperatureReading.calculate_comfort_index``
+and the ``MeetingRoom`` methods), but evaluates whole floors or months of
+history with NumPy array operations. If NumPy is missing (it is in
+requirements.txt) the scalar helpers are mapped over the inputs instead, with
+the same results.
+"""
+import math
+from dataclasses import dataclass
+from numbers import Number
+from typing import Any, List, Optional, Sequence, Union
+
+from models import compute_comfort_index, compute_comfort_status, compute_hvac_status
+
+# In requirements.txt; the plain Python fallback keeps minimal installs working
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+DEFAULT_TARGET = 22.0  # MeetingRoom.target_temperature default
+
+Values = Union[Sequence[Optional[float]], Any]  # list, tuple or numpy array
+
+
+@dataclass
+class ComfortEvaluation:
+    """Per-reading results; lists, or numpy arrays from evaluate_comfort_arrays"""
+    comfort_index: Any
+    comfort_status: Any
+    hvac_status: Any
+
+
+def comfort_indices(temperatures: Values, humidities: Values) -> List[Optional[float]]:
+    """Comfort index (0-100) per pair; None where either value is missing."""
+    if not NUMPY_AVAILABLE:
+        return [compute_comfort_index(t, h) for t, h in zip(temperatures, humidities)]
+    temp, humidity = _as_array(temperatures), _as_array(humidities)
+    return _to_list(_comfort_index(temp, humidity))
+
+
+def evaluate_comfort(temperatures: Values, humidities: Values, targets: Union[Values, float] = DEFAULT_TARGET,
+                     hvac_statuses: Union[Sequence[str], str] = 'auto') -> ComfortEvaluation:
+    """Evaluate every reading against its target temperature.
+
+    Args:
+        temperatures: Current temperatures (None for unknown)
+        humidities: Relative humidity percentages (None for unknown)
+        targets: Target temperature per reading, or one target for all
+        hvac_statuses: Status to keep where the HVAC action can't be decided
+            (as MeetingRoom.adjust_temperature does), per reading or for all
+
+    Returns:
+        ComfortEvaluation of plain lists, element-for-element equal to the
+        scalar helpers (comfort_index is None where inputs are missing).
+    """
+    if not NUMPY_AVAILABLE:
+        count = len(temperatures)
+        targets = _broadcast(targets, count)
+        hvac_statuses = _broadcast(hvac_statuses, count)
+        return ComfortEvaluation(
+            comfort_index=[compute_comfort_index(t, h) for t, h in zip(temperatures, humidities)],
+            comfort_status=[compute_comfort_status(t, h, DEFAULT_TARGET if g is None else g)
+                            for t, h, g in zip(temperatures, humidities, targets)],
+            hvac_status=[compute_hvac_status(t, g, s)
+                         for t, g, s in zip(temperatures, targets, hvac_statuses)],
+        )
+
+    result = evaluate_comfort_arrays(temperatures, humidities, targets, hvac_statuses)
+    return ComfortEvaluation(
+        comfort_index=_to_list(result.comfort_index),
+        comfort_status=result.comfort_status.tolist(),
+        hvac_status=result.hvac_status.tolist(),
+    )
+
+
+def evaluate_comfort_arrays(temperatures: Values, humidities: Values,
+                            targets: Union[Values, float] = DEFAULT_TARGET,
+                            hvac_statuses: Union[Sequence[str], str] = 'auto') -> ComfortEvaluation:
+    """Like evaluate_comfort but returns numpy arrays (NaN for a missing index).
+
+    Skips the conversion back to Python objects, which dominates the cost on
+    large histories. Requires NumPy.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('evaluate_comfort_arrays requires numpy; use evaluate_comfort instead')
+
+    temp = _as_array(temperatures)
+    humidity = _as_array(humidities)
+    target = np.broadcast_to(_as_array(targets), temp.shape)
+
+    # Falsy (None/NaN or 0) inputs mean "unknown", as in the scalar helpers
+    temp_known = ~np.isnan(temp) & (temp != 0)
+    humidity_known = ~np.isnan(humidity) & (humidity != 0)
+    target_known = ~np.isnan(target) & (target != 0)
+
+    # Comfort status (a missing target counts as the model default)
+    effective_target = np.where(np.isnan(target), DEFAULT_TARGET, target)
+    with np.errstate(invalid='ignore'):
+        temp_ok = np.abs(temp - effective_target) <= 1.5
+        humidity_ok = (humidity >= 30) & (humidity <= 60)
+    comfort_status = np.select(
+        [~(temp_known & humidity_known), temp_ok & humidity_ok, temp_ok | humidity_ok],
+        ['unknown', 'comfortable', 'moderate'],
+        default='uncomfortable'
+    )
+
+    # HVAC status
+    diff = temp - target
+    with np.errstate(invalid='ignore'):
+        decided = np.select([diff > 1, diff < -1], ['cooling', 'heating'], default='auto')
+    previous = np.broadcast_to(np.asarray(hvac_statuses, dtype=object), temp.shape)
+    hvac_status = np.where(temp_known & target_known, decided.astype(object), previous)
+
+    return ComfortEvaluation(
+        comfort_index=_comfort_index(temp, humidity),
+        comfort_status=comfort_status,
+        hvac_status=hvac_status,
+    )
+
+
+def _comfort_index(temp, humidity):
+    """Vectorised compute_comfort_index; NaN where either input is missing."""
+    with np.errstate(invalid='ignore'):
+        comfort = np.select(
+            [temp < 18, temp > 26],
+            [40 - (18 - temp) * 2, 40 - (temp - 26) * 2],
+            default=100 - np.abs(22 - temp) * 5
+        )
+        comfort = comfort - np.select(
+            [humidity < 30, humidity > 60],
+            [30 - humidity, humidity - 60],
+            default=0
+        )
+        comfort = np.clip(comfort, 0, 100)
+    comfort[np.isnan(temp) | np.isnan(humidity)] = np.nan
+    return comfort
+
+
+def _as_array(values):
+    """Float array with NaN standing in for None."""
+    if isinstance(values, np.ndarray) or isinstance(values, Number):
+        return np.asarray(values, dtype=float)
+    return np.array([math.nan if v is None else v for v in values], dtype=float)
+
+
+def _to_list(values) -> List[Optional[float]]:
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+def _broadcast(values, count):
+    if isinstance(values, (str, Number)) or values is None:
+        return [values] * count
+    return values
@@ -0,0 +1,274 @@
+# services/db_engine.py - Database engine tuning
+"""Database selection, engine options and SQLite settings for every app that opens the DB.
+
+``database_uri`` honours ``DATABASE_URL`` (any SQLAlchemy URL, e.g.
+``postgresql://...``) and falls back to the shared SQLite file. Engines for
+server databases get a pre-pinged, recycled pool and a per-statement
+timeout (``DB_STATEMENT_TIMEOUT_MS``, PostgreSQL). When
+``DATABASE_REPLICA_URLS`` lists read replicas, ``RoutingSession`` sends the
+reads of GET/HEAD requests to one of them; anything that writes, and every
+later statement of that request, goes to the primary (see
+``read_from_primary`` for reads that must see the latest data, and
+``primary_reads`` for rebuilding shared in-process caches, which must never
+be filled from a lagging replica).
+
+The dashboard (``create_app``) and the check-in portal
+(``create_employee_portal``) are separate processes on the same SQLite
+file. With SQLite's defaults (rollback journal, no busy timeout) a check-in
+commit and a dashboard read lock each other out, and the loser fails
+straight away with ``database is locked``. ``init_database`` replaces
+``db.init_app`` and sets up:
+
+- WAL journaling, so readers never block the writer or each other, with
+  ``synchronous=NORMAL`` (durable at checkpoints, safe in WAL mode),
+- ``busy_timeout``, so a writer waits for the lock instead of failing,
+- a bigger page cache, memory-mapped reads and in-memory temp tables,
+- an explicitly sized connection pool per process (``DB_POOL_*``, also used
+  for server databases).
+
+Each of these can be overridden through ``SQLITE_PRAGMAS``. A writer can
+still get ``database is locked`` when the timeout runs out under heavy
+contention, so short write transactions are wrapped in ``run_with_retry``,
+which rolls back and re-runs them with jittered exponential backoff.
+"""
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+T = TypeVar('T')
+
+# Applied to every new SQLite connection (journal_mode is persistent, the rest per connection)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms to wait for a lock before "database is locked"
+    'cache_size': -20000,          # negative = KiB, so about 20 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT = 30          # seconds to wait for a free pooled connection
+
+DEFAULT_POOL_RECYCLE = 1800       # seconds; server databases drop idle connections
+DEFAULT_STATEMENT_TIMEOUT_MS = 30000
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+
+DEFAULT_LOCK_RETRIES = 5
+DEFAULT_LOCK_RETRY_BASE = 0.05     # seconds; doubled per attempt
+LOCK_RETRY_CAP = 2.0               # seconds
+
+
+def database_uri(default: str) -> str:
+    """``DATABASE_URL`` from the environment if set, else ``default``."""
+    return normalize_url(os.getenv('DATABASE_URL') or default)
+
+
+def normalize_url(uri: str) -> str:
+    # Hosting providers still hand out postgres://, which SQLAlchemy 1.4+ rejects
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def display_url(uri: str) -> str:
+    """The URL with any password masked, for logs."""
+    return make_url(uri).render_as_string(hide_password=True)
+
+
+def replica_urls(app) -> List[str]:
+    """Read replica URLs from ``DATABASE_REPLICA_URLS`` (config or environment, comma-separated)."""
+    raw = app.config.get('DATABASE_REPLICA_URLS') or os.getenv('DATABASE_REPLICA_URLS') or ''
+    urls = raw.split(',') if isinstance(raw, str) else list(raw)
+    return [normalize_url(url.strip()) for url in urls if url.strip()]
+
+
+def is_memory_database(uri: str) -> bool:
+    url = make_url(uri)
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def sqlite_pragmas(app) -> Dict[str, Any]:
+    """DEFAULT_PRAGMAS with the app's ``SQLITE_PRAGMAS`` overrides (None removes one)."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def engine_options(app, uri: Optional[str] = None) -> Dict[str, Any]:
+    """Engine options for ``uri`` (default: the app's database; explicit settings win)."""
+    uri = uri or app.config['SQLALCHEMY_DATABASE_URI']
+    backend = make_url(uri).get_backend_name()
+    options: Dict[str, Any] = {}
+    if backend == 'sqlite':
+        if is_memory_database(uri):
+            return dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        busy_ms = sqlite_pragmas(app).get('busy_timeout', 0)
+        # sqlite3's own busy handler, in case a connection is used before the PRAGMA runs
+        options['connect_args'] = {'timeout': busy_ms / 1000, 'check_same_thread': False}
+    else:
+        # Connections to a server can die while idle in the pool
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = app.config.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)
+        timeout_ms = app.config.get('DB_STATEMENT_TIMEOUT_MS', DEFAULT_STATEMENT_TIMEOUT_MS)
+        if backend == 'postgresql' and timeout_ms:
+            options['connect_args'] = {'options': f'-c statement_timeout={int(timeout_ms)}'}
+    options.update({
+        'pool_size': app.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        'max_overflow': app.config.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW),
+        'pool_timeout': app.config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+    })
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def apply_pragmas(dbapi_connection, pragmas: Dict[str, Any]):
+    """Run the PRAGMAs on a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if name == 'journal_mode':
+                current = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+                if current.lower() == str(value).lower():
+                    continue
+                try:
+                    cursor.execute(f'PRAGMA journal_mode={value}')
+                except sqlite3.OperationalError as e:
+                    # Switching needs a moment of exclusive access; the next connection tries again
+                    print(f"db_engine: could not switch journal_mode to {value}: {e}")
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def init_database(app, database=None):
+    """``db.init_app(app)`` with tuned engine options, read replica binds and SQLite PRAGMAs."""
+    if database is None:
+        from app import db as database
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for i, url in enumerate(replica_urls(app)):
+        binds[f'{REPLICA_BIND_PREFIX}{i}'] = {'url': url, **engine_options(app, url)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
+    database.init_app(app)
+
+    with app.app_context():
+        engines = database.engines
+        engine = engines[None]
+    pragmas = sqlite_pragmas(app)
+    for bound in engines.values():
+        if bound.dialect.name != 'sqlite':
+            continue
+        bound_pragmas = dict(pragmas)
+        if is_memory_database(str(bound.url)):
+            bound_pragmas.pop('journal_mode', None)  # memory databases have no journal file
+        event.listen(bound, 'connect',
+                     lambda dbapi_connection, record, p=bound_pragmas: apply_pragmas(dbapi_connection, p))
+    return engine
+
+
+class RoutingSession(FlaskSession):
+    """Session that reads from a replica during GET/HEAD requests when replicas are configured"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not self._may_use_replica(clause):
+            return engine
+        engines = self._db.engines
+        if engine is not engines.get(None):
+            return engine  # a model with its own bind key
+        replica = self.info.get('replica')
+        if replica is None:
+            names = [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)]
+            if not names:
+                return engine
+            # One replica per session, so a request reads one consistent snapshot
+            replica = self.info['replica'] = random.choice(names)
+        return engines[replica]
+
+    def _may_use_replica(self, clause) -> bool:
+        if self.info.get('use_primary'):
+            return False
+        if self._flushing or (clause is not None and (getattr(clause, 'is_dml', False)
+                                                      or getattr(clause, '_for_update_arg', None) is not None)):
+            # Writes go to the primary, and so does everything after them (read-your-writes)
+            self.info['use_primary'] = True
+            return False
+        return has_request_context() and request.method in READ_METHODS
+
+
+def read_from_primary(session=None):
+    """Send the rest of this request's statements to the primary (for GETs that must be fresh)."""
+    if session is None:
+        from app import db
+        session = db.session
+    session.info['use_primary'] = True
+
+
+@contextmanager
+def primary_reads(session=None):
+    """Send the statements inside the block to the primary, then restore the routing.
+
+    For process-wide caches (booking index, room finder, AI context): they
+    are invalidated by commits on the primary and reloaded lazily, often in
+    the next GET. Filled from a replica that hasn't caught up, they would
+    serve the pre-write data to every request until the next refresh.
+    """
+    if session is None:
+        from app import db
+        session = db.session
+    pinned = session.info.get('use_primary')
+    session.info['use_primary'] = True
+    try:
+        yield session
+    finally:
+        if not pinned:
+            session.info.pop('use_primary', None)
+
+
+def is_locked_error(exc: BaseException) -> bool:
+    """True for SQLite's transient "database is locked" / "database table is locked" / busy errors."""
+    if not isinstance(exc, OperationalError):
+        return False
+    message = str(exc.orig if exc.orig is not None else exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def run_with_retry(work: Callable[[], T], attempts: Optional[int] = None, session=None) -> T:
+    """Run a write transaction, retrying it while the database is locked.
+
+    ``work`` must do the whole unit of work (add objects and commit), since
+    the session is rolled back before each retry. Other errors propagate
+    unchanged.
+    """
+    if session is None:
+        from app import db
+        session = db.session
+    config = current_app.config if has_app_context() else {}
+    if attempts is None:
+        attempts = config.get('DB_LOCK_RETRIES', DEFAULT_LOCK_RETRIES)
+    base = config.get('DB_LOCK_RETRY_BASE', DEFAULT_LOCK_RETRY_BASE)
+
+    for attempt in range(attempts + 1):
+        try:
+            return work()
+        except OperationalError as e:
+            session.rollback()
+            if attempt == attempts or not is_locked_error(e):
+                raise
+            # Full jitter: uniform between zero and the exponential ceiling
+            time.sleep(random.uniform(0, min(LOCK_RETRY_CAP, base * (2 ** attempt))))
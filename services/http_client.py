@@ -0,0 +1,377 @@
+# services/http_client.py - Shared outbound HTTP clients
+"""Pooled, instrumented HTTP clients for third-party integrations.
+
+Each integration (OpenWeatherMap, Azure OpenAI, ...) gets one long-lived
+client from ``outbound.client(name)``, so connections and TLS sessions are
+reused across requests instead of being set up per call. Every client has:
+
+- a keep-alive connection pool (``requests.Session`` for plain REST calls, a
+  shared ``httpx.Client`` for SDKs such as openai that accept one),
+- a per-host concurrency limit,
+- retries with full-jitter exponential backoff (idempotent requests retry on
+  timeouts, connection errors, 429 and 5xx; others only on connect errors),
+- a circuit breaker that fails fast after repeated failures and lets a single
+  trial request through once the reset timeout has passed,
+- a latency histogram, exposed with the other counters by ``outbound.stats()``.
+"""
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+DEFAULTS = {
+    'timeout': 10.0,            # seconds per attempt
+    'retries': 2,               # extra attempts after the first
+    'backoff_base': 0.2,        # seconds
+    'backoff_cap': 5.0,         # seconds
+    'max_per_host': 8,          # concurrent requests per host
+    'pool_size': 10,            # keep-alive connections per host
+    'acquire_timeout': 30.0,    # seconds to wait for a per-host slot
+    'failure_threshold': 5,     # consecutive failures that open the breaker
+    'reset_timeout': 30.0,      # seconds before a trial request is let through
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without contacting the host while its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def cancel(self):
+        """Give back a trial slot from allow() that was never used."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = self.clock()
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(self.buckets) if ms <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (None,), self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound if bound is not None else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f'le_{b}ms' for b in self.buckets] + ['inf']
+            return {
+                'buckets': dict(zip(labels, self.counts)),
+                'count': self.count,
+                'avg_ms': round(self.total_ms / self.count, 1) if self.count else None,
+                'max_ms': round(self.max_ms, 1),
+                'p50_ms': self.percentile(0.5),
+                'p95_ms': self.percentile(0.95),
+                'p99_ms': self.percentile(0.99),
+            }
+
+
+class OutboundClient:
+    """Pooled HTTP client with retries, breaker and metrics for one integration"""
+
+    def __init__(self, name: str, **settings):
+        self.name = name
+        self.settings = {**DEFAULTS, **settings}
+        self.histogram = LatencyHistogram()
+        self.counters = {'requests': 0, 'attempts': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.settings['pool_size'],
+                              pool_maxsize=self.settings['pool_size'], max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._httpx_client = None
+
+    # ---------------------------------------------------------- requests API
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pool; raises like ``requests`` does."""
+        kwargs.setdefault('timeout', self.settings['timeout'])
+        host = urlsplit(url).netloc
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        self._count('requests')
+
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                response = self._attempt(host, lambda: self.session.request(method, url, **kwargs))
+            except CircuitOpenError:
+                raise
+            except requests.RequestException as e:
+                error = e
+
+            if error is not None:
+                # Connect failures never reached the server, so any method may retry them
+                retryable = isinstance(error, requests.ConnectionError) or (
+                    idempotent and isinstance(error, requests.Timeout))
+            else:
+                retryable = idempotent and response.status_code in RETRY_STATUSES
+            if not retryable or attempt >= self.settings['retries']:
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            self._count('retries')
+            time.sleep(self._backoff(attempt, response))
+
+    # ------------------------------------------------------------- httpx API
+
+    def httpx_client(self):
+        """Shared ``httpx.Client`` routed through this client's limits and metrics.
+
+        For SDKs that take an ``http_client`` (openai). The SDK keeps its own
+        retry loop, so the transport does not retry on top of it.
+        """
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError('httpx is not installed')
+        with self._lock:
+            if self._httpx_client is None:
+                limits = httpx.Limits(max_connections=self.settings['max_per_host'] * 4,
+                                      max_keepalive_connections=self.settings['pool_size'])
+                transport = _InstrumentedTransport(self, httpx.HTTPTransport(limits=limits))
+                self._httpx_client = httpx.Client(transport=transport,
+                                                  timeout=httpx.Timeout(self.settings['timeout'] * 6,
+                                                                        connect=self.settings['timeout']))
+            return self._httpx_client
+
+    # ------------------------------------------------------------- internals
+
+    def _attempt(self, host: str, send, release_later=False):
+        """One attempt: breaker check, per-host slot, timing and bookkeeping."""
+        breaker = self._breaker(host)
+        if not breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f'{self.name}: circuit open for {host}')
+
+        slot = self._slot(host)
+        if not slot.acquire(timeout=self.settings['acquire_timeout']):
+            breaker.cancel()
+            raise requests.ConnectionError(f'{self.name}: no free connection slot for {host}')
+
+        self._count('attempts')
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception:
+            slot.release()
+            self.histogram.observe(time.perf_counter() - start)
+            breaker.record_failure()
+            self._count('failures')
+            raise
+
+        self.histogram.observe(time.perf_counter() - start)
+        if response.status_code in RETRY_STATUSES:
+            breaker.record_failure()
+            self._count('failures')
+        else:
+            breaker.record_success()
+        if release_later:
+            return response, slot.release
+        slot.release()
+        return response
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        cap = self.settings['backoff_cap']
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), cap)
+        # Full jitter: uniform between zero and the exponential ceiling
+        return random.uniform(0, min(cap, self.settings['backoff_base'] * (2 ** attempt)))
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.settings['failure_threshold'],
+                                                      self.settings['reset_timeout'])
+            return self._breakers[host]
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.settings['max_per_host'])
+            return self._host_slots[host]
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = {host: {'state': b.state, 'failures': b.failures} for host, b in self._breakers.items()}
+            counters = dict(self.counters)
+        return {'counters': counters, 'breakers': breakers, 'latency': self.histogram.snapshot()}
+
+    def close(self):
+        self.session.close()
+        if self._httpx_client is not None:
+            self._httpx_client.close()
+
+
+if HTTPX_AVAILABLE:
+    class _InstrumentedTransport(httpx.BaseTransport):
+        """httpx transport that applies an OutboundClient's breaker, slots and metrics"""
+
+        def __init__(self, owner: OutboundClient, inner):
+            self.owner = owner
+            self.inner = inner
+
+        def handle_request(self, request):
+            self.owner._count('requests')
+            try:
+                response, release = self.owner._attempt(
+                    request.url.netloc.decode('ascii'), lambda: self.inner.handle_request(request),
+                    release_later=True)
+            except CircuitOpenError as e:
+                raise httpx.ConnectError(str(e), request=request)
+            # Keep the host slot until the (possibly streamed) body is closed
+            return httpx.Response(status_code=response.status_code, headers=response.headers,
+                                  stream=_ReleasingStream(response.stream, release),
+                                  extensions=response.extensions)
+
+        def close(self):
+            self.inner.close()
+
+    class _ReleasingStream(httpx.SyncByteStream):
+        def __init__(self, stream, release):
+            self._stream = stream
+            self._release = release
+            self._released = False
+
+        def __iter__(self):
+            yield from self._stream
+
+        def close(self):
+            try:
+                self._stream.close()
+            finally:
+                if not self._released:
+                    self._released = True
+                    self._release()
+
+
+class OutboundRegistry:
+    """One OutboundClient per integration name"""
+
+    def __init__(self):
+        self.defaults: Dict[str, Any] = {}
+        self._clients: Dict[str, OutboundClient] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Pick up OUTBOUND_<SETTING> overrides (e.g. OUTBOUND_TIMEOUT) from the app config."""
+        for key in DEFAULTS:
+            value = app.config.get(f'OUTBOUND_{key.upper()}')
+            if value is not None:
+                self.defaults[key] = value
+
+    def client(self, name: str, **settings) -> OutboundClient:
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = OutboundClient(name, **{**self.defaults, **settings})
+            return self._clients[name]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = dict(self._clients)
+        return {name: client.stats() for name, client in clients.items()}
+
+    def reset(self):
+        """Close and forget every client (tests, or after changing settings)."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+
+# Create global instance
+outbound = OutboundRegistry()
@@ -64,4 +64,67 @@ def get_mock_office_data(office_id):
         'description': point['outdoor']['conditions']
     } for point in data]
     
-    return indoor_data, outdoor_data
\ No newline at end of file
+    return indoor_data, outdoor_data
+
+
+class FakeWeatherUpstream:
+    """Stand-in for the OpenWeatherMap API with the interface services.weather_cache expects.
+    
+    Returns deterministic data without network access and counts every call,
+    so cache behaviour can be checked. Set ``fail`` to simulate an outage and
+    ``delay`` (seconds) to simulate a slow upstream.
+    """
+    
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = {'geocode': 0, 'forecast': 0, 'hourly': 0, 'current': 0}
+    
+    def _call(self, name):
+        import time
+        self.calls[name] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return not self.fail
+    
+    def geocode(self, city):
+        if not self._call('geocode'):
+            return None
+        # Stable pseudo-coordinates per city name
+        seed = sum(ord(c) for c in city.lower())
+        return {'lat': round(-90 + seed % 180 + 0.5, 4), 'lon': round(-180 + seed % 360 + 0.5, 4),
+                'name': city.split(',')[0].strip(), 'country': 'ZZ'}
+    
+    def forecast(self, lat, lon, hours=24):
+        if not self._call('forecast'):
+            return None
+        return self._series(lat, hours, detailed=True)
+    
+    def hourly(self, lat, lon, hours=24):
+        if not self._call('hourly'):
+            return None
+        return self._series(lat, hours, detailed=False)
+    
+    def current(self, lat, lon):
+        if not self._call('current'):
+            return None
+        now = datetime.utcnow()
+        temperature = round(18.0 + now.hour / 4 - abs(lat) / 30, 1)
+        return {'timestamp': now.isoformat(), 'temperature': temperature, 'humidity': 60.0,
+                'conditions': 'Clear', 'feels_like': temperature, 'pressure': 1013,
+                'wind_speed': 3.0, 'wind_direction': 180, 'condition_code': '800'}
+    
+    def _series(self, lat, hours, detailed):
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        results = []
+        for i in range(0, hours, 3):
+            point = {
+                'timestamp': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+                'temperature': round(18.0 + (i % 24) / 4 - abs(lat) / 30, 1),
+                'humidity': 60.0,
+                'conditions': 'Clear'
+            }
+            if detailed:
+                point.update({'feels_like': point['temperature'], 'pressure': 1013, 'wind_speed': 3.0})
+            results.append(point)
+        return results
@@ -0,0 +1,218 @@
+# services/office_context.py - Cached office snapshot for the AI assistant
+"""Live office data handed to the AI assistant with every chat message.
+
+Building the context (presence roster, low stock, coffee orders, latest
+readings) costs several queries, and chat messages arrive far more often than
+the underlying data changes. The snapshot is therefore built once and kept per
+section. A section is rebuilt when its TTL runs out or when a committed ORM
+write touches one of its models (see ``SECTION_MODELS``), so a chat message
+normally costs no queries at all. Core writes that bypass the session (bulk
+ingest) call ``invalidate`` themselves.
+"""
+import copy
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import desc, event, func
+from sqlalchemy.orm import Session, joinedload
+
+DEFAULT_TTL = 30  # seconds
+
+# Models whose committed changes make a section stale
+SECTION_MODELS = {
+    'presence': ('PresenceLog', 'CurrentPresence', 'Employee', 'User'),
+    'stock': ('StockItem',),
+    'coffee': ('CoffeeOrder', 'User'),
+    'temperature': ('TemperatureReading', 'TemperatureSensor'),
+}
+
+MAX_PRESENT_EMPLOYEES = 10
+MAX_LOW_STOCK_ITEMS = 10
+MAX_RECENT_ORDERS = 5
+MAX_LATEST_READINGS = 5
+
+
+def _build_presence() -> Optional[Dict[str, Any]]:
+    from services.presence_service import get_employee_presence
+    roster = get_employee_presence(active_only=True)
+    present_employees = [{
+        'name': person.full_name,
+        'department': person.department,
+        'time': person.since.strftime('%I:%M %p')
+    } for person in roster if person.is_in]
+    return {
+        'total_in_office': len(present_employees),
+        'total_employees': len(roster),
+        'employees_present': present_employees[:MAX_PRESENT_EMPLOYEES]
+    }
+
+
+def _build_stock() -> Optional[Dict[str, Any]]:
+    from models import StockItem
+    low_stock_items = StockItem.query.filter(
+        StockItem.quantity <= StockItem.reorder_point
+    ).limit(MAX_LOW_STOCK_ITEMS).all()
+    return {
+        'low_stock_count': len(low_stock_items),
+        'low_stock_items': [{
+            'name': item.name,
+            'quantity': item.quantity,
+            'reorder_point': item.reorder_point,
+            'unit': item.unit
+        } for item in low_stock_items]
+    }
+
+
+def _build_coffee() -> Optional[Dict[str, Any]]:
+    from models import CoffeeOrder
+    today = datetime.now().date()
+    todays_orders = CoffeeOrder.query.filter(func.date(CoffeeOrder.created_at) == today).count()
+    recent_orders = (CoffeeOrder.query.options(joinedload(CoffeeOrder.user))
+                     .order_by(desc(CoffeeOrder.created_at)).limit(MAX_RECENT_ORDERS).all())
+    return {
+        'orders_today': todays_orders,
+        'recent_orders': [{
+            'user': order.user.name,
+            'type': order.coffee_type,
+            'time': order.created_at.strftime('%I:%M %p')
+        } for order in recent_orders if order.user]
+    }
+
+
+def _build_temperature() -> Optional[Dict[str, Any]]:
+    from models import TemperatureReading
+    latest_readings = (TemperatureReading.query.options(joinedload(TemperatureReading.sensor))
+                       .order_by(desc(TemperatureReading.created_at)).limit(MAX_LATEST_READINGS).all())
+    if not latest_readings:
+        return None
+    return {
+        'latest_readings': [{
+            'sensor': reading.sensor.name,
+            'temperature': reading.temperature,
+            'humidity': reading.humidity,
+            'time': reading.created_at.strftime('%I:%M %p')
+        } for reading in latest_readings if reading.sensor]
+    }
+
+
+BUILDERS: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {
+    'presence': _build_presence,
+    'stock': _build_stock,
+    'coffee': _build_coffee,
+    'temperature': _build_temperature,
+}
+
+
+class OfficeContextSnapshot:
+    """Per-section cache of the AI context, invalidated by TTL and by writes"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._sections: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._built_at: Dict[str, float] = {}
+        self._dirty = set(BUILDERS)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._counters = {'hits': 0, 'rebuilds': 0, 'invalidations': 0, 'build_errors': 0}
+        self._listening = False
+
+    def init_app(self, app):
+        """Read the TTL from the app config and start watching session commits."""
+        self.ttl = app.config.get('AI_CONTEXT_TTL', DEFAULT_TTL)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._collect_changes)
+            event.listen(Session, 'after_commit', self._apply_changes)
+            event.listen(Session, 'after_rollback', self._discard_changes)
+            self._listening = True
+
+    def get(self) -> Dict[str, Any]:
+        """The context dict for the AI assistant (sections that failed to build are left out).
+
+        Must be called inside an app context. Returns a copy, so callers may
+        add to it freely.
+        """
+        stale = self._stale_sections()
+        if stale:
+            # One request rebuilds; concurrent ones serve what is cached meanwhile
+            blocking = not self._sections
+            if self._build_lock.acquire(blocking=blocking):
+                try:
+                    self._rebuild(self._stale_sections())
+                finally:
+                    self._build_lock.release()
+        else:
+            self._count('hits')
+
+        with self._lock:
+            return copy.deepcopy({name: data for name, data in self._sections.items() if data})
+
+    def invalidate(self, sections: Optional[Iterable[str]] = None):
+        """Mark sections (default: all) for rebuilding on the next get()."""
+        with self._lock:
+            self._dirty.update(BUILDERS if sections is None else sections)
+            self._counters['invalidations'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            now = self.clock()
+            stats['age_seconds'] = {name: round(now - built, 1) for name, built in self._built_at.items()}
+            stats['dirty'] = sorted(self._dirty)
+        return stats
+
+    # ------------------------------------------------------------- internals
+
+    def _stale_sections(self):
+        now = self.clock()
+        with self._lock:
+            return [name for name in BUILDERS
+                    if name in self._dirty or now - self._built_at.get(name, float('-inf')) > self.ttl]
+
+    def _rebuild(self, sections):
+        from services.db_engine import primary_reads
+        with primary_reads():
+            self._rebuild_sections(sections)
+
+    def _rebuild_sections(self, sections):
+        for name in sections:
+            with self._lock:
+                # Clear first: a write committed while building marks it dirty again
+                self._dirty.discard(name)
+            try:
+                data = BUILDERS[name]()
+            except Exception as e:
+                print(f"Error building AI context section '{name}': {e}")
+                self._count('build_errors')
+                with self._lock:
+                    self._sections.pop(name, None)
+                    self._built_at[name] = self.clock()  # retry after the TTL, not every message
+                continue
+            with self._lock:
+                self._sections[name] = data
+                self._built_at[name] = self.clock()
+                self._counters['rebuilds'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _collect_changes(self, session, flush_context):
+        touched = session.info.setdefault('office_context_sections', set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            model = type(obj).__name__
+            touched.update(name for name, models in SECTION_MODELS.items() if model in models)
+
+    def _apply_changes(self, session):
+        touched = session.info.pop('office_context_sections', None)
+        if touched:
+            self.invalidate(touched)
+
+    def _discard_changes(self, session):
+        session.info.pop('office_context_sections', None)
+
+
+# Create global instance
+office_context = OfficeContextSnapshot()
@@ -1,10 +1,21 @@
 """OpenWeatherMap API integration for real-time weather data."""
 from datetime import datetime, timedelta
-import requests
+import os
+
+from services.http_client import outbound
 
 # API Key for OpenWeatherMap
 OPENWEATHER_API_KEY = "###################################"
 
+# Overridable so the integration can be pointed at a local stub server
+OPENWEATHER_BASE_URL = os.environ.get('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org').rstrip('/')
+
+
+def _get(url, params):
+    """GET through the shared, pooled OpenWeatherMap client."""
+    return outbound.client('openweathermap').get(url, params=params, timeout=10)
+
+
 def fetch_current_weather(city="Cape Town, Pinelands, ZA"):
     """Fetch current weather data from OpenWeatherMap.
     
@@ -14,15 +25,28 @@ def fetch_current_weather(city="Cape Town, Pinelands, ZA"):
     Returns:
         Dict with current weather data or None on failure.
     """
+    return _fetch_current({'q': city})
+
+
+def fetch_current_weather_by_coords(lat, lon):
+    """Fetch current weather data for coordinates from OpenWeatherMap.
+    
+    Returns:
+        Dict with current weather data (see fetch_current_weather) or None on failure.
+    """
+    return _fetch_current({'lat': lat, 'lon': lon})
+
+
+def _fetch_current(location_params):
     try:
-        url = "https://api.openweathermap.org/data/2.5/weather"
+        url = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
         params = {
-            'q': city,
+            **location_params,
             'appid': OPENWEATHER_API_KEY,
             'units': 'metric'  # Use Celsius
         }
         
-        resp = requests.get(url, params=params, timeout=10)
+        resp = _get(url, params)
         resp.raise_for_status()
         data = resp.json()
         
@@ -34,6 +58,8 @@ def fetch_current_weather(city="Cape Town, Pinelands, ZA"):
             'feels_like': round(float(data['main']['feels_like']), 1),
             'pressure': data['main']['pressure'],
             'wind_speed': data['wind']['speed'],
+            'wind_direction': data['wind'].get('deg'),
+            'condition_code': str(data['weather'][0]['id']),
             'city': data['name'],
             'country': data['sys']['country']
         }
@@ -42,26 +68,24 @@ def fetch_current_weather(city="Cape Town, Pinelands, ZA"):
         return None
 
 
-def fetch_forecast_weather(city="Cape Town, Pinelands, ZA", hours=24):
-    """Fetch hourly forecast data from OpenWeatherMap.
+def geocode_city(city):
+    """Resolve a city name to coordinates with the OpenWeatherMap geocoding API.
     
     Args:
-        city: City name (default: Cape Town, Pinelands, ZA)
-        hours: Number of hours to fetch (max 48)
+        city: City name, optionally with region/country (e.g. "Cape Town, ZA")
     
     Returns:
-        List of dicts with hourly weather data or None on failure.
+        Dict with lat, lon, name and country, or None if not found or on failure.
     """
     try:
-        # First get coordinates for the city
-        geo_url = "http://api.openweathermap.org/geo/1.0/direct"
+        geo_url = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct"
         geo_params = {
             'q': city,
             'appid': OPENWEATHER_API_KEY,
             'limit': 1
         }
         
-        geo_resp = requests.get(geo_url, params=geo_params, timeout=10)
+        geo_resp = _get(geo_url, geo_params)
         geo_resp.raise_for_status()
         geo_data = geo_resp.json()
         
@@ -69,11 +93,30 @@ def fetch_forecast_weather(city="Cape Town, Pinelands, ZA", hours=24):
             print(f"City not found: {city}")
             return None
         
-        lat = geo_data[0]['lat']
-        lon = geo_data[0]['lon']
-        
-        # Now get forecast data
-        url = "https://api.openweathermap.org/data/2.5/forecast"
+        return {
+            'lat': geo_data[0]['lat'],
+            'lon': geo_data[0]['lon'],
+            'name': geo_data[0].get('name'),
+            'country': geo_data[0].get('country')
+        }
+    except Exception as e:
+        print(f"OpenWeatherMap geocode error: {e}")
+        return None
+
+
+def fetch_forecast_by_coords(lat, lon, hours=24):
+    """Fetch hourly forecast data for coordinates from OpenWeatherMap.
+    
+    Args:
+        lat: Latitude
+        lon: Longitude
+        hours: Number of hours to fetch (max 48)
+    
+    Returns:
+        List of dicts with hourly weather data or None on failure.
+    """
+    try:
+        url = f"{OPENWEATHER_BASE_URL}/data/2.5/forecast"
         params = {
             'lat': lat,
             'lon': lon,
@@ -82,7 +125,7 @@ def fetch_forecast_weather(city="Cape Town, Pinelands, ZA", hours=24):
             'cnt': min(hours // 3, 40)  # API returns 3-hour intervals, max 40 entries
         }
         
-        resp = requests.get(url, params=params, timeout=10)
+        resp = _get(url, params)
         resp.raise_for_status()
         data = resp.json()
         
@@ -104,6 +147,25 @@ def fetch_forecast_weather(city="Cape Town, Pinelands, ZA", hours=24):
         return None
 
 
+def fetch_forecast_weather(city="Cape Town, Pinelands, ZA", hours=24):
+    """Fetch hourly forecast data from OpenWeatherMap.
+    
+    Uncached: every call geocodes the city and then fetches the forecast.
+    Request handlers should go through services.weather_cache instead.
+    
+    Args:
+        city: City name (default: Cape Town, Pinelands, ZA)
+        hours: Number of hours to fetch (max 48)
+    
+    Returns:
+        List of dicts with hourly weather data or None on failure.
+    """
+    location = geocode_city(city)
+    if not location:
+        return None
+    return fetch_forecast_by_coords(location['lat'], location['lon'], hours)
+
+
 def fetch_hourly_weather(lat, lon, hours=24):
     """Fetch hourly weather using coordinates (for compatibility with existing code).
     
@@ -116,7 +178,7 @@ def fetch_hourly_weather(lat, lon, hours=24):
         List of dicts with hourly weather data or None on failure.
     """
     try:
-        url = "https://api.openweathermap.org/data/2.5/forecast"
+        url = f"{OPENWEATHER_BASE_URL}/data/2.5/forecast"
         params = {
             'lat': lat,
             'lon': lon,
@@ -125,7 +187,7 @@ def fetch_hourly_weather(lat, lon, hours=24):
             'cnt': min(hours // 3, 40)
         }
         
-        resp = requests.get(url, params=params, timeout=10)
+        resp = _get(url, params)
         resp.raise_for_status()
         data = resp.json()
         
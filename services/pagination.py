@@ -0,0 +1,165 @@
+# services/pagination.py - Keyset pagination for the CRUD list endpoints
+"""Cursor-paginated, filterable, field-selectable list responses.
+
+``list_response`` serves one page of a table:
+
+- ``limit`` rows (default 100, at most 1000) after an opaque ``cursor``. The
+  cursor holds the last id seen, so every page is an index range scan
+  (``WHERE id > :last ORDER BY id LIMIT n``) and costs the same on page 1
+  and on page 10,000, however large the table,
+- ``fields=a,b`` selects only those columns in SQL (``id`` is always
+  included, since the cursor needs it),
+- equality and range filters declared per endpoint in a ``ListSpec``, run as
+  WHERE clauses on indexed columns,
+- ``order=desc`` walks from the newest id backwards,
+- ``limit=all`` returns every matching row (after ``cursor``, if given) in
+  one response. It is streamed: rows are fetched with ``yield_per`` and
+  encoded as a JSON array a batch at a time (``stream_json_response``), so
+  memory stays flat however large the table. Such responses have no ETag
+  and no next link.
+
+The body stays a plain JSON array, as before. The next page is advertised
+in a ``Link: <...>; rel="next"`` header and in ``X-Next-Cursor``. Responses
+carry an ETag, so a client sending ``If-None-Match`` for an unchanged page
+gets 304 with no body.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Type
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+from marshmallow import Schema
+from sqlalchemy import select
+
+from app import db
+from services.serializers import STREAM_BATCH_ROWS, dump_rows, fast_schema, stream_json_response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Filter operators: query param -> (column, operator)
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ge': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+}
+
+
+class ListQueryError(ValueError):
+    """A list query parameter is invalid (answered with 400)."""
+
+
+@dataclass(frozen=True)
+class ListSpec:
+    model: Any
+    schema: Type[Schema]
+    filters: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ListQueryError('invalid cursor')
+
+
+def _coerce(column, raw: str):
+    """Convert a filter value to the column's Python type."""
+    python_type = column.type.python_type
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(raw.replace('Z', '+00:00')).replace(tzinfo=None)
+        if python_type is bool:
+            return raw.lower() in ('1', 'true', 'yes')
+        return python_type(raw)
+    except (TypeError, ValueError):
+        raise ListQueryError(f'invalid value for {column.key}: {raw!r}')
+
+
+def build_list_query(spec: ListSpec, args) -> Tuple[Any, Tuple[str, ...], Optional[int]]:
+    """Statement for one page (limit + 1 rows), the selected fields and the page size.
+
+    With ``limit=all`` the statement has no LIMIT and the page size is None.
+    """
+    schema_fields = tuple(spec.schema._declared_fields)
+    requested = args.get('fields')
+    if requested:
+        only = tuple(dict.fromkeys(['id'] + [f.strip() for f in requested.split(',') if f.strip()]))
+        unknown = [f for f in only if f not in schema_fields]
+        if unknown:
+            raise ListQueryError(f"unknown fields: {', '.join(unknown)}")
+    else:
+        only = schema_fields
+
+    if args.get('limit') == 'all':
+        limit = None
+    else:
+        try:
+            limit = int(args.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise ListQueryError("limit must be an integer or 'all'")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ListQueryError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    descending = args.get('order', 'asc').lower() == 'desc'
+    id_column = spec.model.id
+    fast = fast_schema(spec.schema, only)
+    columns = fast.columns(spec.model) if fast else [getattr(spec.model, f) for f in only]
+    stmt = select(*columns)
+
+    for param, (column_name, operator) in spec.filters.items():
+        raw = args.get(param)
+        if raw is None or raw == '':
+            continue
+        column = getattr(spec.model, column_name)
+        stmt = stmt.where(OPERATORS[operator](column, _coerce(column, raw)))
+
+    cursor = args.get('cursor')
+    if cursor:
+        last_id = decode_cursor(cursor)
+        stmt = stmt.where(id_column < last_id if descending else id_column > last_id)
+
+    stmt = stmt.order_by(id_column.desc() if descending else id_column.asc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt, only, limit
+
+
+def list_response(spec: ListSpec):
+    """One page of ``spec.model`` for the current request, as a Flask response."""
+    try:
+        stmt, only, limit = build_list_query(spec, request.args)
+    except ListQueryError as e:
+        return jsonify({'msg': str(e)}), 400
+
+    if limit is None:
+        rows = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH_ROWS))
+        return stream_json_response(spec.schema, rows, only)
+
+    rows = db.session.execute(stmt).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    response = jsonify(dump_rows(spec.schema, rows, only))
+    if has_more:
+        add_next_link(response, encode_cursor(rows[-1].id))
+
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def add_next_link(response, next_cursor: str):
+    """Advertise the next page: the current URL with ``cursor`` replaced."""
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    response.headers['X-Next-Cursor'] = next_cursor
@@ -0,0 +1,139 @@
+# services/presence_service.py - Shared presence queries
+"""Latest-presence-per-employee lookups done in a single SQL round-trip.
+
+Every "who is in the office" view needs each employee's most recent
+PresenceLog. Reads go through the ``current_presence`` table, which holds one
+row per user and is upserted alongside every PresenceLog insert, so they cost
+O(employees) rather than O(history). ``rebuild_current_presence`` backfills
+that table from the full log using a window function.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, delete, func, insert, select
+
+from app import db
+from models import CurrentPresence, Employee, PresenceLog, PresenceStatus, User
+
+
+@dataclass(frozen=True)
+class EmployeePresence:
+    """An employee together with their latest presence status."""
+    employee_id: int
+    user_id: int
+    full_name: str
+    department: Optional[str]
+    email: Optional[str]
+    office_id: Optional[int]
+    status: Optional[PresenceStatus]
+    location: Optional[str]
+    since: Optional[datetime]
+
+    @property
+    def is_in(self) -> bool:
+        return self.status == PresenceStatus.IN
+
+
+def latest_presence_subquery():
+    """Subquery with exactly one row (the newest PresenceLog) per user_id."""
+    ranked = select(
+        PresenceLog.user_id.label('user_id'),
+        PresenceLog.status.label('status'),
+        PresenceLog.location.label('location'),
+        PresenceLog.created_at.label('created_at'),
+        func.row_number().over(
+            partition_by=PresenceLog.user_id,
+            order_by=(PresenceLog.created_at.desc(), PresenceLog.id.desc())
+        ).label('rn')
+    ).where(PresenceLog.created_at.isnot(None)).subquery('ranked_presence')
+
+    return (select(ranked.c.user_id, ranked.c.status, ranked.c.location, ranked.c.created_at)
+            .where(ranked.c.rn == 1)
+            .subquery('latest_presence'))
+
+
+def _filter_roster(query, active_only: bool, office_id: Optional[int]):
+    if active_only:
+        query = query.filter(Employee.status == 'active')
+    if office_id is not None:
+        query = query.filter(Employee.office_id == office_id)
+    return query
+
+
+def get_employee_presence(active_only: bool = True, office_id: Optional[int] = None,
+                          present_only: bool = False) -> List[EmployeePresence]:
+    """Return every employee with a user account and their latest presence.
+
+    Args:
+        active_only: Only include employees whose status is 'active'
+        office_id: Restrict to employees of a single office
+        present_only: Only include employees whose latest status is IN
+
+    Returns:
+        List of EmployeePresence ordered by employee id (one query total).
+    """
+    query = (db.session.query(
+                Employee.id, Employee.user_id, Employee.first_name, Employee.last_name,
+                Employee.department, Employee.email, Employee.office_id,
+                CurrentPresence.status, CurrentPresence.location, CurrentPresence.since)
+             .join(User, Employee.user_id == User.id))
+    if present_only:
+        # Drive the query from the (indexed) status column so it scales with
+        # the number of people present rather than the size of the roster
+        query = query.join(CurrentPresence, CurrentPresence.user_id == Employee.user_id).filter(
+            CurrentPresence.status == PresenceStatus.IN)
+    else:
+        query = query.outerjoin(CurrentPresence, CurrentPresence.user_id == Employee.user_id)
+    query = _filter_roster(query, active_only, office_id)
+
+    return [
+        EmployeePresence(
+            employee_id=row[0],
+            user_id=row[1],
+            full_name=f"{row[2]} {row[3]}",
+            department=row[4],
+            email=row[5],
+            office_id=row[6],
+            status=row[7],
+            location=row[8],
+            since=row[9]
+        )
+        for row in query.order_by(Employee.id).all()
+    ]
+
+
+def get_presence_counts(active_only: bool = True, office_id: Optional[int] = None) -> Dict[str, int]:
+    """Count employees (with user accounts) and how many are currently IN.
+
+    Returns dict with keys ``total_employees`` and ``employees_in_office``.
+    """
+    query = (db.session.query(
+                func.count(Employee.id),
+                func.sum(case((CurrentPresence.status == PresenceStatus.IN, 1), else_=0)))
+             .select_from(Employee)
+             .join(User, Employee.user_id == User.id)
+             .outerjoin(CurrentPresence, CurrentPresence.user_id == Employee.user_id))
+    total, present = _filter_roster(query, active_only, office_id).one()
+    return {
+        'total_employees': total or 0,
+        'employees_in_office': int(present or 0),
+    }
+
+
+def rebuild_current_presence() -> int:
+    """Rebuild the current_presence table from the full PresenceLog history.
+
+    Used to backfill the table after it is first created, or to repair it if
+    logs were written outside the ORM. Returns the number of rows written.
+    """
+    latest = latest_presence_subquery()
+    db.session.execute(delete(CurrentPresence))
+    db.session.execute(
+        insert(CurrentPresence).from_select(
+            ['user_id', 'status', 'location', 'since'],
+            select(latest.c.user_id, latest.c.status, latest.c.location, latest.c.created_at)
+        )
+    )
+    db.session.commit()
+    return db.session.query(func.count(CurrentPresence.user_id)).scalar()
@@ -0,0 +1,161 @@
+# services/prompt_builder.py - Compact, budgeted AI context prompts
+"""Turns the office context snapshot into a short, deterministic prompt block.
+
+The snapshot used to be pasted into the system message as a Python ``repr``,
+which repeats every key name on every row and grows without limit. Here:
+
+- each section becomes a heading plus ``key=value`` pairs,
+- lists of records become one header line naming the fields followed by one
+  ``|``-separated line per row, and fields with the same value on every row
+  are stated once above the rows,
+- keys are sorted and floats trimmed, so equal data always gives an
+  identical prompt (which keeps response-cache keys and upstream prompt
+  caches stable),
+- the block is cut to a token budget. Rows are dropped from the end of the
+  lowest-priority section first, then whole sections. A closing line tells
+  the model what was left out, so it doesn't treat a partial list as
+  complete.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_TOKEN_BUDGET = 400
+
+# Earlier sections are kept longest when the budget is tight
+SECTION_PRIORITY = ('presence', 'stock', 'temperature', 'coffee')
+
+CHARS_PER_TOKEN = 4  # rough average for English text and short identifiers
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer dependency)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class _Table:
+    name: str
+    fields: List[str]
+    shared: Dict[str, Any]
+    rows: List[List[Any]]
+    total: int
+
+
+@dataclass
+class _Section:
+    name: str
+    scalars: Dict[str, Any]
+    tables: List[_Table] = field(default_factory=list)
+
+
+@dataclass
+class ContextPrompt:
+    text: str
+    tokens: int
+    omitted: List[str]
+
+
+def build_context_prompt(context_data: Optional[Dict[str, Any]],
+                         token_budget: int = DEFAULT_TOKEN_BUDGET) -> ContextPrompt:
+    """Serialise a context snapshot to at most ``token_budget`` (estimated) tokens.
+
+    Args:
+        context_data: Section name -> dict of scalars and lists of records,
+            as produced by services.office_context
+        token_budget: Upper bound for the returned text, including the
+            omission note
+
+    Returns:
+        ContextPrompt with the text, its estimated tokens and a list of
+        what was dropped (empty when everything fitted).
+    """
+    if not context_data:
+        return ContextPrompt('', 0, [])
+
+    order = {name: i for i, name in enumerate(SECTION_PRIORITY)}
+    names = sorted(context_data, key=lambda n: (order.get(n, len(order)), n))
+    sections = [_parse_section(name, context_data[name]) for name in names if context_data[name]]
+
+    dropped_sections: List[str] = []
+    text = _render(sections, dropped_sections)
+    while estimate_tokens(text) > token_budget and sections:
+        # Lowest-priority section with rows left loses its last row; without rows, the whole section goes
+        section = sections[-1]
+        table = next((t for t in reversed(section.tables) if t.rows), None)
+        if table is not None:
+            table.rows.pop()
+        else:
+            sections.pop()
+            dropped_sections.append(section.name)
+        text = _render(sections, dropped_sections)
+
+    return ContextPrompt(text, estimate_tokens(text), _omissions(sections, dropped_sections))
+
+
+def _parse_section(name: str, data: Any) -> _Section:
+    if not isinstance(data, dict):
+        return _Section(name, {'value': data})
+    scalars, tables = {}, []
+    for key in sorted(data):
+        value = data[key]
+        if isinstance(value, (list, tuple)) and value and all(isinstance(v, dict) for v in value):
+            tables.append(_parse_table(key, value))
+        elif isinstance(value, (list, tuple)):
+            scalars[key] = ','.join(_format(v) for v in value)
+        else:
+            scalars[key] = value
+    return _Section(name, scalars, tables)
+
+
+def _parse_table(name: str, records: Sequence[Dict[str, Any]]) -> _Table:
+    keys = sorted({k for record in records for k in record})
+    shared = {}
+    if len(records) > 1:
+        for key in keys:
+            values = {_format(record.get(key)) for record in records}
+            if len(values) == 1:
+                shared[key] = records[0].get(key)
+    fields = [k for k in keys if k not in shared]
+    rows = [[record.get(k) for k in fields] for record in records]
+    return _Table(name, fields, shared, rows, len(records))
+
+
+def _render(sections: List[_Section], dropped_sections: List[str]) -> str:
+    lines = []
+    for section in sections:
+        lines.append(f'[{section.name}]')
+        if section.scalars:
+            lines.append(' '.join(f'{k}={_format(v)}' for k, v in section.scalars.items()))
+        for table in section.tables:
+            if not table.rows:
+                continue
+            shown = f'{len(table.rows)}/{table.total}' if len(table.rows) < table.total else str(table.total)
+            lines.append(f"{table.name} ({shown}): {'|'.join(table.fields)}")
+            if table.shared:
+                lines.append('  all: ' + ' '.join(f'{k}={_format(v)}' for k, v in table.shared.items()))
+            lines.extend('  ' + '|'.join(_format(v) for v in row) for row in table.rows)
+
+    omitted = _omissions(sections, dropped_sections)
+    if omitted:
+        lines.append('(omitted for length: ' + '; '.join(omitted) + ' - say so if the answer depends on it)')
+    return '\n'.join(lines)
+
+
+def _omissions(sections: List[_Section], dropped_sections: List[str]) -> List[str]:
+    omitted = []
+    for section in sections:
+        for table in section.tables:
+            if len(table.rows) < table.total:
+                omitted.append(f'{table.total - len(table.rows)} of {table.total} {section.name}.{table.name}')
+    omitted.extend(f'section {name}' for name in dropped_sections)
+    return omitted
+
+
+def _format(value: Any) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, float):
+        return f'{value:.2f}'.rstrip('0').rstrip('.')
+    return str(value).replace('|', '/').replace('\n', ' ')
@@ -0,0 +1,277 @@
+# services/reorder_engine.py - Demand forecasting for reorder suggestions
+"""Per-item demand rates and reorder suggestions for the whole catalogue.
+
+Consumption comes from ``stock_consumption``: the quantity taken out per
+item and day, added to whenever an 'out' ``StockTransaction`` is written
+(see ``models.record_stock_consumption``), so the forecast reads one row per
+item-day from a covering index instead of grouping raw transactions. Use
+``rebuild_consumption`` (scripts/rebuild_stock_consumption.py) after
+transactions are written or deleted outside the ORM. Office stock is consumed intermittently
+(a box of toner every few weeks), so each item's daily demand rate is
+fitted with Croston's method, using the Syntetos-Boylan bias correction:
+the size of a demand and the interval between demands are smoothed
+separately, and the rate is ``(1 - alpha / 2) * size / interval``.
+
+The smoothing only changes on days with demand, so the array fit walks
+the demand events in day order and updates every item with demand on that
+day at once. NumPy is used for this when installed, and the consumption is
+then read as one row per day (the items' ids and quantities aggregated into
+strings in SQL) and parsed straight into arrays; otherwise the rows are
+read per item-day and the same arithmetic runs per item in plain Python
+(identical results, see scripts/bench_reorder_engine.py).
+
+From the rate come days of cover, the date by which to order given the
+supplier lead time, and an order-up-to quantity covering the lead time plus
+``cover_days``. Settings come from the app config (``REORDER_*``) with the
+defaults below.
+"""
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from flask import current_app, has_app_context
+from sqlalchemy import String, cast, delete, func, insert, select
+
+from app import db
+from models import StockConsumption, StockItem, StockTransaction, stock_status
+
+# Optional import - falls back to plain Python if not installed
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+DEFAULT_HISTORY_DAYS = 90     # consumption history used for the fit
+DEFAULT_ALPHA = 0.2           # smoothing constant for demand size and interval
+DEFAULT_LEAD_TIME_DAYS = 7    # supplier lead time
+DEFAULT_COVER_DAYS = 60       # stock to have after a delivery ("two months' worth")
+DEFAULT_REORDER_POINT = 5     # for items without one, as the old suggestions assumed
+
+
+@dataclass
+class DemandEvents:
+    """Consumption per (item, day) in day order: parallel sequences"""
+    item_index: Sequence[int]   # position in the item id list
+    day: Sequence[int]          # days since the start of the history window
+    quantity: Sequence[float]
+
+
+def _setting(name: str, default):
+    config = current_app.config if has_app_context() else {}
+    return config.get(name, default)
+
+
+def load_demand(item_ids: List[int], start: date) -> DemandEvents:
+    """Daily consumption of every item since ``start``, in one query."""
+    if NUMPY_AVAILABLE:
+        return load_demand_arrays(item_ids, start)
+
+    rows = db.session.execute(
+        select(StockConsumption.day, StockConsumption.item_id, StockConsumption.quantity)
+        .where(StockConsumption.day >= start, StockConsumption.quantity > 0)
+        .order_by(StockConsumption.day, StockConsumption.item_id)   # the index order, so no sort
+    ).all()
+
+    positions = {item_id: i for i, item_id in enumerate(item_ids)}
+    item_index, days, quantities = [], [], []
+    offsets: Dict[date, int] = {}
+    for day, item_id, quantity in rows:
+        position = positions.get(item_id)
+        if position is None:
+            continue
+        offset = offsets.get(day)
+        if offset is None:
+            offset = offsets[day] = (day - start).days
+        item_index.append(position)
+        days.append(offset)
+        quantities.append(quantity)
+    return DemandEvents(item_index, days, quantities)
+
+
+def load_demand_arrays(item_ids: List[int], start: date) -> DemandEvents:
+    """Like load_demand, with numpy arrays, and without a Python object per item-day. Requires NumPy.
+
+    The rows are aggregated per day in SQL, the item ids and quantities as
+    comma-separated strings (group_concat / string_agg), which numpy parses
+    straight into arrays: one result row per day instead of one per
+    item-day. Quantities go through text, so they keep 15 significant
+    digits on SQLite.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('load_demand_arrays requires numpy; use load_demand instead')
+
+    rows = db.session.execute(
+        select(StockConsumption.day,
+               func.aggregate_strings(cast(StockConsumption.item_id, String), ','),
+               func.aggregate_strings(cast(StockConsumption.quantity, String), ','))
+        .where(StockConsumption.day >= start, StockConsumption.quantity > 0)
+        .group_by(StockConsumption.day)
+        .order_by(StockConsumption.day)
+    ).all()
+
+    ids, days, quantities = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+    for day, day_ids, day_quantities in rows:
+        ids.append(np.fromstring(day_ids, dtype=np.int64, sep=','))
+        days.append(np.full(len(ids[-1]), (day - start).days, dtype=np.int64))
+        quantities.append(np.fromstring(day_quantities, dtype=np.float64, sep=','))
+    ids, days, quantities = np.concatenate(ids), np.concatenate(days), np.concatenate(quantities)
+
+    # Item id -> position in item_ids; consumption of items not listed is dropped
+    known = np.asarray(item_ids, dtype=np.int64)
+    if not len(known):
+        return DemandEvents(ids[:0], days[:0], quantities[:0])
+    order = np.argsort(known, kind='stable')
+    slot = np.minimum(np.searchsorted(known[order], ids), len(known) - 1)
+    found = known[order][slot] == ids
+    return DemandEvents(order[slot][found], days[found], quantities[found])
+
+
+def rebuild_consumption() -> int:
+    """Rebuild stock_consumption from the full StockTransaction history.
+
+    Used to backfill the table after it is first created, or to repair it if
+    transactions were written or deleted outside the ORM. Returns the number
+    of rows written.
+    """
+    day = func.date(StockTransaction.created_at)
+    db.session.execute(delete(StockConsumption))
+    db.session.execute(
+        insert(StockConsumption).from_select(
+            ['item_id', 'day', 'quantity'],
+            select(StockTransaction.item_id, day, func.sum(StockTransaction.quantity))
+            .where(StockTransaction.type == 'out', StockTransaction.created_at.isnot(None))
+            .group_by(StockTransaction.item_id, day)
+        )
+    )
+    db.session.commit()
+    return db.session.query(func.count()).select_from(StockConsumption).scalar()
+
+
+def croston_rates(events: DemandEvents, item_count: int, horizon: int,
+                  alpha: float = DEFAULT_ALPHA) -> List[float]:
+    """Daily demand rate per item (0.0 for items without demand), Croston/SBA.
+
+    ``horizon`` is the number of days in the window. The first demand sets
+    the size and the second the interval; an item with a single demand is
+    rated over the days since it.
+    """
+    if NUMPY_AVAILABLE and len(events.day):
+        return croston_rates_arrays(events, item_count, horizon, alpha).tolist()
+
+    size = [0.0] * item_count
+    interval = [0.0] * item_count
+    last_day = [0] * item_count
+    count = [0] * item_count
+    for i, day, quantity in zip(events.item_index, events.day, events.quantity):
+        if count[i] == 0:
+            size[i] = quantity
+        else:
+            size[i] = size[i] + alpha * (quantity - size[i])
+            gap = day - last_day[i]
+            interval[i] = gap if count[i] == 1 else interval[i] + alpha * (gap - interval[i])
+        count[i] += 1
+        last_day[i] = day
+    for i in range(item_count):
+        if count[i] == 1:
+            interval[i] = float(horizon - last_day[i])
+    correction = 1 - alpha / 2
+    return [correction * s / p if p else 0.0 for s, p in zip(size, interval)]
+
+
+def croston_rates_arrays(events: DemandEvents, item_count: int, horizon: int, alpha: float = DEFAULT_ALPHA):
+    """Like croston_rates but returns a numpy array. Requires NumPy."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('croston_rates_arrays requires numpy; use croston_rates instead')
+
+    items = np.asarray(events.item_index, dtype=np.int64)
+    days = np.asarray(events.day, dtype=np.int64)
+    quantities = np.asarray(events.quantity, dtype=np.float64)
+    size = np.zeros(item_count)
+    interval = np.zeros(item_count)
+    last_day = np.zeros(item_count, dtype=np.int64)
+    count = np.zeros(item_count, dtype=np.int64)
+
+    # Walk the events day by day; an item has at most one event per day, so
+    # each day's slice updates distinct items
+    order = np.argsort(days, kind='stable')   # load_demand's order already; cheap when sorted
+    items, days, quantities = items[order], days[order], quantities[order]
+    bounds = np.flatnonzero(np.diff(days)) + 1
+    for chunk in np.split(np.arange(len(days)), bounds):
+        i, day, quantity = items[chunk], days[chunk[0]], quantities[chunk]
+        n = count[i]
+        gap = (day - last_day[i]).astype(np.float64)
+        size[i] = np.where(n == 0, quantity, size[i] + alpha * (quantity - size[i]))
+        interval[i] = np.where(n == 0, 0.0, np.where(n == 1, gap, interval[i] + alpha * (gap - interval[i])))
+        count[i] = n + 1
+        last_day[i] = day
+    single = count == 1
+    interval[single] = (horizon - last_day[single]).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(interval > 0, (1 - alpha / 2) * size / interval, 0.0)
+
+
+def forecast_reorders(include_all: bool = False, lead_time_days: Optional[int] = None,
+                      cover_days: Optional[int] = None, history_days: Optional[int] = None,
+                      alpha: Optional[float] = None, today: Optional[date] = None) -> List[Dict]:
+    """Reorder suggestions for every item that is low, out of stock, or will run out within the lead time.
+
+    Each suggestion has the daily demand rate, days of cover (None without
+    demand), the date to order by, the order quantity and its cost.
+    ``include_all`` returns the forecast for every item instead. Sorted by
+    order date, then days of cover.
+    """
+    lead_time_days = _setting('REORDER_LEAD_TIME_DAYS', DEFAULT_LEAD_TIME_DAYS) if lead_time_days is None else lead_time_days
+    cover_days = _setting('REORDER_COVER_DAYS', DEFAULT_COVER_DAYS) if cover_days is None else cover_days
+    history_days = _setting('REORDER_HISTORY_DAYS', DEFAULT_HISTORY_DAYS) if history_days is None else history_days
+    alpha = _setting('REORDER_SMOOTHING', DEFAULT_ALPHA) if alpha is None else alpha
+    today = today or datetime.utcnow().date()   # transactions are stamped in UTC
+    start = today - timedelta(days=history_days - 1)
+
+    items = db.session.execute(
+        select(StockItem.id, StockItem.name, StockItem.quantity, StockItem.reorder_point, StockItem.unit,
+               StockItem.supplier, StockItem.unit_cost, stock_status.label('status'))
+        .order_by(StockItem.id)
+    ).all()
+    rates = croston_rates(load_demand([item.id for item in items], start), len(items), history_days, alpha)
+
+    suggestions = []
+    for item, rate in zip(items, rates):
+        on_hand = max(item.quantity or 0.0, 0.0)
+        days_of_cover = on_hand / rate if rate > 0 else None
+        runs_out_soon = days_of_cover is not None and days_of_cover <= lead_time_days
+        if not (include_all or item.status != 'OK' or runs_out_soon):
+            continue
+
+        # Order when the remaining cover equals the lead time (today if that has passed)
+        order_in = max(0, math.floor(days_of_cover - lead_time_days)) if days_of_cover is not None else None
+        order_up_to = max(rate * (lead_time_days + cover_days), (item.reorder_point or DEFAULT_REORDER_POINT) * 2)
+        suggested_quantity = max(1, math.ceil(order_up_to - on_hand)) if order_up_to > on_hand else 0
+        if order_in is None and item.status == 'OK':
+            order_by = None
+        else:
+            order_by = today + timedelta(days=order_in or 0)
+        suggestions.append({
+            'item_id': item.id,
+            'name': item.name,
+            'current_quantity': item.quantity,
+            'reorder_point': item.reorder_point,
+            'status': item.status,
+            'daily_demand': round(rate, 3),
+            'monthly_usage': round(rate * 30, 1),
+            'days_of_cover': round(days_of_cover, 1) if days_of_cover is not None else None,
+            'days_of_stock': round(days_of_cover, 1) if days_of_cover is not None else None,
+            'order_by': order_by.isoformat() if order_by else None,
+            'suggested_quantity': suggested_quantity,
+            'unit': item.unit,
+            'supplier': item.supplier,
+            'estimated_cost': round(suggested_quantity * item.unit_cost, 2) if item.unit_cost else None,
+            'priority': 'high' if item.status == 'Critical' or runs_out_soon else 'medium'
+        })
+
+    far_future = date.max.isoformat()
+    return sorted(suggestions, key=lambda s: (s['order_by'] or far_future,
+                                              s['days_of_cover'] if s['days_of_cover'] is not None else math.inf,
+                                              s['item_id']))
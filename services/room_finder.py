@@ -0,0 +1,274 @@
+# services/room_finder.py - Meeting room search and week-view occupancy
+"""Finds free meeting rooms by size, place and comfort in one call.
+
+Bookings only name their room in the free-text ``resource`` column, so a
+room is matched to its bookings by ``MeetingRoom.name``. The finder keeps:
+
+- a room catalogue grouped by (office, floor), each group sorted by
+  capacity, so "8 people in office 1" is a binary search per floor rather
+  than a table scan. Every room carries its latest temperature/humidity
+  (newest reading of a sensor in the room, else the room's own columns) and
+  the comfort index and status from services.comfort,
+- per-day occupancy bitmaps (one bit per ``ROOM_OCCUPANCY_SLOT_MINUTES``
+  slot, set when any booking touches the slot) built from the booking
+  interval index and cached against its per-resource version, so a week
+  view for every room of a floor is served from memory.
+
+Availability itself is decided by ``booking_engine`` (exact times, not
+slots). The catalogue is rebuilt after committed ORM writes to rooms,
+sensors or readings, and at least every ``ROOM_FINDER_REFRESH`` seconds;
+bulk ingest calls ``invalidate`` itself.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from services.booking_engine import booking_engine
+from services.comfort import DEFAULT_TARGET, evaluate_comfort
+
+DEFAULT_REFRESH = 60         # seconds between catalogue rebuilds
+DEFAULT_SLOT_MINUTES = 15    # occupancy bitmap resolution
+MAX_CACHED_BITMAPS = 50000   # (room, day) bitmaps kept in memory
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Lower is better; 'unknown' ranks after every measured status
+COMFORT_RANK = {'comfortable': 0, 'moderate': 1, 'uncomfortable': 2, 'unknown': 3}
+MEASURED_STATUSES = ('comfortable', 'moderate', 'uncomfortable')
+
+# Committed writes to these models rebuild the catalogue
+CATALOGUE_MODELS = ('MeetingRoom', 'TemperatureSensor', 'TemperatureReading')
+
+
+@dataclass(frozen=True)
+class RoomInfo:
+    id: int
+    name: str
+    office_id: Optional[int]
+    floor: int
+    capacity: Optional[int]
+    target_temperature: float
+    temperature: Optional[float]
+    humidity: Optional[float]
+    comfort_index: Optional[float]
+    comfort_status: str
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class RoomFinder:
+    """Meeting room catalogue joined with the booking interval index"""
+
+    def __init__(self, refresh: float = DEFAULT_REFRESH, slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                 clock=time.monotonic):
+        self.refresh = refresh
+        self.slot_minutes = slot_minutes
+        self.clock = clock
+        self._groups: Dict[Tuple[Optional[int], int], Tuple[List[int], List[RoomInfo]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._bitmaps: 'OrderedDict[Tuple[str, date, int], Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._listening = False
+
+    def init_app(self, app):
+        """Read the refresh interval and slot size, and follow committed room/sensor writes."""
+        self.refresh = app.config.get('ROOM_FINDER_REFRESH', DEFAULT_REFRESH)
+        self.slot_minutes = app.config.get('ROOM_OCCUPANCY_SLOT_MINUTES', DEFAULT_SLOT_MINUTES)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._collect_changes)
+            event.listen(Session, 'after_commit', self._apply_changes)
+            event.listen(Session, 'after_rollback', self._discard_changes)
+            self._listening = True
+
+    def invalidate(self):
+        """Rebuild the room catalogue on next use."""
+        with self._lock:
+            self._loaded_at = None
+
+    # ---------------------------------------------------------------- queries
+
+    def rooms(self, office_id: Optional[int] = None, floor: Optional[int] = None,
+              capacity: Optional[int] = None) -> List[RoomInfo]:
+        """Rooms matching the filters, smallest fitting room first within each floor."""
+        self._ensure_loaded()
+        with self._lock:
+            groups = self._groups
+        result = []
+        for (group_office, group_floor), (capacities, rooms) in sorted(groups.items(), key=_group_order):
+            if office_id is not None and group_office != office_id:
+                continue
+            if floor is not None and group_floor != floor:
+                continue
+            first = 0 if capacity is None else bisect_left(capacities, capacity)
+            result.extend(rooms[first:])
+        return result
+
+    def find(self, start: datetime, end: datetime, capacity: Optional[int] = None,
+             office_id: Optional[int] = None, floor: Optional[int] = None,
+             near_floor: Optional[int] = None, comfort: Optional[str] = None,
+             limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """Rooms free for the whole of [start, end), best first.
+
+        Args:
+            capacity: Minimum number of seats
+            office_id, floor: Only rooms in that office / on that floor
+            near_floor: Rank rooms by distance from this floor (defaults to
+                ``floor``)
+            comfort: Worst acceptable comfort status ('comfortable' or
+                'moderate'); rooms without readings are then excluded
+            limit: Number of rooms returned, 1 to ``MAX_LIMIT``
+
+        Returns:
+            Room dicts plus ``floor_distance``, ordered by floor distance,
+            comfort status, comfort index (highest first), then the
+            smallest room that fits.
+        """
+        if comfort is not None and comfort not in MEASURED_STATUSES:
+            raise ValueError(f"comfort must be one of {', '.join(MEASURED_STATUSES)}")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+        max_rank = COMFORT_RANK[comfort] if comfort is not None else None
+        reference = near_floor if near_floor is not None else floor
+
+        matches = []
+        for room in self.rooms(office_id, floor, capacity):
+            if max_rank is not None and COMFORT_RANK[room.comfort_status] > max_rank:
+                continue
+            if booking_engine.conflicts(room.name, start, end):
+                continue
+            distance = abs(room.floor - reference) if reference is not None else 0
+            matches.append((distance, room))
+
+        matches.sort(key=lambda m: (m[0], COMFORT_RANK[m[1].comfort_status], -(m[1].comfort_index or 0),
+                                    (m[1].capacity or 0) - (capacity or 0), m[1].name))
+        return [{**room.to_dict(), 'floor_distance': distance} for distance, room in matches[:limit]]
+
+    def occupancy(self, resource: str, day: date) -> int:
+        """Bitmap of the slots of ``day`` touched by a booking of ``resource`` (bit 0 = 00:00)."""
+        version = booking_engine.version(resource)
+        key = (resource, day, self.slot_minutes)
+        with self._lock:
+            cached = self._bitmaps.get(key)
+            if cached is not None and cached[0] == version:
+                self._bitmaps.move_to_end(key)
+                return cached[1]
+
+        day_start = datetime.combine(day, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+        slot = timedelta(minutes=self.slot_minutes)
+        slots_per_day = (day_end - day_start) // slot
+        bits = 0
+        for booked_start, booked_end, _ in booking_engine.intervals(resource, day_start, day_end):
+            first = max(booked_start, day_start) - day_start
+            last = min(booked_end, day_end) - day_start
+            first_slot = first // slot
+            last_slot = min(-(-last // slot), slots_per_day)  # ceiling: a partly booked slot is busy
+            bits |= ((1 << (last_slot - first_slot)) - 1) << first_slot
+
+        with self._lock:
+            self._bitmaps[key] = (version, bits)
+            self._bitmaps.move_to_end(key)
+            while len(self._bitmaps) > MAX_CACHED_BITMAPS:
+                self._bitmaps.popitem(last=False)
+        return bits
+
+    def week(self, start_day: date, days: int = 7, office_id: Optional[int] = None,
+             floor: Optional[int] = None, capacity: Optional[int] = None) -> Dict[str, Any]:
+        """Occupancy of every matching room for ``days`` days from ``start_day``.
+
+        Each day is a string with one character per slot ('1' = booked),
+        ready for a calendar grid.
+        """
+        slots_per_day = 24 * 60 // self.slot_minutes
+        dates = [start_day + timedelta(days=i) for i in range(days)]
+        rooms = []
+        for room in self.rooms(office_id, floor, capacity):
+            rooms.append({**room.to_dict(),
+                          'occupancy': [_bit_string(self.occupancy(room.name, day), slots_per_day) for day in dates]})
+        return {'slot_minutes': self.slot_minutes, 'days': [d.isoformat() for d in dates], 'rooms': rooms}
+
+    # -------------------------------------------------------------- internals
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and self.clock() - self._loaded_at < self.refresh:
+            return
+        self.reload()
+
+    def reload(self):
+        """Rebuild the room catalogue (needs an app context)."""
+        from app import db
+        from models import MeetingRoom, TemperatureReading, TemperatureSensor
+        from services.db_engine import primary_reads
+
+        loaded_at = self.clock()
+        with primary_reads(db.session):
+            rooms = db.session.execute(
+                select(MeetingRoom.id, MeetingRoom.name, MeetingRoom.office_id, MeetingRoom.floor,
+                       MeetingRoom.capacity, MeetingRoom.target_temperature,
+                       MeetingRoom.current_temperature, MeetingRoom.humidity)
+            ).all()
+
+            # Newest reading of any sensor placed in each room
+            latest_per_sensor = (select(func.max(TemperatureReading.id))
+                                 .group_by(TemperatureReading.sensor_id).scalar_subquery())
+            readings = {}
+            for room_id, temperature, humidity in db.session.execute(
+                    select(TemperatureSensor.room_id, TemperatureReading.temperature, TemperatureReading.humidity)
+                    .join(TemperatureReading, TemperatureReading.sensor_id == TemperatureSensor.id)
+                    .where(TemperatureSensor.room_id.isnot(None), TemperatureReading.id.in_(latest_per_sensor))
+                    .order_by(TemperatureReading.id)):
+                readings[room_id] = (temperature, humidity)
+
+        climate = [readings.get(r.id, (r.current_temperature, r.humidity)) for r in rooms]
+        targets = [DEFAULT_TARGET if r.target_temperature is None else r.target_temperature for r in rooms]
+        evaluation = evaluate_comfort([c[0] for c in climate], [c[1] for c in climate], targets)
+
+        groups: Dict[Tuple[Optional[int], int], List[RoomInfo]] = {}
+        for i, r in enumerate(rooms):
+            info = RoomInfo(r.id, r.name, r.office_id, r.floor, r.capacity, targets[i], climate[i][0],
+                            climate[i][1], evaluation.comfort_index[i], evaluation.comfort_status[i])
+            groups.setdefault((r.office_id, r.floor), []).append(info)
+        indexed = {}
+        for key, members in groups.items():
+            members.sort(key=lambda room: (room.capacity or 0, room.name))
+            indexed[key] = ([room.capacity or 0 for room in members], members)
+
+        with self._lock:
+            self._groups = indexed
+            self._loaded_at = loaded_at
+
+    def _collect_changes(self, session, flush_context):
+        if session.info.get('room_finder_dirty'):
+            return
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if type(obj).__name__ in CATALOGUE_MODELS:
+                session.info['room_finder_dirty'] = True
+                return
+
+    def _apply_changes(self, session):
+        if session.info.pop('room_finder_dirty', None):
+            self.invalidate()
+
+    def _discard_changes(self, session):
+        session.info.pop('room_finder_dirty', None)
+
+
+def _group_order(item):
+    (office_id, floor), _ = item
+    return (office_id is None, office_id or 0, floor)
+
+
+def _bit_string(bits: int, length: int) -> str:
+    return format(bits, f'0{length}b')[::-1]
+
+
+# Create global instance
+room_finder = RoomFinder()
@@ -0,0 +1,322 @@
+# services/search_index.py - Full-text and fuzzy search
+"""Substring and typo-tolerant search over stock items, people and assets.
+
+Each searchable table has a SQLite FTS5 shadow table (``<table>_search``)
+using the ``trigram`` tokenizer, so any substring of three or more
+characters is an index lookup instead of a ``LIKE '%...%'`` scan. The shadow
+tables are contentless (only the index is stored) and kept in sync by
+INSERT/UPDATE/DELETE triggers on the source table, so every writer - the
+ORM, bulk inserts, the migration scripts - updates them without any Python
+hooks. ``ensure_search_index`` creates missing tables and triggers and fills
+new ones; ``rebuild`` refills them from scratch.
+
+``search`` first looks for the query as a substring. When nothing contains
+it, it falls back to a fuzzy match: the rows sharing the most trigrams with
+the query's words are candidates (counted in SQL, one index lookup per
+trigram), and they are kept, best first, if enough of the query's word
+trigrams (padded like PostgreSQL's pg_trgm, so word starts count) appear in
+one of their fields, which tolerates a typo or two ("jonh smith", "tonr").
+Substring results are not ranked by bm25: that scores every matching row,
+which on a common term over a million rows costs far more than the lookup
+itself.
+
+On other databases, or SQLite builds without FTS5 trigram support (< 3.34),
+and for queries shorter than three characters, searches fall back to a
+case-insensitive ``LIKE`` over the same columns.
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import false, literal_column, or_, select, text
+
+from app import db
+
+MIN_TRIGRAM_QUERY = 3          # the trigram tokenizer can't match anything shorter
+FUZZY_MIN_QUERY = 4            # shorter typos match too much to be useful
+FUZZY_CANDIDATES = 200         # rows with the most shared trigrams scored in Python
+FUZZY_THRESHOLD = 0.4          # share of the query's trigrams a fuzzy hit must contain
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+@dataclass(frozen=True)
+class SearchSource:
+    """A searchable table: index column name -> SQL expression over a row alias."""
+    kind: str
+    table: str
+    columns: Tuple[Tuple[str, str], ...]
+    watch: Tuple[str, ...]      # source columns whose updates re-index the row
+
+    @property
+    def index_table(self) -> str:
+        return f'{self.table}_search'
+
+    def expressions(self, row: str) -> List[str]:
+        return [expression.format(row=row) for _, expression in self.columns]
+
+
+SOURCES: Dict[str, SearchSource] = {source.kind: source for source in (
+    SearchSource('stock', 'stock_items',
+                 (('name', '{row}.name'), ('sku', '{row}.sku'), ('description', '{row}.description')),
+                 ('name', 'sku', 'description')),
+    SearchSource('employees', 'employees',
+                 (('name', "{row}.first_name || ' ' || {row}.last_name"), ('email', '{row}.email')),
+                 ('first_name', 'last_name', 'email')),
+    SearchSource('users', 'users',
+                 (('name', '{row}.name'), ('email', '{row}.email')),
+                 ('name', 'email')),
+    SearchSource('assets', 'assets',
+                 (('name', '{row}.name'), ('serial', '{row}.serial')),
+                 ('name', 'serial')),
+)}
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    id: int
+    fields: Dict[str, Any]
+    score: float
+    exact: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.kind, 'id': self.id, 'score': round(self.score, 3),
+                'exact': self.exact, **self.fields}
+
+
+def trigram_support() -> bool:
+    """True when the sqlite3 library has the FTS5 trigram tokenizer."""
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def create_statements(source: SearchSource) -> List[str]:
+    """DDL for one source's FTS5 table and its sync triggers."""
+    index, table = source.index_table, source.table
+    names = ', '.join(name for name, _ in source.columns)
+    new_values = ', '.join(source.expressions('new'))
+    old_values = ', '.join(source.expressions('old'))
+    # Contentless tables need the old values to delete a row from the index
+    delete_old = f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({names}, content='', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {', '.join(source.watch)} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def drop_statements(source: SearchSource) -> List[str]:
+    index = source.index_table
+    return [f"DROP TRIGGER IF EXISTS {index}_{event}" for event in ('insert', 'delete', 'update')] + \
+           [f"DROP TABLE IF EXISTS {index}"]
+
+
+def _fill(conn, source: SearchSource):
+    index = source.index_table
+    names = ', '.join(name for name, _ in source.columns)
+    conn.exec_driver_sql(f"INSERT INTO {index}({index}) VALUES ('delete-all')")
+    conn.exec_driver_sql(f"INSERT INTO {index}(rowid, {names}) "
+                         f"SELECT id, {', '.join(source.expressions(source.table))} FROM {source.table}")
+
+
+def _existing_tables(conn) -> set:
+    return set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+
+
+def ensure_search_index(engine=None) -> List[str]:
+    """Create missing search tables and triggers, filling new tables. Returns the kinds created."""
+    engine = engine or db.engine
+    if engine.dialect.name != 'sqlite' or not trigram_support():
+        return []
+    created = []
+    with engine.begin() as conn:
+        existing = _existing_tables(conn)
+        for source in SOURCES.values():
+            if source.table not in existing:
+                continue
+            new = source.index_table not in existing
+            for statement in create_statements(source):
+                conn.exec_driver_sql(statement)
+            if new:
+                _fill(conn, source)
+                created.append(source.kind)
+    _available.clear()
+    return created
+
+
+def rebuild(engine=None) -> Dict[str, int]:
+    """Refill every search table from its source table. Returns rows indexed per kind."""
+    engine = engine or db.engine
+    ensure_search_index(engine)
+    counts = {}
+    if not available(engine):
+        return counts
+    with engine.begin() as conn:
+        for source in SOURCES.values():
+            _fill(conn, source)
+            counts[source.kind] = conn.exec_driver_sql(f"SELECT count(*) FROM {source.table}").scalar()
+    return counts
+
+
+_available: Dict[int, bool] = {}
+
+
+def available(engine=None) -> bool:
+    """True when the FTS5 search tables exist on ``engine`` (cached per engine)."""
+    engine = engine or db.engine
+    key = id(engine)
+    if key not in _available:
+        ok = engine.dialect.name == 'sqlite' and trigram_support()
+        if ok:
+            with engine.connect() as conn:
+                ok = all(source.index_table in _existing_tables(conn) for source in SOURCES.values())
+        _available[key] = ok
+    return _available[key]
+
+
+def _source(kind: str) -> SearchSource:
+    try:
+        return SOURCES[kind]
+    except KeyError:
+        raise ValueError(f"Unknown search type {kind!r}; expected one of {', '.join(SOURCES)}")
+
+
+def _phrase(value: str) -> str:
+    # An FTS5 string literal; with the trigram tokenizer a phrase is a substring match
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _like_clause(source: SearchSource, query: str):
+    pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return or_(*(literal_column(expression).ilike(f'%{pattern}%', escape='\\')
+                 for expression in source.expressions(source.table)))
+
+
+def match_clause(kind: str, query: str, id_column=None):
+    """WHERE clause: rows whose indexed fields contain ``query`` (case-insensitive).
+
+    For filters that keep their own ordering and paging, e.g. the stock item
+    list's keyset pages. ``id_column`` defaults to ``<table>.id``.
+    """
+    source = _source(kind)
+    query = query.strip()
+    if not query:
+        return false()
+    if id_column is None:
+        id_column = literal_column(f'{source.table}.id')
+    if len(query) >= MIN_TRIGRAM_QUERY and available():
+        index = source.index_table
+        return id_column.in_(text(f"SELECT rowid FROM {index} WHERE {index} MATCH :search_phrase")
+                             .bindparams(search_phrase=_phrase(query)))
+    return _like_clause(source, query)
+
+
+def trigrams(value: Optional[str]) -> set:
+    value = (value or '').lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def word_trigrams(value: Optional[str]) -> set:
+    """Trigrams of each word padded like pg_trgm ("  j", " jo", ..., "hn "), so word starts count."""
+    grams = set()
+    for word in (value or '').lower().split():
+        grams |= trigrams(f'  {word} ')
+    return grams
+
+
+def similarity(query: str, value: Optional[str]) -> Tuple[float, float]:
+    """(share of the query's word trigrams found in ``value``, Jaccard of the two sets)."""
+    return _similarity(word_trigrams(query), value)
+
+
+def _similarity(wanted: set, value: Optional[str]) -> Tuple[float, float]:
+    if not wanted or not value:
+        return 0.0, 0.0
+    have = word_trigrams(value)
+    shared = len(wanted & have)
+    return shared / len(wanted), shared / len(wanted | have)
+
+
+def _rows(source: SearchSource, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    if not ids:
+        return {}
+    names = [name for name, _ in source.columns]
+    selected = ', '.join(f'{expression} AS {name}' for name, expression
+                         in zip(names, source.expressions(source.table)))
+    rows = db.session.execute(
+        text(f"SELECT id, {selected} FROM {source.table} WHERE id IN ({', '.join(str(int(i)) for i in ids)})")
+    ).mappings()
+    return {row['id']: {name: row[name] for name in names} for row in rows}
+
+
+def _fts_ids(source: SearchSource, match: str, limit: int) -> List[int]:
+    # No ORDER BY rank: ranking scores every match, while rowid order stops after ``limit``
+    index = source.index_table
+    return db.session.execute(
+        text(f"SELECT rowid FROM {index} WHERE {index} MATCH :match LIMIT :limit"),
+        {'match': match, 'limit': limit}
+    ).scalars().all()
+
+
+def _fuzzy_ids(source: SearchSource, query: str, limit: int) -> List[int]:
+    """The ``limit`` rows sharing the most trigrams with the words of ``query``.
+
+    Counts, per row, how many of the query's trigrams it contains, so a rare
+    close match ("jonathan smithers") outranks the many rows that only share
+    the common trigrams ("jones smith"). Each trigram is its own MATCH, i.e.
+    one posting list; the count runs over their union.
+    """
+    grams = sorted(set().union(*(trigrams(word) for word in query.split())))
+    if not grams:
+        return []
+    index = source.index_table
+    union = ' UNION ALL '.join(f"SELECT rowid FROM {index} WHERE {index} MATCH :gram{n}"
+                               for n in range(len(grams)))
+    params = {f'gram{n}': _phrase(gram) for n, gram in enumerate(grams)}
+    return db.session.execute(
+        text(f"SELECT rowid FROM ({union}) GROUP BY rowid ORDER BY count(*) DESC, rowid LIMIT :limit"),
+        {**params, 'limit': limit}
+    ).scalars().all()
+
+
+def search(kind: str, query: str, limit: int = DEFAULT_LIMIT, fuzzy: bool = True) -> List[SearchHit]:
+    """Up to ``limit`` rows of ``kind`` containing ``query``, or close to it if none do.
+
+    Substring hits come in id order. Fuzzy hits (``exact`` false) are the
+    best-scoring of the ``FUZZY_CANDIDATES`` rows sharing the most trigrams
+    with the query (see ``_fuzzy_ids``).
+    """
+    source = _source(kind)
+    query = ' '.join(query.split())
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+
+    if len(query) < MIN_TRIGRAM_QUERY or not available():
+        ids = db.session.execute(
+            select(literal_column('id')).select_from(text(source.table))
+            .where(_like_clause(source, query)).order_by(literal_column('id')).limit(limit)
+        ).scalars().all()
+        rows = _rows(source, ids)
+        return [SearchHit(kind, i, rows[i], 1.0, True) for i in ids if i in rows]
+
+    ids = _fts_ids(source, _phrase(query), limit)
+    if ids or not fuzzy or len(query) < FUZZY_MIN_QUERY:
+        rows = _rows(source, ids)
+        return [SearchHit(kind, i, rows[i], 1.0, True) for i in ids if i in rows]
+
+    wanted = word_trigrams(query)
+    candidates = _fuzzy_ids(source, query, FUZZY_CANDIDATES)
+    rows = _rows(source, candidates)
+    scored = []
+    for i in candidates:
+        if i not in rows:
+            continue
+        score, closeness = max(_similarity(wanted, value) for value in rows[i].values())
+        if score >= FUZZY_THRESHOLD:
+            scored.append((-score, -closeness, i, SearchHit(kind, i, rows[i], score, False)))
+    scored.sort(key=lambda item: item[:3])
+    return [hit for *_, hit in scored[:limit]]
@@ -0,0 +1,274 @@
+# services/sensor_ingest.py - Batched TemperatureSensor reading ingest
+"""Parse, validate and store many sensor readings in one transaction.
+
+Sensors push batches as JSON lines, a JSON array or CSV. Each row is checked
+on its own; bad rows are reported back with their row number and reason while
+the rest of the batch is stored. Accepted rows get the sensor's
+``calibration_offset`` applied and their comfort index computed in one batch
+pass, then go in with a single executemany INSERT. The sensors' ``last_connection``
+is bumped with one UPDATE and the climate rollups are merged in the same
+transaction.
+"""
+import csv
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+
+from app import db
+from models import TemperatureReading, TemperatureSensor
+from services.climate_rollups import record_temperature_readings
+from services.comfort import comfort_indices
+from services.office_context import office_context
+from services.room_finder import room_finder
+
+CSV_COLUMNS = ('sensor_id', 'temperature', 'humidity', 'timestamp')
+
+# Readings stamped further ahead than this are treated as clock errors
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Physically plausible ranges; anything outside is a broken sensor
+TEMPERATURE_RANGE = (-50.0, 80.0)
+HUMIDITY_RANGE = (0.0, 100.0)
+
+# Cap on how many rejects are listed individually in the response
+MAX_REPORTED_REJECTS = 100
+
+
+class IngestError(ValueError):
+    """The payload as a whole could not be read."""
+
+
+@dataclass
+class IngestResult:
+    accepted: int = 0
+    rejected: int = 0
+    sensors: int = 0
+    rejects: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, row: int, error: str):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({'row': row, 'error': error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'sensors': self.sensors,
+            'rejects': self.rejects,
+            'rejects_truncated': self.rejected > len(self.rejects),
+        }
+
+
+@dataclass
+class _Reading:
+    """Row shaped like TemperatureReading for record_temperature_readings"""
+    sensor_id: int
+    temperature: float
+    humidity: Optional[float]
+    comfort_index: Optional[float]
+    created_at: datetime
+
+
+# ----------------------------------------------------------------- parsing
+
+def parse_payload(body: str, content_type: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row_number, record) pairs from a request body.
+
+    ``record`` is a dict for valid syntax, or an error string for a row that
+    could not be decoded. Row numbers start at 1 (CSV header not counted).
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return _parse_csv(body)
+    if content_type == 'application/json':
+        return _parse_json(body)
+    # application/x-ndjson, application/jsonl and anything unspecified
+    return _parse_json_lines(body)
+
+
+def _parse_json_lines(body: str) -> Iterator[Tuple[int, Any]]:
+    row = 0
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, f'invalid JSON: {e.msg}'
+
+
+def _parse_json(body: str) -> Iterator[Tuple[int, Any]]:
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise IngestError(f'invalid JSON body: {e.msg}')
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        raise IngestError('JSON body must be an array of readings or {"readings": [...]}')
+    return enumerate(data, start=1)
+
+
+def _parse_csv(body: str) -> Iterator[Tuple[int, Any]]:
+    lines = [line for line in body.splitlines() if line.strip()]
+    if not lines:
+        return iter(())
+    reader = csv.reader(lines)
+    first = next(reader)
+    if first and first[0].strip().lower() in ('sensor_id', 'mac_address'):
+        columns = [c.strip().lower() for c in first]
+    else:
+        # Headerless: fixed column order
+        columns = list(CSV_COLUMNS)
+        reader = csv.reader(lines)
+
+    def rows():
+        for row_number, values in enumerate(reader, start=1):
+            if len(values) > len(columns):
+                yield row_number, f'expected at most {len(columns)} columns, got {len(values)}'
+                continue
+            yield row_number, {k: v.strip() for k, v in zip(columns, values) if v.strip() != ''}
+    return rows()
+
+
+# -------------------------------------------------------------- validation
+
+def _number(value, name: str, required: bool, bounds: Tuple[float, float], offset: float = 0.0) -> Optional[float]:
+    """The value plus ``offset`` (a calibration), checked against ``bounds``."""
+    if value is None:
+        if required:
+            raise ValueError(f'{name} is required')
+        return None
+    try:
+        number = float(value) + offset
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if math.isnan(number) or not bounds[0] <= number <= bounds[1]:
+        calibrated = ' after calibration' if offset else ''
+        raise ValueError(f'{name} must be between {bounds[0]:g} and {bounds[1]:g}{calibrated}')
+    return number
+
+
+def _timestamp(value, now: datetime) -> datetime:
+    if value is None:
+        return now
+    try:
+        if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+            stamp = datetime.fromtimestamp(float(value), tz=timezone.utc)
+        else:
+            stamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError('timestamp must be ISO 8601 or epoch seconds')
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone(timezone.utc).replace(tzinfo=None)
+    if stamp > now + MAX_CLOCK_SKEW:
+        raise ValueError('timestamp is in the future')
+    return stamp
+
+
+def _load_sensors(records: List[Tuple[int, Any]]) -> Tuple[Dict[int, Any], Dict[str, Any]]:
+    """Fetch every sensor the batch refers to, by id and by MAC, in two queries."""
+    ids, macs = set(), set()
+    for _, record in records:
+        if isinstance(record, dict):
+            if record.get('sensor_id') is not None:
+                try:
+                    ids.add(int(record['sensor_id']))
+                except (TypeError, ValueError):
+                    pass
+            elif record.get('mac_address'):
+                macs.add(str(record['mac_address']).lower())
+
+    columns = (TemperatureSensor.id, TemperatureSensor.mac_address, TemperatureSensor.calibration_offset)
+    by_id = {row.id: row for row in db.session.execute(
+        select(*columns).where(TemperatureSensor.id.in_(ids)))} if ids else {}
+    by_mac = {row.mac_address.lower(): row for row in db.session.execute(
+        select(*columns).where(db.func.lower(TemperatureSensor.mac_address).in_(macs)))} if macs else {}
+    return by_id, by_mac
+
+
+# ------------------------------------------------------------------ ingest
+
+def ingest_readings(records: Iterable[Tuple[int, Any]]) -> IngestResult:
+    """Validate and store a batch of readings; returns counts and per-row rejects."""
+    records = list(records)
+    result = IngestResult()
+    now = datetime.utcnow()
+    by_id, by_mac = _load_sensors(records)
+
+    accepted = []  # (sensor_id, calibrated temperature, humidity, timestamp)
+    for row, record in records:
+        if isinstance(record, str):
+            result.reject(row, record)
+            continue
+        if not isinstance(record, dict):
+            result.reject(row, 'reading must be an object')
+            continue
+        try:
+            if record.get('sensor_id') is not None:
+                try:
+                    sensor = by_id.get(int(record['sensor_id']))
+                except (TypeError, ValueError):
+                    raise ValueError('sensor_id must be an integer')
+            elif record.get('mac_address'):
+                sensor = by_mac.get(str(record['mac_address']).lower())
+            else:
+                raise ValueError('sensor_id or mac_address is required')
+            if sensor is None:
+                raise ValueError('unknown sensor')
+
+            # The calibrated value is the one stored, so that is the one range-checked
+            temperature = _number(record.get('temperature'), 'temperature', True, TEMPERATURE_RANGE,
+                                  offset=sensor.calibration_offset or 0.0)
+            humidity = _number(record.get('humidity'), 'humidity', False, HUMIDITY_RANGE)
+            stamp = _timestamp(record.get('timestamp'), now)
+        except ValueError as e:
+            result.reject(row, str(e))
+            continue
+
+        accepted.append((sensor.id, temperature, humidity, stamp))
+
+    if not accepted:
+        return result
+
+    comforts = comfort_indices([a[1] for a in accepted], [a[2] for a in accepted])
+    readings = [
+        _Reading(sensor_id=sensor_id, temperature=temperature, humidity=humidity,
+                 comfort_index=comfort, created_at=stamp)
+        for (sensor_id, temperature, humidity, stamp), comfort in zip(accepted, comforts)
+    ]
+    sensor_ids = sorted({r.sensor_id for r in readings})
+
+    connection = db.session.connection()
+    connection.execute(insert(TemperatureReading.__table__), [
+        {
+            'sensor_id': r.sensor_id,
+            'temperature': r.temperature,
+            'humidity': r.humidity,
+            'comfort_index': r.comfort_index,
+            'created_at': r.created_at,
+            'updated_at': now,
+        }
+        for r in readings
+    ])
+    connection.execute(
+        update(TemperatureSensor.__table__)
+        .where(TemperatureSensor.__table__.c.id.in_(sensor_ids))
+        .values(last_connection=now)
+    )
+    # Core inserts skip the ORM after_insert hook, so merge the rollups here
+    record_temperature_readings(connection, readings)
+    db.session.commit()
+    office_context.invalidate(['temperature'])
+    room_finder.invalidate()
+
+    result.accepted = len(readings)
+    result.sensors = len(sensor_ids)
+    return result
@@ -1,18 +1,58 @@
 # services/stock_service.py - Stock Management Service Layer
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, case, func, select
 from sqlalchemy.exc import IntegrityError
 
 from app import db
 from models import (
     StockItem, StockCategory, StockLocation, StockTransaction,
-    ActivityLog, User
+    ActivityLog, User, stock_status, stock_value
 )
+from services import search_index
+from services.reorder_engine import forecast_reorders
 
 class StockService:
     """Service layer for complex stock operations"""
     
+    @staticmethod
+    def list_items(status: Optional[str] = None, location: Optional[str] = None,
+                   category: Optional[str] = None, search: Optional[str] = None,
+                   after_id: Optional[int] = None, limit: int = 100) -> Tuple[list, bool]:
+        """One keyset page of stock item rows (ordered by id) and whether more follow.
+        
+        Filters run in SQL on indexes: status on ix_stock_items_status (the
+        same expression as StockItem.get_status), location and category
+        names on the (location_id, id) / (category_id, id) indexes. ``search``
+        is a case-insensitive substring match on name, SKU or description,
+        served by the stock_items_search FTS index (services/search_index.py).
+        """
+        stmt = (
+            select(StockItem.id, StockItem.name, StockItem.sku, StockItem.quantity, StockItem.unit,
+                   stock_status.label('status'), StockLocation.name.label('location'),
+                   StockCategory.name.label('category'), StockItem.supplier, StockItem.reorder_point,
+                   StockItem.min_quantity, StockItem.unit_cost, StockItem.description,
+                   StockItem.last_restock, StockItem.updated_at, StockItem.created_at)
+            .outerjoin(StockLocation, StockItem.location_id == StockLocation.id)
+            .outerjoin(StockCategory, StockItem.category_id == StockCategory.id)
+        )
+        if status:
+            stmt = stmt.where(stock_status == status)
+        # Names are resolved first so the item query is an equality on the indexed id
+        if location:
+            ids = db.session.execute(select(StockLocation.id).where(StockLocation.name == location)).scalars().all()
+            stmt = stmt.where(StockItem.location_id == ids[0] if len(ids) == 1 else StockItem.location_id.in_(ids))
+        if category:
+            ids = db.session.execute(select(StockCategory.id).where(StockCategory.name == category)).scalars().all()
+            stmt = stmt.where(StockItem.category_id == ids[0] if len(ids) == 1 else StockItem.category_id.in_(ids))
+        if search:
+            stmt = stmt.where(search_index.match_clause('stock', search, StockItem.id))
+        if after_id is not None:
+            stmt = stmt.where(StockItem.id > after_id)
+        
+        rows = db.session.execute(stmt.order_by(StockItem.id).limit(limit + 1)).all()
+        return rows[:limit], len(rows) > limit
+    
     @staticmethod
     def get_low_stock_items(threshold_multiplier: float = 1.0) -> List[StockItem]:
         """Get items that are at or below their reorder point"""
@@ -29,83 +69,132 @@ class StockService:
         return StockItem.query.filter(StockItem.quantity <= 0).all()
     
     @staticmethod
-    def get_stock_alerts() -> List[Dict]:
-        """Get formatted stock alerts for the dashboard"""
-        alerts = []
+    def get_stock_totals() -> Dict:
+        """Item counts by status and total stock value, from one GROUP BY query"""
+        rows = db.session.execute(
+            select(stock_status.label('status'), func.count().label('item_count'), func.sum(stock_value).label('value'))
+            .group_by(stock_status)
+        ).all()
+        by_status = {'OK': 0, 'Low': 0, 'Critical': 0}
+        total_value = 0.0
+        for row in rows:
+            by_status[row.status] = row.item_count
+            total_value += row.value or 0.0
+        return {
+            'total_items': sum(by_status.values()),
+            'by_status': by_status,
+            'total_value': round(total_value, 2)
+        }
+    
+    @staticmethod
+    def get_breakdown(by: str) -> List[Dict]:
+        """Item count, value and low/critical counts per location or category
+        
+        ``by`` is 'location' or 'category'. Every location/category is listed
+        (with zeros if empty), plus an entry with id None for items without
+        one. Two queries whatever the catalogue size.
+        """
+        model, column = {
+            'location': (StockLocation, StockItem.location_id),
+            'category': (StockCategory, StockItem.category_id),
+        }[by]
+        totals = {row.group_id: row for row in db.session.execute(
+            select(column.label('group_id'), func.count().label('item_count'),
+                   func.sum(stock_value).label('value'),
+                   func.sum(case((stock_status == 'Low', 1), else_=0)).label('low'),
+                   func.sum(case((stock_status == 'Critical', 1), else_=0)).label('critical'))
+            .group_by(column)
+        )}
+        
+        def entry(group_id, fields):
+            row = totals.get(group_id)
+            return {
+                'id': group_id,
+                **fields,
+                'item_count': row.item_count if row else 0,
+                'total_value': round(row.value or 0.0, 2) if row else 0.0,
+                'low_stock_items': row.low if row else 0,
+                'critical_stock_items': row.critical if row else 0
+            }
         
-        # Critical items (out of stock)
-        critical_items = StockService.get_critical_stock_items()
-        for item in critical_items:
-            alerts.append({
-                'id': item.id,
-                'item': item.name,
-                'type': 'critical',
-                'severity': 'high',
-                'message': f'Out of stock - {item.name}',
-                'current_quantity': item.quantity,
-                'unit': item.unit,
-                'location': item.location.name if item.location else 'Unknown',
-                'recommended_order': item.reorder_point * 2 if item.reorder_point else 10,
-                'supplier': item.supplier
-            })
+        breakdown = []
+        for group in model.query.order_by(model.id).all():
+            fields = {'name': group.name, 'description': group.description}
+            if by == 'location':
+                fields['area'] = group.area
+            breakdown.append(entry(group.id, fields))
+        if None in totals:
+            breakdown.append(entry(None, {'name': 'Unknown' if by == 'location' else 'Uncategorized',
+                                          'description': None, **({'area': None} if by == 'location' else {})}))
+        return breakdown
+    
+    @staticmethod
+    def get_stock_alerts() -> List[Dict]:
+        """Get formatted stock alerts for the dashboard (critical first, then lowest quantity)"""
+        rows = db.session.execute(
+            select(StockItem.id, StockItem.name, StockItem.quantity, StockItem.unit, StockItem.reorder_point,
+                   StockItem.supplier, stock_status.label('status'), StockLocation.name.label('location'))
+            .outerjoin(StockLocation, StockItem.location_id == StockLocation.id)
+            .where(stock_status.in_(['Critical', 'Low']))
+            .order_by(case((stock_status == 'Critical', 0), else_=1), StockItem.quantity, StockItem.id)
+        ).all()
         
-        # Low stock items
-        low_items = StockService.get_low_stock_items()
-        for item in low_items:
-            if item.quantity > 0:  # Exclude items already in critical list
-                alerts.append({
-                    'id': item.id,
-                    'item': item.name,
+        alerts = []
+        for row in rows:
+            alert = {
+                'id': row.id,
+                'item': row.name,
+                'current_quantity': row.quantity,
+                'unit': row.unit,
+                'location': row.location or 'Unknown',
+                'supplier': row.supplier
+            }
+            if row.status == 'Critical':
+                # Critical items (out of stock)
+                alert.update({
+                    'type': 'critical',
+                    'severity': 'high',
+                    'message': f'Out of stock - {row.name}',
+                    'recommended_order': row.reorder_point * 2 if row.reorder_point else 10
+                })
+            else:
+                alert.update({
                     'type': 'low',
                     'severity': 'medium',
-                    'message': f'Low stock - {item.name}',
-                    'current_quantity': item.quantity,
-                    'unit': item.unit,
-                    'location': item.location.name if item.location else 'Unknown',
-                    'reorder_point': item.reorder_point,
-                    'recommended_order': item.reorder_point * 2,
-                    'supplier': item.supplier
+                    'message': f'Low stock - {row.name}',
+                    'reorder_point': row.reorder_point,
+                    'recommended_order': row.reorder_point * 2
                 })
-        
-        return sorted(alerts, key=lambda x: (x['severity'] == 'high', x['current_quantity']))
+            alerts.append(alert)
+        return alerts
     
     @staticmethod
     def calculate_stock_value() -> Dict[str, float]:
         """Calculate total stock value and breakdown by category"""
-        result = {
-            'total_value': 0.0,
-            'categories': {}
+        categories = {
+            entry['name']: entry['total_value']
+            for entry in StockService.get_breakdown('category') if entry['item_count']
+        }
+        return {
+            'total_value': round(sum(categories.values()), 2),
+            'categories': categories
         }
-        
-        items = StockItem.query.join(StockCategory, isouter=True).all()
-        
-        for item in items:
-            value = item.get_total_value()
-            result['total_value'] += value
-            
-            category_name = item.category.name if item.category else 'Uncategorized'
-            if category_name not in result['categories']:
-                result['categories'][category_name] = 0.0
-            result['categories'][category_name] += value
-        
-        # Round values
-        result['total_value'] = round(result['total_value'], 2)
-        for cat in result['categories']:
-            result['categories'][cat] = round(result['categories'][cat], 2)
-        
-        return result
     
     @staticmethod
     def get_stock_movement_summary(days: int = 30) -> Dict:
-        """Get stock movement summary for the last N days"""
+        """Get stock movement summary for the last N days (one query grouped by item and type)"""
         start_date = datetime.now() - timedelta(days=days)
         
-        transactions = StockTransaction.query.filter(
-            StockTransaction.created_at >= start_date
+        rows = db.session.execute(
+            select(StockTransaction.item_id, StockItem.name, StockItem.unit_cost, StockTransaction.type,
+                   func.count().label('transactions'), func.sum(StockTransaction.quantity).label('quantity'))
+            .join(StockItem, StockTransaction.item_id == StockItem.id)
+            .where(StockTransaction.created_at >= start_date)
+            .group_by(StockTransaction.item_id, StockItem.name, StockItem.unit_cost, StockTransaction.type)
         ).all()
         
         summary = {
-            'total_transactions': len(transactions),
+            'total_transactions': 0,
             'items_restocked': 0,
             'items_consumed': 0,
             'total_value_in': 0.0,
@@ -116,28 +205,28 @@ class StockService:
         
         item_activity = {}
         
-        for trans in transactions:
-            item = trans.item
-            if item.id not in item_activity:
-                item_activity[item.id] = {
-                    'name': item.name,
+        for row in rows:
+            if row.item_id not in item_activity:
+                item_activity[row.item_id] = {
+                    'name': row.name,
                     'transactions': 0,
                     'quantity_in': 0,
                     'quantity_out': 0
                 }
             
-            item_activity[item.id]['transactions'] += 1
+            item_activity[row.item_id]['transactions'] += row.transactions
+            summary['total_transactions'] += row.transactions
             
-            if trans.type == 'in':
-                summary['items_restocked'] += 1
-                item_activity[item.id]['quantity_in'] += trans.quantity
-                if item.unit_cost:
-                    summary['total_value_in'] += trans.quantity * item.unit_cost
-            elif trans.type == 'out':
-                summary['items_consumed'] += 1
-                item_activity[item.id]['quantity_out'] += trans.quantity
-                if item.unit_cost:
-                    summary['total_value_out'] += trans.quantity * item.unit_cost
+            if row.type == 'in':
+                summary['items_restocked'] += row.transactions
+                item_activity[row.item_id]['quantity_in'] += row.quantity
+                if row.unit_cost:
+                    summary['total_value_in'] += row.quantity * row.unit_cost
+            elif row.type == 'out':
+                summary['items_consumed'] += row.transactions
+                item_activity[row.item_id]['quantity_out'] += row.quantity
+                if row.unit_cost:
+                    summary['total_value_out'] += row.quantity * row.unit_cost
         
         # Get most active items
         most_active = sorted(
@@ -245,45 +334,12 @@ class StockService:
     
     @staticmethod
     def generate_reorder_suggestions() -> List[Dict]:
-        """Generate intelligent reorder suggestions"""
-        suggestions = []
-        low_items = StockService.get_low_stock_items()
+        """Generate intelligent reorder suggestions
         
-        for item in low_items:
-            # Calculate suggested order quantity based on usage patterns
-            recent_transactions = StockTransaction.query.filter(
-                and_(
-                    StockTransaction.item_id == item.id,
-                    StockTransaction.type == 'out',
-                    StockTransaction.created_at >= datetime.now() - timedelta(days=30)
-                )
-            ).all()
-            
-            # Calculate average monthly usage
-            total_consumed = sum(t.quantity for t in recent_transactions)
-            monthly_usage = total_consumed if recent_transactions else item.reorder_point or 5
-            
-            # Suggest 2 months worth of stock or 2x reorder point, whichever is higher
-            suggested_quantity = max(
-                monthly_usage * 2,
-                (item.reorder_point or 5) * 2
-            )
-            
-            suggestions.append({
-                'item_id': item.id,
-                'name': item.name,
-                'current_quantity': item.quantity,
-                'reorder_point': item.reorder_point,
-                'suggested_quantity': round(suggested_quantity),
-                'unit': item.unit,
-                'supplier': item.supplier,
-                'estimated_cost': round(suggested_quantity * (item.unit_cost or 0), 2) if item.unit_cost else None,
-                'monthly_usage': round(monthly_usage, 1),
-                'days_of_stock': round(item.quantity / (monthly_usage / 30), 1) if monthly_usage > 0 else float('inf'),
-                'priority': 'high' if item.quantity <= 0 else 'medium'
-            })
-        
-        return sorted(suggestions, key=lambda x: (x['priority'] == 'high', x['days_of_stock']))
+        Low, out-of-stock and soon-to-run-out items with a Croston demand
+        forecast, days of cover and an order-by date (services/reorder_engine.py).
+        """
+        return forecast_reorders()
     
     @staticmethod
     def create_order_from_suggestions(suggestions: List[Dict], supplier: str, 
@@ -339,43 +395,28 @@ class StockService:
         if not end_date:
             end_date = datetime.now()
         
-        # Get basic stats
-        total_items = StockItem.query.count()
-        low_stock_count = len(StockService.get_low_stock_items())
-        critical_stock_count = len(StockService.get_critical_stock_items())
-        
-        # Get value information
-        value_info = StockService.calculate_stock_value()
+        # Get basic stats (status counts and value in one query)
+        totals = StockService.get_stock_totals()
         
         # Get movement summary
         movement_summary = StockService.get_stock_movement_summary(
             days=(end_date - start_date).days
         )
         
-        # Get location breakdown
-        locations = StockLocation.query.all()
-        location_breakdown = []
-        for location in locations:
-            item_count = len(location.items)
-            location_value = sum(item.get_total_value() for item in location.items)
-            location_breakdown.append({
-                'name': location.name,
-                'area': location.area,
-                'item_count': item_count,
-                'total_value': round(location_value, 2)
-            })
-        
-        # Get category breakdown
-        categories = StockCategory.query.all()
-        category_breakdown = []
-        for category in categories:
-            item_count = len(category.items)
-            category_value = sum(item.get_total_value() for item in category.items)
-            category_breakdown.append({
-                'name': category.name,
-                'item_count': item_count,
-                'total_value': round(category_value, 2)
-            })
+        # Get location and category breakdowns (grouped, not per-location lazy loads)
+        locations = [entry for entry in StockService.get_breakdown('location') if entry['id'] is not None]
+        location_breakdown = [
+            {key: entry[key] for key in ('name', 'area', 'item_count', 'total_value')} for entry in locations
+        ]
+        category_entries = StockService.get_breakdown('category')
+        categories = [entry for entry in category_entries if entry['id'] is not None]
+        category_breakdown = [
+            {key: entry[key] for key in ('name', 'item_count', 'total_value')} for entry in categories
+        ]
+        value_info = {
+            'total_value': totals['total_value'],
+            'categories': {entry['name']: entry['total_value'] for entry in category_entries if entry['item_count']}
+        }
         
         return {
             'report_period': {
@@ -383,10 +424,10 @@ class StockService:
                 'end_date': end_date.isoformat()
             },
             'summary': {
-                'total_items': total_items,
-                'low_stock_items': low_stock_count,
-                'critical_stock_items': critical_stock_count,
-                'total_value': value_info['total_value'],
+                'total_items': totals['total_items'],
+                'low_stock_items': totals['by_status']['Low'],
+                'critical_stock_items': totals['by_status']['Critical'],
+                'total_value': totals['total_value'],
                 'total_locations': len(locations),
                 'total_categories': len(categories)
             },
@@ -0,0 +1,227 @@
+# services/weather_cache.py - TTL + stale-while-revalidate weather cache
+"""Cache in front of the OpenWeatherMap API so page loads never wait on it.
+
+Forecasts are cached per city or coordinate pair. Within the TTL (the owning
+``WeatherStation.update_interval`` when there is one) a cached value is served
+as-is. Once it expires the stale value is still served, and one background
+refresh is started. A cold miss starts a refresh and returns None straight
+away (unless the caller asks to wait), so callers fall back to mock data for
+that one request. Failed refreshes keep the stale value and back off before
+retrying.
+
+City -> coordinate lookups hardly ever change, so they are kept in a JSON file
+that survives restarts and are only ever fetched once per city.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from services import openweathermap
+
+DEFAULT_TTL = 300            # seconds; WeatherStation.update_interval default
+DEFAULT_MAX_STALE = 6 * 3600  # serve expired data for at most this long
+RETRY_BACKOFF = 60           # seconds between refresh attempts after a failure
+
+
+class OpenWeatherMapUpstream:
+    """The real API, behind the interface the cache calls"""
+
+    def geocode(self, city):
+        return openweathermap.geocode_city(city)
+
+    def forecast(self, lat, lon, hours=24):
+        return openweathermap.fetch_forecast_by_coords(lat, lon, hours)
+
+    def hourly(self, lat, lon, hours=24):
+        return openweathermap.fetch_hourly_weather(lat, lon, hours)
+
+    def current(self, lat, lon):
+        return openweathermap.fetch_current_weather_by_coords(lat, lon)
+
+
+@dataclass
+class _Entry:
+    value: Any = None
+    fetched_at: Optional[float] = None
+    ttl: float = DEFAULT_TTL
+    retry_after: float = 0.0
+    refreshing: bool = False
+
+
+class WeatherCache:
+    """Stale-while-revalidate cache for forecast lookups"""
+
+    def __init__(self, upstream=None, clock: Callable[[], float] = time.monotonic):
+        self.upstream = upstream or OpenWeatherMapUpstream()
+        self.clock = clock
+        self.default_ttl = DEFAULT_TTL
+        self.max_stale = DEFAULT_MAX_STALE
+        self.geocode_path = os.path.join(tempfile.gettempdir(), 'office_geocode_cache.json')
+
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._geocodes: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._geocode_lock = threading.Lock()
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0,
+                          'geocode_hits': 0, 'geocode_misses': 0}
+
+    def init_app(self, app):
+        """Read cache settings from the app config."""
+        self.default_ttl = app.config.get('WEATHER_CACHE_TTL', DEFAULT_TTL)
+        self.max_stale = app.config.get('WEATHER_CACHE_MAX_STALE', DEFAULT_MAX_STALE)
+        self.geocode_path = app.config.get('GEOCODE_CACHE_PATH') or os.path.join(
+            tempfile.gettempdir(), 'office_geocode_cache.json')
+        self._geocodes = None
+        if app.config.get('WEATHER_UPSTREAM') == 'fake':
+            from services.mock_data import FakeWeatherUpstream
+            self.upstream = FakeWeatherUpstream()
+
+    # ---------------------------------------------------------------- lookups
+
+    def forecast(self, city: str, hours: int = 24, ttl: Optional[float] = None, wait: bool = False):
+        """Hourly forecast for a city (see fetch_forecast_by_coords), or None if not cached yet."""
+        def load():
+            location = self.geocode(city)
+            if not location:
+                return None
+            return self.upstream.forecast(location['lat'], location['lon'], hours)
+        return self._get(('forecast', _normalise(city), hours), load, ttl, wait)
+
+    def hourly(self, lat: float, lon: float, hours: int = 24, ttl: Optional[float] = None, wait: bool = False):
+        """Hourly forecast for coordinates (see fetch_hourly_weather), or None if not cached yet."""
+        key = ('hourly', round(float(lat), 4), round(float(lon), 4), hours)
+        return self._get(key, lambda: self.upstream.hourly(lat, lon, hours), ttl, wait)
+
+    def geocode(self, city: str) -> Optional[Dict[str, Any]]:
+        """Coordinates for a city from the persistent cache, fetching them once if unknown."""
+        name = _normalise(city)
+        with self._geocode_lock:
+            geocodes = self._load_geocodes()
+            if name in geocodes:
+                self._count('geocode_hits')
+                return geocodes[name]
+
+        self._count('geocode_misses')
+        location = self.upstream.geocode(city)
+        if location:
+            with self._geocode_lock:
+                self._geocodes[name] = location
+                self._save_geocodes()
+        return location
+
+    # ------------------------------------------------------------------- core
+
+    def _get(self, key, loader, ttl, wait):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.ttl = ttl or self.default_ttl
+            age = None if entry.fetched_at is None else now - entry.fetched_at
+
+            if age is not None and age <= entry.ttl:
+                self._counters['hits'] += 1
+                return entry.value
+            if age is not None and age <= entry.ttl + self.max_stale:
+                self._counters['stale_hits'] += 1
+                self._schedule(key, entry, loader, now)
+                return entry.value
+
+            self._counters['misses'] += 1
+            if not wait:
+                self._schedule(key, entry, loader, now)
+                return None
+
+        # Caller is willing to block (scripts, pollers): load in this thread
+        return self._refresh(key, loader)
+
+    def _schedule(self, key, entry, loader, now):
+        """Start one background refresh for ``key`` (caller holds self._lock)."""
+        if entry.refreshing or now < entry.retry_after:
+            return
+        entry.refreshing = True
+        threading.Thread(target=self._refresh, args=(key, loader), daemon=True,
+                         name=f'weather-refresh-{key[0]}').start()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:  # upstream helpers normally return None instead
+            print(f"Weather cache refresh error for {key}: {e}")
+            value = None
+
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.refreshing = False
+            if value is None:
+                self._counters['refresh_failures'] += 1
+                entry.retry_after = self.clock() + min(RETRY_BACKOFF, entry.ttl)
+                return entry.value if entry.fetched_at is not None else None
+            self._counters['refreshes'] += 1
+            entry.value = value
+            entry.fetched_at = self.clock()
+            entry.retry_after = 0.0
+            return value
+
+    # ------------------------------------------------------------ geocodes
+
+    def _load_geocodes(self):
+        """Read the geocode file once (caller holds self._geocode_lock)."""
+        if self._geocodes is None:
+            try:
+                with open(self.geocode_path, encoding='utf-8') as fh:
+                    self._geocodes = json.load(fh)
+            except (OSError, ValueError):
+                self._geocodes = {}
+        return self._geocodes
+
+    def _save_geocodes(self):
+        """Atomically rewrite the geocode file (caller holds self._geocode_lock)."""
+        tmp_path = f"{self.geocode_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(self._geocodes, fh, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.geocode_path)
+        except OSError as e:
+            print(f"Could not save geocode cache: {e}")
+
+    # ------------------------------------------------------------------ stats
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the number of cached keys."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = sum(1 for e in self._entries.values() if e.fetched_at is not None)
+            stats['refreshing'] = sum(1 for e in self._entries.values() if e.refreshing)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else None
+        return stats
+
+    def clear(self):
+        """Drop cached forecasts (the persistent geocode cache is kept)."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _normalise(city: str) -> str:
+    return ' '.join(city.lower().replace(',', ', ').split())
+
+
+def station_ttl(office_id: Optional[int]) -> Optional[int]:
+    """Refresh interval of the office's weather station, if it has one."""
+    if office_id is None:
+        return None
+    from models import WeatherStation
+    station = WeatherStation.query.filter_by(office_id=office_id).first()
+    return station.update_interval if station and station.update_interval else None
+
+
+# Create global instance
+weather_cache = WeatherCache()
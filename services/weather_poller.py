@@ -0,0 +1,185 @@
+# services/weather_poller.py - Scheduled WeatherStation polling
+"""Fetch current conditions for every due WeatherStation and store WeatherData.
+
+``poll_due_stations`` is run by the APScheduler job set up in ``create_app``.
+A station is due once its ``update_interval`` has passed since
+``last_update``. Due stations are fetched concurrently on a bounded thread
+pool (network only, no database work in the workers). The results are
+written with one bulk INSERT, folded into the climate rollups, and each new
+row is linked to the office's TemperatureReadings it is nearest in time to.
+Chart endpoints therefore read local rows and never call the API inline.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, insert, or_, select, update
+
+from app import db
+from models import TemperatureReading, TemperatureSensor, WeatherData, WeatherStation
+from services.climate_rollups import record_weather_data
+from services.weather_cache import weather_cache
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_INTERVAL = 300  # seconds, WeatherStation.update_interval default
+SUPPORTED_PROVIDERS = (None, '', 'openweathermap')
+
+
+def poll_due_stations(app, force: bool = False) -> Dict[str, int]:
+    """Poll every station whose update interval has elapsed.
+
+    Args:
+        app: Flask app (the scheduler runs outside any app context)
+        force: Poll every station regardless of last_update
+
+    Returns:
+        Counts of stations polled, rows stored, failures and readings linked.
+    """
+    summary = {'polled': 0, 'stored': 0, 'failed': 0, 'linked': 0}
+    with app.app_context():
+        now = datetime.utcnow()
+        stations = [s for s in WeatherStation.query.all()
+                    if s.api_provider in SUPPORTED_PROVIDERS and (force or _is_due(s, now))]
+        if not stations:
+            return summary
+
+        targets = []
+        for station in stations:
+            if (station.latitude is None or station.longitude is None) and station.location_name:
+                location = weather_cache.geocode(station.location_name)
+                if location:
+                    station.latitude, station.longitude = location['lat'], location['lon']
+            if station.latitude is None or station.longitude is None:
+                summary['failed'] += 1
+                continue
+            targets.append(station)
+        summary['polled'] = len(stations)
+
+        results = _fetch_all([(s.id, s.latitude, s.longitude) for s in targets],
+                             app.config.get('WEATHER_POLL_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+
+        by_id = {s.id: s for s in targets}
+        rows = []
+        for station_id, current in results:
+            if not current:
+                summary['failed'] += 1
+                continue
+            by_id[station_id].last_update = now
+            rows.append({
+                'station_id': station_id,
+                'temperature': current['temperature'],
+                'humidity': current.get('humidity'),
+                'pressure': current.get('pressure'),
+                'wind_speed': current.get('wind_speed'),
+                'wind_direction': current.get('wind_direction'),
+                'description': current.get('conditions'),
+                'condition_code': current.get('condition_code'),
+                'created_at': now,
+                'updated_at': now,
+            })
+
+        if rows:
+            connection = db.session.connection()
+            previous = _latest_per_station(connection, [r['station_id'] for r in rows])
+            table = WeatherData.__table__
+            inserted = connection.execute(
+                insert(table).returning(table.c.id, table.c.station_id), rows).all()
+
+            # Core inserts skip the ORM after_insert hook, so merge the rollups here
+            record_weather_data(connection, [SimpleNamespace(**r) for r in rows])
+
+            for weather_id, station_id in inserted:
+                station = by_id[station_id]
+                window = timedelta(seconds=station.update_interval or DEFAULT_INTERVAL)
+                summary['linked'] += _link_readings(
+                    connection, station.office_id, previous.get(station_id), (weather_id, now), window)
+            summary['stored'] = len(rows)
+
+        db.session.commit()
+
+    if summary['polled']:
+        print(f"🌤️ Weather poll: {summary['stored']} stored, {summary['failed']} failed, "
+              f"{summary['linked']} readings linked")
+    return summary
+
+
+def _is_due(station: WeatherStation, now: datetime) -> bool:
+    if station.last_update is None:
+        return True
+    return now - station.last_update >= timedelta(seconds=station.update_interval or DEFAULT_INTERVAL)
+
+
+def _fetch_all(targets, max_workers: int):
+    """Fetch current conditions for (station_id, lat, lon) targets in parallel."""
+    upstream = weather_cache.upstream
+
+    def fetch(target):
+        station_id, lat, lon = target
+        try:
+            return station_id, upstream.current(lat, lon)
+        except Exception as e:  # upstream helpers normally return None instead
+            print(f"Weather poll failed for station {station_id}: {e}")
+            return station_id, None
+
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets))),
+                            thread_name_prefix='weather-poll') as pool:
+        return list(pool.map(fetch, targets))
+
+
+def _latest_per_station(connection, station_ids) -> Dict[int, Tuple[int, datetime]]:
+    """Newest existing WeatherData (id, created_at) per station, in one query."""
+    ranked = select(
+        WeatherData.station_id, WeatherData.id, WeatherData.created_at,
+        func.row_number().over(
+            partition_by=WeatherData.station_id,
+            order_by=(WeatherData.created_at.desc(), WeatherData.id.desc())
+        ).label('rn')
+    ).where(WeatherData.station_id.in_(set(station_ids)), WeatherData.created_at.isnot(None)).subquery()
+    rows = connection.execute(
+        select(ranked.c.station_id, ranked.c.id, ranked.c.created_at).where(ranked.c.rn == 1))
+    return {station_id: (weather_id, created_at) for station_id, weather_id, created_at in rows}
+
+
+def _link_readings(connection, office_id: Optional[int], previous, current, window: timedelta) -> int:
+    """Point the office's readings at whichever weather row is nearest in time.
+
+    Readings up to the midpoint between the previous and the new weather row
+    keep (or get) the previous one. Later readings move to the new row,
+    including ones that were linked to the previous row only because it was
+    the newest at the time. Nothing further than half an update interval
+    from a weather row is linked.
+    """
+    if office_id is None:
+        return 0
+    readings = TemperatureReading.__table__
+    office_sensors = select(TemperatureSensor.id).where(TemperatureSensor.office_id == office_id)
+    current_id, current_time = current
+    half = window / 2
+    linked = 0
+
+    boundary = current_time - half
+    if previous is not None:
+        previous_id, previous_time = previous
+        midpoint = previous_time + (current_time - previous_time) / 2
+        linked += connection.execute(
+            update(readings)
+            .where(readings.c.sensor_id.in_(office_sensors),
+                   readings.c.weather_data_id.is_(None),
+                   readings.c.created_at >= previous_time - half,
+                   readings.c.created_at <= min(midpoint, previous_time + half))
+            .values(weather_data_id=previous_id)
+        ).rowcount
+        boundary = max(midpoint, boundary)
+        unlinked = or_(readings.c.weather_data_id.is_(None), readings.c.weather_data_id == previous_id)
+    else:
+        unlinked = readings.c.weather_data_id.is_(None)
+
+    linked += connection.execute(
+        update(readings)
+        .where(readings.c.sensor_id.in_(office_sensors), unlinked, readings.c.created_at > boundary)
+        .values(weather_data_id=current_id)
+    ).rowcount
+    return linked
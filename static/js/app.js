@@ -607,9 +607,12 @@ document.addEventListener("DOMContentLoaded", function () {
     startStreamingResponse(text, controller, timeoutId);
   }
 
-  function startStreamingResponse(userText, controller, timeoutId) {
+  const MAX_BUSY_RETRIES = 3;
+
+  function startStreamingResponse(userText, controller, timeoutId, attempt = 0) {
     let botMessageEl = null;
     let aggregated = '';
+    let retrying = false;
 
     function createStreamingMessage() {
       const timestamp = new Date().toISOString();
@@ -640,6 +643,13 @@ document.addEventListener("DOMContentLoaded", function () {
       body: JSON.stringify({ message: userText }),
       signal: controller.signal
     }).then(response => {
+      if (response.status === 503 || response.headers.get('Retry-After')) {
+        // Every assistant slot and the wait queue are taken: retry later, never
+        // fall back to /api/ai, which would hold a server thread for the whole reply
+        const busy = new Error('busy');
+        busy.retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+        throw busy;
+      }
       if (!response.ok) throw new Error('HTTP ' + response.status);
       hideTypingIndicator();
       clearTimeout(timeoutId);
@@ -656,6 +666,9 @@ document.addEventListener("DOMContentLoaded", function () {
               if (line.startsWith('data: ')) {
                 try {
                   const payload = JSON.parse(line.replace('data: ', ''));
+                  if (payload.queued && !aggregated) {
+                    if (contentDiv) contentDiv.innerHTML = '<em>Waiting for the assistant (' + payload.queued + ' ahead of you)...</em>';
+                  }
                   if (payload.delta) {
                     aggregated += payload.delta;
                     if (contentDiv) contentDiv.innerHTML = renderMarkdown(aggregated);
@@ -682,6 +695,21 @@ document.addEventListener("DOMContentLoaded", function () {
     }).catch(e => {
       hideTypingIndicator();
       clearTimeout(timeoutId);
+      if (e.message === 'busy') {
+        if (attempt < MAX_BUSY_RETRIES) {
+          retrying = true;
+          if (contentDiv) contentDiv.innerHTML = '<em>The assistant is busy, retrying in ' + e.retryAfter + 's...</em>';
+          setTimeout(() => {
+            botMessageEl.remove();
+            const retryController = new AbortController();
+            const retryTimeoutId = setTimeout(() => retryController.abort(), 15000);
+            startStreamingResponse(userText, retryController, retryTimeoutId, attempt + 1);
+          }, e.retryAfter * 1000);
+        } else if (contentDiv) {
+          contentDiv.innerHTML = renderMarkdown('❌ The assistant is busy right now, please try again in a minute.');
+        }
+        return;
+      }
       if (contentDiv) contentDiv.innerHTML = renderMarkdown('❌ Streaming failed; falling back to full reply...');
       // Fallback non-stream request
       fetch('/api/ai', {
@@ -693,6 +721,7 @@ document.addEventListener("DOMContentLoaded", function () {
         if (contentDiv) contentDiv.innerHTML = renderMarkdown(aggregated);
       });
     }).finally(() => {
+      if (retrying) return;  // the retry re-enables the input when it finishes
       chatInput.disabled = false;
       sendChat.disabled = false;
       chatInput.focus();
@@ -8,6 +8,7 @@ document.addEventListener('DOMContentLoaded', function() {
         pendingOrders: [],
         suppliers: ['Pick N Pay', 'Checkers', 'Shoprite', 'Woolworths', 'Spar', 'Makro'],
         baseUrl: '/api/stock',
+        itemsPageSize: 1000, // the most /items returns per page
         
         async init() {
             console.log('🚀 Initializing Stock Manager...');
@@ -72,12 +73,20 @@ document.addEventListener('DOMContentLoaded', function() {
 
         async loadStockData() {
             try {
-                const response = await this.apiCall('/items');
-                if (response.success) {
-                    this.inventory = response.items || response.data || [];
-                } else {
-                    this.loadFallbackData();
-                }
+                // /items is paged: follow next_cursor so search, counts and the
+                // table below cover the whole inventory, not just the first page
+                const items = [];
+                let cursor = null;
+                do {
+                    const query = `?limit=${this.itemsPageSize}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+                    const response = await this.apiCall(`/items${query}`);
+                    if (!response.success) {
+                        throw new Error(response.error || 'Failed to load stock items');
+                    }
+                    items.push(...(response.items || response.data || []));
+                    cursor = response.next_cursor;
+                } while (cursor);
+                this.inventory = items;
             } catch (error) {
                 console.error('Failed to load stock data:', error);
                 this.loadFallbackData();